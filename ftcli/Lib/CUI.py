@@ -9,9 +9,9 @@ from fontTools.misc.timeTools import timestampToString
 from fontTools.ttLib import TTFont
 from fontTools.ttLib.tables._n_a_m_e import (_MAC_LANGUAGES, _WINDOWS_LANGUAGES)
 
-from ftcli.Lib.Font import Font
 from ftcli.Lib.configHandler import (DEFAULT_WEIGHTS, DEFAULT_WIDTHS, configHandler)
 from ftcli.Lib.csvHandler import csvHandler
+from ftcli.Lib.metadataCache import MetadataCache
 from ftcli.Lib.utils import (getFontsList, wrapString)
 
 
@@ -411,10 +411,11 @@ class CUI(object):
         files = getFontsList(input_path)
         length = 17
 
+        cache = MetadataCache()
         for f in files:
 
             try:
-                font = Font(f)
+                font = cache.get(f)
 
                 font_info = font.getFontInfo()
                 v_metrics = font.getVerticalMetrics()
@@ -491,6 +492,7 @@ class CUI(object):
 
             except Exception as e:
                 click.secho('ERROR: {}'.format(e), fg='red')
+        cache.close()
 
     def printFtList(self, input_path):
 
@@ -516,12 +518,13 @@ class CUI(object):
         usWidthClassList = []
         usWeightClassList = []
 
+        cache = MetadataCache()
         for f in files:
             try:
-                font = Font(f, recalcTimestamp=False)
+                font = cache.get(f)
                 filename = os.path.basename(f)
-                usWeightClass = font['OS/2'].usWeightClass
-                usWidthClass = font['OS/2'].usWidthClass
+                usWeightClass = font.usWeightClass
+                usWidthClass = font.usWidthClass
                 isBold = font.isBold()
                 isItalic = font.isItalic()
                 isOblique = font.isOblique()
@@ -539,6 +542,7 @@ class CUI(object):
                     usWidthClassList.append(usWidthClass)
             except Exception as e:
                 click.secho('ERROR: {}'.format(e), fg='red')
+        cache.close()
 
         usWidthClassList.sort()
         usWeightClassList.sort()
@@ -4,6 +4,8 @@ import sys
 
 from ftcli.Lib.Font import Font
 from ftcli.Lib.configHandler import configHandler
+from ftcli.Lib.recordStore import RecordStore
+from ftcli.Lib.styleTokenizer import StyleTokenizer
 from ftcli.Lib.utils import (getFontsList, getSourceString, guessFamilyName)
 
 
@@ -24,15 +26,37 @@ class DataHandler(object):
             print(f'\n{__name__}: an error occurred while parsing: {e}')
             sys.exit()
 
+    def getRecords(self) -> RecordStore:
+        """
+        Returns the fonts database as a RecordStore indexed by file name.
+        """
+        json_data = self.parseJSON()
+        return RecordStore([dict(v, file_name=k) for k, v in json_data.items()], key='file_name')
+
+    def saveRecords(self, records: RecordStore) -> bool:
+        """
+        Writes the fonts database, only if some records have been added, modified or removed.
+
+        :return: True if the file has been written.
+        """
+        if not records.isDirty:
+            return False
+        json_data = {}
+        for record in records:
+            json_data[record['file_name']] = {k: v for k, v in record.items() if k != 'file_name'}
+        with open(self.fonts_json, 'w') as f:
+            json.dump(json_data, f, indent=4)
+        records.markClean()
+        return True
+
     def resetFontsDatabase(self, config_file):
 
         files = getFontsList(os.path.dirname(self.fonts_json))
         config = configHandler(config_file).getConfig()
-        json_data = {}
+        records = self.getRecords()
 
         for f in files:
             file_name = os.path.basename(f)
-            json_data[file_name] = {'current-data': {}}
             font = Font(f)
             family_name = guessFamilyName(font)
 
@@ -61,170 +85,74 @@ class DataHandler(object):
                                   'is_oblique': font.isOblique(), 'uswidthclass': font['OS/2'].usWidthClass,
                                   'usweightclass': font['OS/2'].usWeightClass}
 
-            json_data[file_name] = {'attributes': current_attributes, 'names': current_names}
+            records.set({'file_name': file_name, 'attributes': current_attributes, 'names': current_names})
 
-        with open(self.fonts_json, 'w') as f:
-            json.dump(json_data, f, indent=4)
+        records.retain(os.path.basename(f) for f in files)
+        self.saveRecords(records)
 
     def recalcFontsDatabase(self, config_file, family_name=None, source_string='fname'):
 
         files = getFontsList(os.path.dirname(self.fonts_json))
         config = configHandler(config_file).getConfig()
-        json_data = self.parseJSON()
-        if json_data == {}:
+        records = self.getRecords()
+        if len(records) == 0:
             self.resetFontsDatabase(config_file=config_file)
+            records = self.getRecords()
 
         # Read the configuration file
         weights = config['weights']
         widths = config['widths']
-        italics = config['italics']
-        obliques = config['obliques']
-
-        # Build a list of the literals of all widths in the configuration file.
-        widthsList = []
-        for values in widths.values():
-            for value in values:
-                widthsList.append(value)
-
-        # Build a list of the literals of all weights in the configuration file.
-        weightsList = []
-        for values in weights.values():
-            for value in values:
-                weightsList.append(value)
-
-        # Build a list with all style names.
-        all_style_names = []
-        all_style_names.extend(widthsList)
-        all_style_names.extend(weightsList)
-        all_style_names.extend(italics)
-        all_style_names.extend(obliques)
-        all_style_names.sort(key=len, reverse=True)
+        italics = sorted(config['italics'], key=len)
+        obliques = sorted(config['obliques'], key=len)
+        tokenizer = StyleTokenizer(config)
 
+        fonts = []
+        style_names = []
         for f in files:
             file_name = os.path.basename(f)
             font = Font(f)
 
-            # Get the source string
-            string = getSourceString(f, source_string)
-
-            # Remove dashes, underscores and spaces from the string
-            string = string.lower().replace("-", "").replace("_", "").replace(" ", "")
-
-            # Build the dictionary with the current values
+            # Get the source string from the already opened font. If it can't be read, use the file name.
+            string = getSourceString(f, source_string, font=font) or os.path.splitext(file_name)[0]
 
             # In case the family name isn't passed as parameter, we use the one stored in the JSON
             if family_name is None:
-                new_family_name = json_data[file_name]['names']['family_name']
+                new_family_name = records[file_name]['names']['family_name']
             else:
                 new_family_name = family_name
 
-            # Remove the family name from the string
-            style_name = string.replace(new_family_name.lower().replace(
-                ' ', '').replace('-', '').replace('_', '').replace(' ', ''), '')
-
             # Once removed the family name, the remaining string should be == style name (width/weight/slope)
-            weight_string = width_string = italic_string = oblique_string = style_name
-
-            # We remove all the widths and italics literals from the string, and what remains should be == the weight
-            # literal (long or short has no importance).
-            # If the obtained string is == to one of the weight literals, the corresponding key will be the new
-            # usWeightClass. Otherwise usWeightClass is read from current font values.
+            style_name = tokenizer.normalize(string).replace(tokenizer.normalize(new_family_name), '')
 
-            remove_list = []
-            remove_list.extend(all_style_names)
-            for v in weightsList:
-                remove_list.remove(v)
+            fonts.append((file_name, font, new_family_name))
+            style_names.append(style_name)
 
-            weight_string = self.__replaceListItems(
-                input_string=weight_string, remove_list=remove_list, keep_list=weightsList)
+        for (file_name, font, new_family_name), style in zip(fonts, tokenizer.parseMany(style_names)):
 
+            # If the style name contains a weight literal, the corresponding key will be the new usWeightClass.
+            # Otherwise usWeightClass is read from current font values. Same for widths.
             try:
-                new_usWeightClass = int(self.__getKeyFromValue(weights, weight_string))
-            except:
+                new_usWeightClass = int(style.weight)
+            except (TypeError, ValueError):
                 new_usWeightClass = font['OS/2'].usWeightClass
-
-            # At this point we retrieve the long and short weight literals.
-            try:
-                new_wgt = weights[str(new_usWeightClass)][0]
-            except KeyError:
-                new_wgt = str(new_usWeightClass)
-
-            try:
-                new_weight = weights[str(new_usWeightClass)][1]
-            except KeyError:
-                new_weight = str(new_usWeightClass)
-
-            # Same for widths
-
-            remove_list = []
-            remove_list.extend(all_style_names)
-            for v in widthsList:
-                remove_list.remove(v)
-
-            width_string = width_string.replace(weight_string, '')
-
-            width_string = self.__replaceListItems(
-                input_string=width_string, remove_list=remove_list, keep_list=widthsList)
+            new_wgt, new_weight = weights.get(str(new_usWeightClass), [str(new_usWeightClass)] * 2)
 
             try:
-                new_usWidthClass = int(self.__getKeyFromValue(widths, width_string))
-            except:
+                new_usWidthClass = int(style.width)
+            except (TypeError, ValueError):
                 new_usWidthClass = font['OS/2'].usWidthClass
-
-            try:
-                new_wdt = widths[str(new_usWidthClass)][0]
-            except KeyError:
-                new_wdt = str(new_usWidthClass)
-
-            try:
-                new_width = widths[str(new_usWidthClass)][1]
-            except KeyError:
-                new_width = str(new_usWidthClass)
+            new_wdt, new_width = widths.get(str(new_usWidthClass), [str(new_usWidthClass)] * 2)
 
             # We do not recalculate this because the bold bit will be set only if linked_styles is active while fixing
             # fonts.
-
             new_isBold = font.isBold()
 
-            # Recalculate italic bits
-
-            remove_list = []
-            remove_list.extend(all_style_names)
-            for v in italics:
-                remove_list.remove(v)
-
-            italic_string = self.__replaceListItems(
-                input_string=italic_string, remove_list=remove_list, keep_list=italics)
-
-            if italic_string.lower() == italics[0].lower() or italic_string == italics[1].lower():
-                new_isItalic = True
-            else:
-                new_isItalic = font.isItalic()
-
-            # Recalculate oblique bit
-
-            remove_list = []
-            remove_list.extend(weightsList)
-            remove_list.extend(widthsList)
-            remove_list.extend(italics)
-            remove_list.sort(key=len, reverse=True)
-
-            oblique_string = self.__replaceListItems(
-                input_string=oblique_string, remove_list=remove_list, keep_list=obliques)
-
             # By default, if a font is oblique, we also set it as italic. To change this behaviour, use the
             # -obni / --oblique-not-italic switch in recalc-names
-            if oblique_string.lower() == obliques[0].lower() or oblique_string == obliques[1].lower():
-                new_isOblique = True
-                new_isItalic = True
-            else:
-                new_isOblique = font.isOblique()
+            new_isItalic = True if style.italic or style.oblique else font.isItalic()
+            new_isOblique = True if style.oblique else font.isOblique()
 
             # Recalculate slope style names
-
-            italics.sort(key=len)
-            obliques.sort(key=len)
-
             new_slp = new_slope = None
             if new_isItalic == 1:
                 new_slp, new_slope = italics[0], italics[1]
@@ -233,6 +161,7 @@ class DataHandler(object):
 
             # Initialize the recalculated dictionary.
             recalculated_data = {
+                'file_name': file_name,
                 'attributes': {
                     'is_bold': new_isBold,
                     'is_italic': new_isItalic,
@@ -251,25 +180,6 @@ class DataHandler(object):
                 }
             }
 
-            json_data[file_name] = recalculated_data
-
-        with open(self.fonts_json, 'w') as f:
-            json.dump(json_data, f, indent=4)
+            records.set(recalculated_data)
 
-    @staticmethod
-    def __replaceListItems(input_string, remove_list, keep_list):
-        for word in remove_list:
-            if word not in keep_list:
-                input_string = input_string.lower().replace(word.lower().replace(' ', ''), '')
-                for k in keep_list:
-                    if word.lower() in k.lower():
-                        if len(input_string) > 0:
-                            input_string = input_string.lower().replace(k.lower().replace(word.lower(), ''), k)
-        return input_string
-
-    @staticmethod
-    def __getKeyFromValue(d, s):
-        for key, values in d.items():
-            for v in values:
-                if s.lower().replace(" ", "") == v.lower().replace(" ", ""):
-                    return key
+        self.saveRecords(records)
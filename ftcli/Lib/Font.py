@@ -1,23 +1,108 @@
+import filecmp
 import os
+import shutil
 import sys
+from io import BytesIO
 
 import click
 from fontTools.misc.textTools import num2binary
 from fontTools.misc.timeTools import timestampToString
 from fontTools.otlLib.maxContextCalc import maxCtxFont
 from fontTools.ttLib import TTFont
-from fontTools.ttLib import newTable
+from fontTools.ttLib import getTableClass, newTable
 from fontTools.ttLib.tables._n_a_m_e import (_MAC_LANGUAGE_CODES, _MAC_LANGUAGE_TO_SCRIPT, _WINDOWS_LANGUAGE_CODES)
 
-from ftcli.Lib.utils import calcCodePageRanges, intListToNum
+from ftcli.Lib.glyphBounds import GlyphBounds, OUTLINE_TABLES
+from ftcli.Lib.nameIndex import NameIndex
+from ftcli.Lib.sfnt import hasSameTables, writeSFNT
+from ftcli.Lib.utils import calcCodePageRanges, calcUnicodeRanges, intListToNum
 
 
 class Font(TTFont):
 
-    def __init__(self, file, recalcTimestamp=False):
-        super().__init__(file=file, recalcTimestamp=recalcTimestamp)
+    def __init__(self, file, recalcTimestamp=False, surgical=False):
+        """
+        :param file: Path to the font file.
+        :param recalcTimestamp: Set head.modified to current time when saving.
+        :param surgical: Only compile the tables that have been loaded when saving. The other tables are copied from
+            the source file as they are, and bounding boxes are not recalculated. Use it when editing tables that
+            don't affect the glyphs, like 'name', 'OS/2' or 'hhea'.
+        """
+        super().__init__(file=file, recalcTimestamp=recalcTimestamp, recalcBBoxes=not surgical)
         self.file = file
+        self.surgical = surgical
         self.has_changed = False
+        self.glyphBounds = GlyphBounds(self)
+        self.nameIndex = NameIndex(self)
+
+    def __setitem__(self, tag, table):
+        super().__setitem__(tag, table)
+        if tag in OUTLINE_TABLES:
+            self.glyphBounds.invalidate()
+        if tag == 'name':
+            self.nameIndex.invalidate()
+
+    def __delitem__(self, tag):
+        super().__delitem__(tag)
+        if tag in OUTLINE_TABLES:
+            self.glyphBounds.invalidate()
+        if tag == 'name':
+            self.nameIndex.invalidate()
+
+    def save(self, file, reorderTables=True) -> bool:
+        """
+        Saves the font, skipping the write when the tables are the same of the source file (see hasSameTables()).
+
+        In that case, if file is the source file nothing is written; otherwise the source file is copied, unless file
+        already is a copy of it. This way, unchanged files keep their modification time and aren't rewritten when
+        running a command again.
+
+        :param file: The output file path, or a writable file object.
+        :param reorderTables: See TTFont.save().
+        :return: True if the font has changed.
+        """
+        buffer = BytesIO()
+        self.__save(buffer, reorderTables)
+        data = buffer.getvalue()
+
+        changed = not (isinstance(self.file, str) and self.flavor is None and hasSameTables(data, self.file))
+        if hasattr(file, 'write'):
+            file.write(data)
+        elif changed:
+            with open(file, 'wb') as f:
+                f.write(data)
+        elif not os.path.exists(file) or not filecmp.cmp(self.file, file, shallow=False):
+            shutil.copy2(self.file, file)
+        return changed
+
+    def __save(self, file, reorderTables):
+        if not self.surgical or self.flavor is not None or self.reader is None or self.reader.flavor is not None:
+            return super().save(file, reorderTables=reorderTables)
+
+        if self.recalcTimestamp and 'head' in self:
+            self['head']  # make sure 'head' is loaded so the recalculation is actually done
+
+        # Loaded tables are compiled, the others are read from the source file. _writeTable() takes care of the
+        # dependencies between tables.
+        tables = {}
+        done = []
+        for tag in self.keys():
+            if tag != 'GlyphOrder':
+                self._writeTable(tag, tables, done)
+
+        # Checksums are calculated from the table data, rather than copied from the source directory, so that wrong
+        # checksums are fixed as they are by a full save.
+        tableOrder = list(self.reader.keys()) if reorderTables is False else None
+        writeSFNT(file, self.sfntVersion, tables, tableOrder=tableOrder)
+
+    def getGlyphOrder(self):
+        # The glyph order of CFF fonts is stored in the 'CFF ' table. In surgical mode, it is read from a copy of the
+        # table, so that 'CFF ' isn't loaded (and compiled again when saving) just because 'cmap' needs the glyph names.
+        if self.surgical and not hasattr(self, 'glyphOrder') and 'CFF ' in self and not self.isLoaded('CFF '):
+            cff = getTableClass('CFF ')('CFF ')
+            cff.decompile(self.reader['CFF '], self)
+            self.glyphOrder = cff.getGlyphOrder()
+        return super().getGlyphOrder()
 
     def recalcNames(
             self, font_data, namerecords_to_ignore=None, shorten_weight=None, shorten_width=None, shorten_slope=None,
@@ -328,68 +413,58 @@ class Font(TTFont):
         if language == 'ALL':
             windows = False
             mac = False
-            for name in self['name'].names:
-                if name.nameID == nameID:
-                    self['name'].removeNames(name.nameID, name.platformID, name.platEncID, name.langID)
+            if nameID is not None:
+                self.nameIndex.removeRecords(self.nameIndex.getRecords(nameID=nameID))
 
+        # Unknown languages have a None langID, that matches the records of all languages (see removeNames()).
         if windows is True:
             langID = _WINDOWS_LANGUAGE_CODES.get(language.lower())
-            self['name'].removeNames(nameID, 3, 1, langID)
+            self.nameIndex.removeRecords(self.nameIndex.getRecords(nameID, 3, 1, langID))
 
         if mac is True:
             macLang = _MAC_LANGUAGE_CODES.get(language.lower())
             macScript = _MAC_LANGUAGE_TO_SCRIPT.get(macLang)
-            self['name'].removeNames(nameID, 1, macScript, macLang)
+            self.nameIndex.removeRecords(self.nameIndex.getRecords(nameID, 1, macScript, macLang))
 
     def findReplace(self, oldString: str, newString: str, fixCFF=False, nameID=None, platform=None,
                     namerecords_to_ignore=None):
 
-        platforms_list = []
+        return self.replaceStrings(lambda s: s.replace(oldString, newString), fixCFF=fixCFF, nameID=nameID,
+                                   platform=platform, namerecords_to_ignore=namerecords_to_ignore)
 
-        if platform == 'mac':
-            platforms_list.append(1)
+    def replaceStrings(self, replace, fixCFF=False, nameID=None, platform=None, namerecords_to_ignore=None) -> int:
+        """
+        Replaces strings in the namerecords and, optionally, in the CFF font name and TopDict fields, in one pass.
 
-        if platform == 'win':
-            platforms_list.append(3)
+        :param replace: A function that takes a string and returns it with the replacements applied. See also
+            Replacements.replace().
+        :param fixCFF: Replace the strings also in the 'CFF ' table.
+        :param nameID: Only change the records with this nameID.
+        :param platform: Only change the records of this platform ('win' or 'mac').
+        :param namerecords_to_ignore: NameIDs of the records not to change, even if nameID is one of them.
+        :return: The number of changed strings.
+        """
 
-        if platform is None:
-            for name in self['name'].names:
-                if name.platformID not in platforms_list:
-                    platforms_list.append(name.platformID)
-
-        names_list = []
-
-        if nameID is not None:
-            for p in platforms_list:
-                names_list.append([p, nameID])
-
-        else:
-            for name in self['name'].names:
-                if name.platformID in platforms_list:
-                    names_list.append([name.platformID, name.nameID])
+        platformID = {'mac': 1, 'win': 3}.get(platform)
 
         # If a nameID is excluded, it won't be changed even if it has been explicitly included.
-        if namerecords_to_ignore:
-            for name in self['name'].names:
-                if name.nameID in namerecords_to_ignore and [name.platformID, name.nameID] in names_list:
-                    names_list.remove([name.platformID, name.nameID])
+        namerecords_to_ignore = set(namerecords_to_ignore or [])
 
         fixCount = 0
 
-        for name in self['name'].names:
-            if [name.platformID, name.nameID] in names_list:
-                if oldString in str(name):
-                    string = str(name).replace(oldString, newString).replace("  ", " ").strip()
-
-                    self['name'].setName(
-                        string, name.nameID, name.platformID, name.platEncID, name.langID)
-                    fixCount += 1
+        for name in self.nameIndex.getRecords(nameID=nameID, platformID=platformID):
+            if name.nameID in namerecords_to_ignore:
+                continue
+            string = str(name)
+            new_string = replace(string)
+            if new_string != string:
+                name.string = new_string.replace("  ", " ").strip()
+                fixCount += 1
 
         if 'CFF ' in self and fixCFF is True:
             try:
                 fontName = str(getattr(self['CFF '].cff, 'fontNames')[0])
-                fontName_new = fontName.replace(
-                    oldString, newString).replace("  ", " ").strip()
+                fontName_new = replace(fontName).replace("  ", " ").strip()
 
                 if not fontName == fontName_new:
                     fixCount += 1
@@ -403,7 +478,7 @@ class Font(TTFont):
             for a in attr_list:
                 try:
                     old_value = str(getattr(input_object, a))
-                    new_value = old_value.replace(oldString, newString).replace("  ", " ").strip()
+                    new_value = replace(old_value).replace("  ", " ").strip()
                     if not old_value == new_value:
                         fixCount += 1
                         setattr(input_object, a, new_value)
@@ -414,75 +489,33 @@ class Font(TTFont):
 
     def win2mac(self):
         self.removeEmptyNames()
-        for name in self['name'].names:
-            if name.platformID == 3:
-                string = name.toUnicode()
-                try:
-                    self.setMultilingualName(nameID=name.nameID, language='en', string=string, windows=False, mac=True)
-                except:
-                    # IMPORTANT: FOR NON STANDARD LANGUAGES ENCODINGS
-                    # MAYBE THERE'S A BETTER WAY?
-                    self.setMultilingualName(nameID=name.nameID, language='en', string=string.encode(), windows=False,
-                                             mac=True)
+        for name in self.nameIndex.getRecords(platformID=3):
+            string = name.toUnicode()
+            try:
+                self.setMultilingualName(nameID=name.nameID, language='en', string=string, windows=False, mac=True)
+            except:
+                # IMPORTANT: FOR NON STANDARD LANGUAGES ENCODINGS
+                # MAYBE THERE'S A BETTER WAY?
+                self.setMultilingualName(nameID=name.nameID, language='en', string=string.encode(), windows=False,
+                                         mac=True)
 
     def addPrefix(self, prefix: str, name_ids: list, platform: str = None):
-
-        platforms_list = [1, 3]
-        if platform == 'mac':
-            platforms_list = [1]
-        if platform == 'win':
-            platforms_list = [3]
-        if platform is None:
-            platforms_list = [1, 3]
-
-        for namerecord in self['name'].names:
-            for p in platforms_list:
-                for n in name_ids:
-                    if (namerecord.nameID, namerecord.platformID) == (n, p):
-                        platEncID = namerecord.platEncID
-                        langID = namerecord.langID
-                        original_string = self['name'].getName(nameID=n, platformID=p, platEncID=platEncID,
-                                                               langID=langID).toUnicode()
-                        prefixed_string = f'{prefix}{original_string}'
-                        self.setMultilingualName(nameID=n, windows=True if p == 3 else False,
-                                                 mac=True if p == 1 else False, string=prefixed_string)
+        for name in self.__getNameRecords(name_ids, platform):
+            name.string = f'{prefix}{name.toUnicode()}'
 
     def addSuffix(self, suffix: str, name_ids: list, platform: str = None):
-
-        platforms_list = []
-        if platform == 'mac':
-            platforms_list = [1]
-        if platform == 'win':
-            platforms_list = [3]
-        if platform is None:
-            platforms_list = [1, 3]
-
-        for namerecord in self['name'].names:
-            for p in platforms_list:
-                for n in name_ids:
-                    if (namerecord.nameID, namerecord.platformID) == (n, p):
-                        platEncID = namerecord.platEncID
-                        langID = namerecord.langID
-                        original_string = self['name'].getName(nameID=n, platformID=p, platEncID=platEncID,
-                                                               langID=langID).toUnicode()
-                        suffixed_string = f'{original_string}{suffix}'
-                        self.setMultilingualName(nameID=n, windows=True if p == 3 else False,
-                                                 mac=True if p == 1 else False, string=suffixed_string)
+        for name in self.__getNameRecords(name_ids, platform):
+            name.string = f'{name.toUnicode()}{suffix}'
 
     def removeEmptyNames(self):
-        for name in self['name'].names:
-            if len(str(name)) == 0:
-                self['name'].removeNames(
-                    name.nameID, name.platformID, name.platEncID, name.langID)
+        self.nameIndex.removeRecords([name for name in self.nameIndex.getRecords() if len(str(name)) == 0])
 
     def delMacNames(self, exclude_namerecord=None):
         if exclude_namerecord is None:
             exclude_namerecord = []
-        exclude_namerecord = [int(i) for i in exclude_namerecord]
-        for name in self['name'].names:
-            if name.platformID != 1 or name.nameID in exclude_namerecord:
-                continue
-            self['name'].removeNames(name.nameID, name.platformID, name.platEncID, name.langID)
+        exclude_namerecord = {int(i) for i in exclude_namerecord}
+        self.nameIndex.removeRecords(
+            [name for name in self.nameIndex.getRecords(platformID=1) if name.nameID not in exclude_namerecord])
 
     def modifyLinegapPercent(self, percent):
         try:
@@ -553,27 +586,24 @@ class Font(TTFont):
             sys.exit(1)
 
     def recalcXHeight(self) -> int:
-        metrics = self.getGlyphsMetrics()
-        try:
-            x_height = metrics['x']['yMax']
-        except KeyError:
-            x_height = 0
-        return round(x_height)
+        return self.__getGlyphYMax('x')
 
     def recalcCapHeight(self) -> int:
-        metrics = self.getGlyphsMetrics()
-        try:
-            cap_height = metrics['H']['yMax']
-        except KeyError:
-            cap_height = 0
-        return round(cap_height)
+        return self.__getGlyphYMax('H')
 
-    def recalcCodePageRanges(self) -> (int, int):
-        cmap = self['cmap']
+    def getUnicodes(self) -> set:
+        """
+        Returns the set of codepoints mapped in the Unicode subtables of the 'cmap' table.
+        """
         unicodes = set()
-        for table in cmap.tables:
+        for table in self['cmap'].tables:
             if table.isUnicode():
                 unicodes.update(table.cmap.keys())
+        return unicodes
+
+    def recalcCodePageRanges(self, unicodes: set = None) -> (int, int):
+        if unicodes is None:
+            unicodes = self.getUnicodes()
 
         codePageRanges = calcCodePageRanges(unicodes)
         ulCodePageRange1 = intListToNum(codePageRanges, 0, 32)
@@ -581,6 +611,15 @@ class Font(TTFont):
 
         return ulCodePageRange1, ulCodePageRange2
 
+    def recalcUnicodeRanges(self, unicodes: set = None) -> set:
+        """
+        Returns the ulUnicodeRange bits for the codepoints in the 'cmap' table. Unlike fontTools'
+        OS/2.recalcUnicodeRanges(), the OS/2 table is not modified.
+        """
+        if unicodes is None:
+            unicodes = self.getUnicodes()
+        return calcUnicodeRanges(unicodes)
+
     def recalcUsMaxContext(self) -> int:
         return maxCtxFont(self)
 
@@ -598,9 +637,10 @@ class Font(TTFont):
 
         # When upgrading from version is 0, at least ulCodePageRanges are to be recalculated.
         if current_version == 0:
+            ulCodePageRange1, ulCodePageRange2 = self.recalcCodePageRanges()
             attrs = {
-                'ulCodePageRange1': self.recalcCodePageRanges()[0],
-                'ulCodePageRange2': self.recalcCodePageRanges()[1],
+                'ulCodePageRange1': ulCodePageRange1,
+                'ulCodePageRange2': ulCodePageRange2,
             }
             for k, v in attrs.items():
                 setattr(self['OS/2'], k, v)
@@ -793,34 +833,11 @@ class Font(TTFont):
 
     def getGlyphsMetrics(self):
         glyphs_metrics = {}
-        glyphset = self.getGlyphSet()
-        for glyphname in glyphset.keys():
-
-            if 'glyf' in self:
-                glyph = self["glyf"][glyphname]
-                if glyph.numberOfContours == 0:
-                    # no data
-                    continue
-                glyph_metrics = {
-                    "xMin": glyph.xMin,
-                    "yMin": glyph.yMin,
-                    "xMax": glyph.xMax,
-                    "yMax": glyph.yMax,
-                }
-                glyphs_metrics[glyphname] = glyph_metrics
-
-            else:
-                bounds = self.getGlyphSet()[glyphname]._glyph.calcBounds(self.getGlyphSet())
-                if bounds is None:
-                    continue
-                glyph_metrics = {
-                    "xMin": bounds[0],
-                    "yMin": bounds[1],
-                    "xMax": bounds[2],
-                    "yMax": bounds[3],
-                }
-                glyphs_metrics[glyphname] = glyph_metrics
-
+        for glyphname, bounds in self.glyphBounds.getAllBounds().items():
+            if bounds is None:
+                # no data
+                continue
+            glyphs_metrics[glyphname] = dict(zip(('xMin', 'yMin', 'xMax', 'yMax'), bounds))
         return glyphs_metrics
 
     def getFontFeatures(self):
@@ -849,6 +866,18 @@ class Font(TTFont):
 
         return feature_tags
 
+    def __getGlyphYMax(self, char) -> int:
+        # The glyph is looked up in the 'cmap' table first, then by its standard name.
+        bounds = self.glyphBounds.getCharBounds(char)
+        if bounds is None and char in self.getGlyphOrder():
+            bounds = self.glyphBounds.getBounds(char)
+        return round(bounds[3]) if bounds is not None else 0
+
+    def __getNameRecords(self, nameIDs, platform=None) -> list:
+        platformIDs = {'mac': [1], 'win': [3]}.get(platform, [1, 3])
+        return [name for n in nameIDs for p in platformIDs
+                for name in self.nameIndex.getRecords(nameID=n, platformID=p)]
+
     def __setBoldBits(self):
         self['OS/2'].fsSelection = set_nth_bit(self['OS/2'].fsSelection, 5)
         self['head'].macStyle = set_nth_bit(self['head'].macStyle, 0)
@@ -1,11 +1,17 @@
 import logging
 import os
+from copy import deepcopy
+from io import BytesIO
 
-from fontTools.misc.cliTools import makeOutputFileName
+from fontTools.ttLib import newTable
+from fontTools.ttLib.tables.TupleVariation import TupleVariation
 from fontTools.ttLib.tables._f_v_a_r import NamedInstance
 from fontTools.ttLib.ttFont import TTFont
+from fontTools.varLib.instancer import instantiateVariableFont, OverlapMode
 from pathvalidate import sanitize_filename
 
+from ftcli.Lib.utils import OutputPathAllocator
+
 log = logging.getLogger(__name__)
 
 
@@ -25,6 +31,7 @@ class VariableFont(TTFont):
                             f"{', '.join([t for t in ['fvar', 'STAT', 'name'] if t not in self])}\n")
 
         self.gsubTable = self['GSUB'].table if 'GSUB' in self else None
+        self.__plan = None
 
     def getFamilyName(self):
         """
@@ -72,7 +79,7 @@ class VariableFont(TTFont):
         except:
             return None
 
-    def makeInstanceOutputFileName(self, instance: NamedInstance, outputDir, overWrite) -> str:
+    def makeInstanceOutputFileName(self, instance: NamedInstance, allocator: OutputPathAllocator) -> str:
         psname = self.getInstancePostscriptName(instance) if instance.postscriptNameID < 65535 else None
         family_name = self.getFamilyName()
         subfamily_name = self.getInstanceSubfamilyName(instance) if instance.subfamilyNameID > 0 else None
@@ -98,8 +105,7 @@ class VariableFont(TTFont):
 
         s = sanitize_filename(s)
         s = os.path.join(os.path.dirname(self.file), f"{s}{ext}")
-        output_file = makeOutputFileName(input=s, outputDir=outputDir, overWrite=overWrite)
-        return output_file
+        return allocator.allocate(s)
 
     def getNameIDsToDelete(self) -> list:
         name_ids_to_keep = sorted(list(set(n.nameID for n in self.nameTable.names if n.nameID < 25)))
@@ -137,24 +143,73 @@ class VariableFont(TTFont):
 
         return sorted(list(set(name_ids_to_delete)))
 
-    def cleanupInstance(self, nameIDsToDelete: list):
-        for n in self.nameTable.names:
-            if n.nameID in nameIDsToDelete:
-                self.nameTable.removeNames(n.nameID, n.platformID, n.platEncID, n.langID)
+    def getInstancingPlan(self) -> 'InstancingPlan':
+        """
+        Returns the work shared by all the instances of the font, computed on first call: the 'gvar' deltas, decompiled
+        once with the inferred deltas of the untouched points already calculated, and the name IDs to delete and to
+        renumber when cleaning up the instances.
+        """
+        if self.__plan is None:
+            with open(self.file, 'rb') as f:
+                data = f.read()
 
-        if self.gsubTable is not None:
-            named_features = []
-            for r in self.gsubTable.FeatureList.FeatureRecord:
-                try:
-                    named_features.append(r.Feature.FeatureParams.UINameID)
-                    named_features = list(set(named_features))
-                except:
-                    pass
+            variations = None
+            if 'gvar' in self:
+                glyf = self['glyf']
+                h_metrics = self['hmtx'].metrics
+                v_metrics = self['vmtx'].metrics if 'vmtx' in self else None
+                variations = {}
+                for glyph_name, tuple_variations in self['gvar'].variations.items():
+                    if tuple_variations:
+                        coordinates, controls = glyf._getCoordinatesAndControls(glyph_name, h_metrics, v_metrics)
+                        for v in tuple_variations:
+                            v.calcInferredDeltas(coordinates, controls.endPts)
+                    variations[glyph_name] = [(v.axes, v.coordinates) for v in tuple_variations]
 
-            feature_name_ids = [n.nameID for n in self.nameTable.names if n.nameID in named_features]
-            feature_name_ids = list(set(feature_name_ids))
+            name_ids_to_delete = self.getNameIDsToDelete()
+            name_table = deepcopy(self.nameTable)
+            _deleteNames(name_table, name_ids_to_delete)
+            feature_name_ids = self.__getFeatureNameIDs(name_table)
 
-            for count, value in enumerate(feature_name_ids, start=256):
+            self.__plan = InstancingPlan(data, variations, name_ids_to_delete, feature_name_ids)
+        return self.__plan
+
+    def makeInstance(self, coordinates: dict, updateFontNames=False, overlap=OverlapMode.REMOVE_AND_IGNORE_ERRORS) \
+            -> 'VariableFont':
+        """
+        Instantiates the font at the given coordinates using the instancing plan. The instance is built from a fresh
+        copy of the font data, with a copy of the precomputed 'gvar' deltas, instead of a deep copy of the font.
+        """
+        plan = self.getInstancingPlan()
+        font = VariableFont(BytesIO(plan.data), recalcTimestamp=self.recalcTimestamp)
+        font.file = self.file
+        if plan.variations is not None:
+            gvar = newTable('gvar')
+            gvar.version = 1
+            gvar.reserved = 0
+            gvar.variations = {
+                glyph_name: [TupleVariation(dict(axes), list(deltas)) for axes, deltas in tuple_variations]
+                for glyph_name, tuple_variations in plan.variations.items()
+            }
+            font['gvar'] = gvar
+        return instantiateVariableFont(varfont=font, axisLimits=coordinates, inplace=True,
+                                       updateFontNames=updateFontNames, optimize=True, overlap=overlap)
+
+    def cleanupInstance(self, nameIDsToDelete: list, featureNameIDs: list = None):
+        """
+        Deletes the names in nameIDsToDelete and renumbers the GSUB feature names from 256.
+
+        :param nameIDsToDelete: See getNameIDsToDelete().
+        :param featureNameIDs: Optionally, the list of (old, new) feature name IDs of the instancing plan. If not
+            provided, it's calculated from the name table.
+        """
+        _deleteNames(self.nameTable, nameIDsToDelete)
+
+        if self.gsubTable is not None:
+            if featureNameIDs is None:
+                featureNameIDs = self.__getFeatureNameIDs(self.nameTable)
+
+            for value, count in featureNameIDs:
                 for n in self.nameTable.names:
                     if n.nameID == value:
                         n.nameID = count
@@ -164,3 +219,38 @@ class VariableFont(TTFont):
                             r.Feature.FeatureParams.UINameID = count
                 except:
                     pass
+
+    def __getFeatureNameIDs(self, nameTable) -> list:
+        if self.gsubTable is None:
+            return []
+
+        named_features = []
+        for r in self.gsubTable.FeatureList.FeatureRecord:
+            try:
+                named_features.append(r.Feature.FeatureParams.UINameID)
+                named_features = list(set(named_features))
+            except:
+                pass
+
+        feature_name_ids = [n.nameID for n in nameTable.names if n.nameID in named_features]
+        feature_name_ids = list(set(feature_name_ids))
+
+        return [(value, count) for count, value in enumerate(feature_name_ids, start=256)]
+
+
+class InstancingPlan(object):
+    """
+    Work shared by all the instances of a variable font. See VariableFont.getInstancingPlan().
+    """
+
+    def __init__(self, data: bytes, variations: dict, nameIDsToDelete: list, featureNameIDs: list):
+        self.data = data
+        self.variations = variations
+        self.nameIDsToDelete = nameIDsToDelete
+        self.featureNameIDs = featureNameIDs
+
+
+def _deleteNames(nameTable, nameIDsToDelete):
+    for n in nameTable.names:
+        if n.nameID in nameIDsToDelete:
+            nameTable.removeNames(n.nameID, n.platformID, n.platEncID, n.langID)
@@ -0,0 +1,156 @@
+import contextlib
+import functools
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from ftcli.Lib.utils import OutputPathAllocator
+
+
+def getJobs() -> int:
+    """
+    Returns the number of worker processes requested with the global -j/--jobs option. A value of 0 means 'use all
+    available CPUs'.
+    """
+    jobs = 1
+    ctx = click.get_current_context(silent=True)
+    if ctx is not None:
+        jobs = ctx.find_root().params.get('jobs', 1)
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+
+def makeOutputFileNames(files: list, outputDir=None, extension=None, overWrite=False, allocator=None) -> list:
+    """
+    Generates the output file names for a batch of files, in input order.
+
+    Names are calculated before the files are processed, so that they don't depend on the order in which the workers
+    complete their tasks.
+
+    :param allocator: Optionally, an OutputPathAllocator shared by more calls for the same batch (for example, to write
+        more files for each input file). If specified, outputDir and overWrite are ignored.
+    """
+    if allocator is None:
+        allocator = OutputPathAllocator(outputDir=outputDir, overWrite=overWrite)
+    return [allocator.allocate(f, extension=extension) for f in files]
+
+
+def runBatch(worker, files: list, outputFiles: list = None, jobs: int = None, taskKwargs: list = None,
+             labels: list = None, **kwargs) -> int:
+    """
+    Calls worker(file, output_file, **kwargs) for each file and prints the messages it returns.
+
+    The worker must be a module level function returning a list of (message, color) tuples. When more than one job is
+    requested, files are processed in a pool of processes; results are printed in input order as soon as they are
+    available. Exceptions raised by the worker are reported and don't stop the batch.
+
+    :param worker: The function that processes a single file.
+    :param files: The list of files to process.
+    :param outputFiles: The output file names, one for each file. See makeOutputFileNames().
+    :param jobs: The number of processes to use. If not specified, the value of the global -j/--jobs option is used.
+    :param taskKwargs: Optionally, the keyword arguments that change from file to file, one dict for each file. They
+        are passed to the worker along with kwargs.
+    :param labels: Optionally, the names used to report the errors, one for each file. By default, errors are reported
+        with the input file name.
+    :return: The number of files that could not be processed.
+    """
+    if outputFiles is None:
+        outputFiles = [None] * len(files)
+    if taskKwargs is None:
+        taskKwargs = [{}] * len(files)
+    if labels is None:
+        labels = [os.path.basename(f) for f in files]
+    if jobs is None:
+        jobs = getJobs()
+
+    errors = 0
+
+    if jobs > 1 and len(files) > 1:
+        jobs = min(jobs, len(files))
+        task = functools.partial(_runTask, worker, kwargs, True)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            chunksize = _getChunkSize(len(files), jobs)
+            for messages, failed in executor.map(task, files, outputFiles, taskKwargs, labels, chunksize=chunksize):
+                errors += _printMessages(messages, failed)
+    else:
+        task = functools.partial(_runTask, worker, kwargs, False)
+        for messages, failed in map(task, files, outputFiles, taskKwargs, labels):
+            errors += _printMessages(messages, failed)
+
+    if errors > 0 and len(files) > 1:
+        click.secho(f'\n{errors} of {len(files)} files could not be processed.', fg='red')
+
+    return errors
+
+
+def mapBatch(function, files: list, jobs: int = None, **kwargs) -> list:
+    """
+    Calls function(file, **kwargs) for each file and returns the results, in input order.
+
+    Like runBatch(), files are processed in a pool of processes when more than one job is requested, and the function
+    must be defined at module level. Exceptions raised by the function are returned in place of the results, so that a
+    single file doesn't stop the batch.
+
+    :param function: The function that processes a single file.
+    :param files: The list of files to process.
+    :param jobs: The number of processes to use. If not specified, the value of the global -j/--jobs option is used.
+    :return: The list of results.
+    """
+    if jobs is None:
+        jobs = getJobs()
+
+    task = functools.partial(_mapTask, function, kwargs)
+    if jobs > 1 and len(files) > 1:
+        jobs = min(jobs, len(files))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(task, files, chunksize=_getChunkSize(len(files), jobs)))
+    return list(map(task, files))
+
+
+def saveFont(font, outputFile: str, message: str = 'saved') -> list:
+    """
+    Saves a font and returns the worker messages, reporting whether the file has changed. See Font.save().
+
+    :param font: The Font to save.
+    :param outputFile: The output file path.
+    :param message: The message printed when the font has changed.
+    """
+    if font.save(outputFile):
+        return [(f'{os.path.basename(outputFile)} --> {message}', 'green')]
+    return [(f'{os.path.basename(outputFile)} --> no changes', 'yellow')]
+
+
+def _runTask(worker, kwargs, captureOutput, file, output_file, fileKwargs, label):
+    # In a pool, anything the worker prints directly is captured and returned along with its messages, so that the
+    # output of different files doesn't get mixed up.
+    stdout = io.StringIO()
+    with contextlib.redirect_stdout(stdout) if captureOutput else contextlib.nullcontext():
+        try:
+            messages, failed = worker(file, output_file, **kwargs, **fileKwargs) or [], False
+        except Exception as e:
+            messages, failed = [(f'{label} --> ERROR: {e}', 'red')], True
+    printed = stdout.getvalue().rstrip('\n')
+    if printed:
+        messages = [(printed, None)] + messages
+    return messages, failed
+
+
+def _mapTask(function, kwargs, file):
+    try:
+        return function(file, **kwargs)
+    except Exception as e:
+        return e
+
+
+def _printMessages(messages, failed) -> int:
+    for message, color in messages:
+        click.secho(message, fg=color)
+    return int(failed)
+
+
+def _getChunkSize(count, jobs) -> int:
+    # Small chunks keep the output flowing, large ones reduce the inter-process overhead on big batches.
+    return max(1, min(16, count // (jobs * 4)))
@@ -1,9 +1,11 @@
 import csv
 import os
 
-from ftcli.Lib.Font import Font
 from ftcli.Lib.configHandler import configHandler
-from ftcli.Lib.utils import (getFontsList, getSourceString, guessFamilyName)
+from ftcli.Lib.metadataCache import MetadataCache
+from ftcli.Lib.recordStore import RecordStore
+from ftcli.Lib.styleTokenizer import StyleTokenizer
+from ftcli.Lib.utils import (getFontsList, getSourceStrings)
 
 
 class csvHandler(object):
@@ -16,202 +18,88 @@ class csvHandler(object):
             data = [row for row in csv.DictReader(f, delimiter=";")]
         return data
 
-    def recalcCSV(self, config_file, family_name=None, source_string='fname'):
-        # Recalculates each line in the CSV file comparing a string with the
-        # values in the JSON config file.
+    def getRecords(self) -> RecordStore:
+        """
+        Returns the CSV rows as a RecordStore indexed by file name. If the CSV file doesn't exist, the store is empty.
+        """
+        data = self.getData() if os.path.exists(self.csv_file) else []
+        return RecordStore(data, key='file_name', normalize=_csvValue)
+
+    def saveRecords(self, records: RecordStore) -> bool:
+        """
+        Writes the records to the CSV file, only if some of them have been added, modified or removed.
+
+        :return: True if the file has been written.
+        """
+        if not records.isDirty and os.path.exists(self.csv_file):
+            return False
+        self.writeCSV(records.toList())
+        records.markClean()
+        return True
+
+    def recalcCSV(self, config_file, family_name=None, source_string='fname') -> bool:
+        # Recalculates each line in the CSV file parsing a source string with the literals in the JSON config file.
+        # Returns True if the CSV file has been written, False if no line has changed.
 
         files = getFontsList(os.path.dirname(self.csv_file))
         config = configHandler(config_file).getConfig()
-        current_csv_data = csvHandler(self.csv_file).getData()
-        new_csv_data = []
+        records = self.getRecords()
+        tokenizer = StyleTokenizer(config)
 
         # Read the configuration file
         weights = config['weights']
         widths = config['widths']
-        italics = config['italics']
-        obliques = config['obliques']
-
-        # Build a list of the literals of all widths in the configuration file.
-        widthsList = []
-        for values in widths.values():
-            for value in values:
-                widthsList.append(value)
-
-        # Build a list of the literals of all weights in the configuration file.
-        weightsList = []
-        for values in weights.values():
-            for value in values:
-                weightsList.append(value)
-
-        # Sort by reverse length the lists to ensure that long literals are processed before the short ones.
-        widthsList.sort(key=len, reverse=True)
-        weightsList.sort(key=len, reverse=True)
-        italics.sort(key=len, reverse=True)
-        obliques.sort(key=len, reverse=True)
+        italics = sorted(config['italics'], key=len)
+        obliques = sorted(config['obliques'], key=len)
 
-        for f in files:
-            font = Font(f, recalcTimestamp=False)
-            file_name = os.path.basename(f)
+        with MetadataCache() as cache:
+            fonts = [cache.get(f) for f in files]
 
-            # Get the source string
-            string = getSourceString(f, source_string)
+        # Get the source strings
+        strings = getSourceStrings(files, source_string, fonts=fonts)
 
-            # Remove dashes, underscores and spaces from the string
-            string = string.lower().replace("-", "").replace("_", "").replace(" ", "")
-
-            try:
-                wgt, weight = weights[str(font['OS/2'].usWeightClass)]
-            except KeyError:
-                wgt, weight = [font['OS/2'].usWeightClass, font['OS/2'].usWeightClass]
-
-            try:
-                wdt, width = widths[str(font['OS/2'].usWidthClass)]
-            except KeyError:
-                wdt, width = [font['OS/2'].usWidthClass, font['OS/2'].usWidthClass]
-
-            italics.sort(key=len)
-            obliques.sort(key=len)
-
-            slp = slope = None
-            if font.isItalic() is True:
-                slp, slope = italics[0], italics[1]
-            if font.isOblique() is True:
-                slp, slope = obliques[0], obliques[1]
-
-            # Build the dictionary with the current values
+        family_names = []
+        style_names = []
+        for f, string in zip(files, strings):
+            file_name = os.path.basename(f)
 
+            # In case the family name isn't passed as parameter, we use the one stored in the CSV
             new_family_name = ""
             if family_name is None:
-                for row in current_csv_data:
-                    if row['file_name'] == file_name:
-                        new_family_name = row['family_name']
+                if file_name in records:
+                    new_family_name = records[file_name]['family_name']
             else:
                 new_family_name = family_name
 
-            this_font_data = {
-                'file_name': file_name,
-                'family_name': new_family_name,
-                'is_bold': int(font.isBold()),
-                'is_italic': int(font.isItalic()),
-                'is_oblique': int(font.isOblique()),
-                'uswidthclass': int(font['OS/2'].usWidthClass),
-                'wdt': str(wdt),
-                'width': str(width),
-                'usweightclass': int(font['OS/2'].usWeightClass),
-                'wgt': str(wgt),
-                'weight': str(weight),
-                'slp': str(slp),
-                'slope': str(slope)
-            }
-
-            # Remove the family name from the string
-            style_name = string.replace(new_family_name.lower().replace(
-                ' ', '').replace('-', '').replace('_', '').replace(' ', ''), '')
-
-            # Once removed the family name, the remaining string should be == style name (width/weight/slope)
-            weight_string = width_string = italic_string = oblique_string = style_name
-
-            # We remove all the widths and italics literals from the string, and what remains should be == the weight
-            # literal (long or short has no importance).
-            # If the obtained string is == to one of the weight literals, the corresponding key will be the new
-            # usWeightClass. Otherwise usWeightClass is read from current font values.
-
-            remove_list = []
-            remove_list.extend(widthsList)
-            remove_list.extend(italics)
-            remove_list.extend(obliques)
-            remove_list.sort(key=len, reverse=True)
+            # If the source string can't be read from the font, use the file name.
+            if not string:
+                string = os.path.splitext(file_name)[0]
 
-            weight_string = self.__replaceListItems(
-                input_string=weight_string, remove_list=remove_list, keep_list=weightsList)
+            # Remove dashes, underscores and spaces from the string. Once removed the family name, the remaining
+            # string should be == style name (width/weight/slope)
+            family_names.append(new_family_name)
+            style_names.append(tokenizer.normalize(string).replace(tokenizer.normalize(new_family_name), ''))
 
-            if self.__getKeyFromValue(weights, weight_string) is not None:
-                new_usWeightClass = self.__getKeyFromValue(weights, weight_string)
-            else:
-                new_usWeightClass = this_font_data['usweightclass']
-
-            # At this point we retrieve the long and short weight literals.
-            try:
-                new_wgt = weights[new_usWeightClass][0]
-            except KeyError:
-                new_wgt = this_font_data['wgt']
-
-            try:
-                new_weight = weights[new_usWeightClass][1]
-            except KeyError:
-                new_weight = this_font_data['weight']
-
-            # Same for widths
-
-            remove_list = []
-            remove_list.extend(weightsList)
-            remove_list.extend(italics)
-            remove_list.extend(obliques)
-            remove_list.sort(key=len, reverse=True)
-
-            width_string = width_string.replace(weight_string, '')
-
-            width_string = self.__replaceListItems(
-                input_string=width_string, remove_list=remove_list, keep_list=widthsList)
-
-            if self.__getKeyFromValue(widths, width_string) is not None:
-                new_usWidthClass = self.__getKeyFromValue(widths, width_string)
-            else:
-                new_usWidthClass = this_font_data['uswidthclass']
+        for f, font, new_family_name, style in zip(files, fonts, family_names, tokenizer.parseMany(style_names)):
+            file_name = os.path.basename(f)
 
-            try:
-                new_wdt = widths[new_usWidthClass][0]
-            except KeyError:
-                new_wdt = this_font_data['wdt']
+            # If the style name contains a weight literal, the corresponding key will be the new usWeightClass.
+            # Otherwise usWeightClass is read from current font values. Same for widths.
+            new_usWeightClass = style.weight if style.weight is not None else font.usWeightClass
+            new_wgt, new_weight = weights.get(str(new_usWeightClass), [new_usWeightClass, new_usWeightClass])
 
-            try:
-                new_width = widths[new_usWidthClass][1]
-            except KeyError:
-                new_width = this_font_data['width']
+            new_usWidthClass = style.width if style.width is not None else font.usWidthClass
+            new_wdt, new_width = widths.get(str(new_usWidthClass), [new_usWidthClass, new_usWidthClass])
 
             # We ignore this because the bold bit will be set only if linked_styles is active while fixing fonts.
-            new_isBold = this_font_data['is_bold']
-
-            # Recalculate italic bits
-
-            remove_list = []
-            remove_list.extend(weightsList)
-            remove_list.extend(widthsList)
-            remove_list.extend(obliques)
-            remove_list.sort(key=len, reverse=True)
-
-            italic_string = self.__replaceListItems(
-                input_string=italic_string, remove_list=remove_list, keep_list=italics)
-
-            if italic_string.lower() == italics[0].lower() or italic_string == italics[1].lower():
-                new_isItalic = 1
-            else:
-                new_isItalic = 0
-
-            # Recalculate oblique bit
-
-            remove_list = []
-            remove_list.extend(weightsList)
-            remove_list.extend(widthsList)
-            remove_list.extend(italics)
-            remove_list.sort(key=len, reverse=True)
-
-            oblique_string = self.__replaceListItems(
-                input_string=oblique_string, remove_list=remove_list, keep_list=obliques)
+            new_isBold = int(font.isBold())
 
             # By default, if a font is oblique, we also set it as italic. To change this behaviour, use the
             # -ob / --oblique-not-italic switch in recalc-names
-            if oblique_string.lower() == obliques[0].lower() or oblique_string == obliques[1].lower():
-                new_isOblique = 1
-                new_isItalic = 1
-            else:
-                new_isOblique = 0
+            new_isItalic = int(style.italic or style.oblique)
+            new_isOblique = int(style.oblique)
 
             # Recalculate slope style names
-
-            italics.sort(key=len)
-            obliques.sort(key=len)
-
             new_slp = new_slope = None
             if new_isItalic == 1:
                 new_slp, new_slope = italics[0], italics[1]
@@ -224,35 +112,38 @@ class csvHandler(object):
                              'wdt': new_wdt, 'width': new_width, 'usweightclass': new_usWeightClass, 'wgt': new_wgt,
                              'weight': new_weight, 'slp': new_slp, 'slope': new_slope}
 
-            new_csv_data.append(new_font_data)
+            records.set(new_font_data)
 
-        self.writeCSV(new_csv_data)
+        # Rows of files that are no longer in the folder are dropped.
+        records.retain(os.path.basename(f) for f in files)
+        return self.saveRecords(records)
 
     def resetCSV(self, config_file):
 
         files = getFontsList(os.path.dirname(self.csv_file))
         config = configHandler(config_file).getConfig()
-        csv_data = []
+        records = self.getRecords()
 
+        cache = MetadataCache()
         for f in files:
 
             this_font_filename = os.path.basename(f)
-            font = Font(f, recalcTimestamp=False)
+            font = cache.get(f)
             is_bold = int(font.isBold())
             is_italic = int(font.isItalic())
             is_oblique = int(font.isOblique())
-            usWidthClass = int(font['OS/2'].usWidthClass)
-            usWeightClass = int(font['OS/2'].usWeightClass)
+            usWidthClass = int(font.usWidthClass)
+            usWeightClass = int(font.usWeightClass)
 
             try:
-                wgt, weight = config['weights'][str(font['OS/2'].usWeightClass)]
+                wgt, weight = config['weights'][str(font.usWeightClass)]
             except KeyError:
-                wgt, weight = [font['OS/2'].usWeightClass, font['OS/2'].usWeightClass]
+                wgt, weight = [font.usWeightClass, font.usWeightClass]
 
             try:
-                wdt, width = config['widths'][str(font['OS/2'].usWidthClass)]
+                wdt, width = config['widths'][str(font.usWidthClass)]
             except KeyError:
-                wdt, width = [font['OS/2'].usWidthClass, font['OS/2'].usWidthClass]
+                wdt, width = [font.usWidthClass, font.usWidthClass]
 
             slp = slope = None
 
@@ -262,7 +153,7 @@ class csvHandler(object):
             if is_oblique == 1:
                 slp, slope = config['obliques'][0], config['obliques'][1]
 
-            family_name = guessFamilyName(font)
+            family_name = font.familyName
 
             this_font_data = {
                 'file_name': this_font_filename,
@@ -280,9 +171,11 @@ class csvHandler(object):
                 'slope': slope
             }
 
-            csv_data.append(this_font_data)
+            records.set(this_font_data)
+        cache.close()
 
-        self.writeCSV(csv_data)
+        records.retain(os.path.basename(f) for f in files)
+        self.saveRecords(records)
 
     def writeCSV(self, data):
 
@@ -293,18 +186,7 @@ class csvHandler(object):
             writer.writeheader()
             writer.writerows(data)
 
-    def __replaceListItems(self, input_string, remove_list, keep_list):
-        for word in remove_list:
-            if word not in keep_list:
-                input_string = input_string.lower().replace(word.lower().replace(' ', ''), '')
-                for k in keep_list:
-                    if word.lower() in k.lower():
-                        if len(input_string) > 0:
-                            input_string = input_string.lower().replace(k.lower().replace(word.lower(), ''), k)
-        return input_string
-
-    def __getKeyFromValue(self, d, s):
-        for key, values in d.items():
-            for v in values:
-                if s.lower().replace(" ", "") == v.lower().replace(" ", ""):
-                    return key
+
+def _csvValue(value) -> str:
+    # Values are compared as they are written to and read from the CSV file.
+    return '' if value is None else str(value)
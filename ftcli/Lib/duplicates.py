@@ -0,0 +1,153 @@
+import hashlib
+import struct
+
+from fontTools.pens.hashPointPen import HashPointPen
+from fontTools.pens.pointPen import SegmentToPointPen
+from fontTools.ttLib import TTFont
+
+from ftcli.Lib.batch import mapBatch
+from ftcli.Lib.sfnt import maskHead, readFontDescriptor
+
+
+class FontFingerprint(object):
+    """
+    The values used to find the duplicates of a font, read from the table directory and from the 'maxp' table. See
+    readFingerprint().
+    """
+
+    def __init__(self, file, size, flavor, directoryKey, numGlyphs):
+        self.file = file
+        self.size = size
+        self.flavor = flavor
+        # The sfnt version, and tag, length and checksum of all tables but 'head'.
+        self.directoryKey = directoryKey
+        self.numGlyphs = numGlyphs
+
+
+class DuplicateIndex(object):
+    """
+    Groups the exact duplicates and the near-duplicates in a set of fonts.
+
+    Exact duplicates have the same flavor and the same tables. head.checkSumAdjustment and head.modified are ignored, as
+    well as the order of the tables. Most fonts are told apart by the lengths and checksums in their table
+    directories; the table data is read and hashed only for the fonts that can't.
+
+    Near-duplicates have the same outlines, mapped to the same characters, but different tables (for example, the same
+    font with different names, hinting or flavor). Outlines are hashed only for the fonts with the same number of
+    glyphs of some other font.
+
+    Files are processed in parallel with the global -j/--jobs option.
+
+    :param files: The font files to index.
+    :param nearDuplicates: Also look for near-duplicates.
+    :param jobs: The number of processes to use. See mapBatch().
+    """
+
+    def __init__(self, files: list, nearDuplicates=True, jobs=None):
+        self.errors = {}
+        fingerprints = self.__collect(mapBatch(readFingerprint, files, jobs=jobs), files)
+
+        # Exact duplicates.
+        groups = _groupBy(fingerprints, lambda f: (f.flavor, f.directoryKey))
+        candidates = [f for group in groups if len(group) > 1 for f in group]
+        contentKeys = dict(zip([f.file for f in candidates], self.__collect(
+            mapBatch(readContentKey, [f.file for f in candidates], jobs=jobs), [f.file for f in candidates])))
+        classes = []
+        for group in groups:
+            if len(group) == 1:
+                classes.append(group)
+                continue
+            classes.extend(_groupBy([f for f in group if f.file in contentKeys], lambda f: contentKeys[f.file]))
+        self.exactGroups = [[f.file for f in c] for c in classes if len(c) > 1]
+
+        # Near-duplicates: one font for each class of exact duplicates is enough.
+        self.nearGroups = []
+        if nearDuplicates:
+            sameGlyphs = [g for g in _groupBy([c[0] for c in classes], lambda f: f.numGlyphs) if len(g) > 1]
+            files = [f.file for group in sameGlyphs for f in group]
+            outlineKeys = dict(zip(files, self.__collect(mapBatch(readOutlineHash, files, jobs=jobs), files)))
+            byFile = {c[0].file: c for c in classes}
+            for group in sameGlyphs:
+                group = [f for f in group if f.file in outlineKeys]
+                for near in _groupBy(group, lambda f: outlineKeys[f.file]):
+                    if len(near) > 1:
+                        self.nearGroups.append([f.file for r in near for f in byFile[r.file]])
+
+        self.__sizes = {f.file: f.size for f in fingerprints}
+
+    def getDuplicates(self) -> dict:
+        """
+        Returns a dictionary mapping each exact duplicate to the first file of its group.
+        """
+        return {file: group[0] for group in self.exactGroups for file in group[1:]}
+
+    def getWastedSize(self) -> int:
+        """
+        Returns the total size of the exact duplicates, in bytes.
+        """
+        return sum(self.__sizes[file] for file in self.getDuplicates())
+
+    def __collect(self, results, files):
+        # Results of mapBatch(): exceptions are stored in errors, and the files are left out of the index.
+        values = []
+        for file, result in zip(files, results):
+            if isinstance(result, Exception):
+                self.errors[file] = result
+            else:
+                values.append(result)
+        return values
+
+
+def readFingerprint(file: str) -> FontFingerprint:
+    descriptor = readFontDescriptor(file)
+    if descriptor is None:
+        raise ValueError('not a valid font file')
+    directoryKey = (descriptor.sfntVersion, tuple(sorted(
+        (tag, entry.length, entry.checkSum) for tag, entry in descriptor.tables.items() if tag != 'head')))
+    numGlyphs = struct.unpack_from('>H', descriptor.readTable('maxp'), 4)[0] if 'maxp' in descriptor else 0
+    return FontFingerprint(file, descriptor.size, descriptor.flavor, directoryKey, numGlyphs)
+
+
+def readContentKey(file: str) -> str:
+    """
+    Returns a hash of the data of all tables, in tag order, with head.checkSumAdjustment and head.modified masked.
+    """
+    descriptor = readFontDescriptor(file)
+    sha = hashlib.sha256()
+    tables = descriptor.readTables(descriptor.tags)
+    for tag in sorted(tables):
+        sha.update(tag.encode('latin-1'))
+        sha.update(maskHead(tables[tag]) if tag == 'head' else tables[tag])
+    return sha.hexdigest()
+
+
+def readOutlineHash(file: str) -> str:
+    """
+    Returns a hash of the outlines and advance widths of the glyphs, independent of glyph names, glyph order and
+    hinting. Glyphs mapped to a character are hashed along with the code point.
+    """
+    font = TTFont(file, lazy=True)
+    glyphSet = font.getGlyphSet()
+    hashes = {}
+    for glyphName in font.getGlyphOrder():
+        glyph = glyphSet[glyphName]
+        pen = HashPointPen(glyph.width, glyphSet)
+        glyph.draw(SegmentToPointPen(pen))
+        hashes[glyphName] = pen.hash
+    cmap = font.getBestCmap() or {}
+    font.close()
+
+    sha = hashlib.sha256()
+    for codepoint, glyphName in sorted(cmap.items()):
+        sha.update(f'{codepoint}:{hashes[glyphName]}\n'.encode('ascii'))
+    for h in sorted(hashes.values()):
+        sha.update(f'{h}\n'.encode('ascii'))
+    return sha.hexdigest()
+
+
+def _groupBy(items, key):
+    groups = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    return list(groups.values())
+
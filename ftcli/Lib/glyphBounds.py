@@ -0,0 +1,125 @@
+from fontTools.misc.arrayTools import calcIntBounds
+from fontTools.misc.roundTools import otRound
+from fontTools.pens.boundsPen import BoundsPen
+from fontTools.ttLib import getTableClass
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Tables containing the glyph outlines. When one of them changes, the bounds must be calculated again.
+OUTLINE_TABLES = ('glyf', 'CFF ', 'CFF2')
+
+
+class GlyphBounds(object):
+    """
+    Calculates and memoizes the bounds (xMin, yMin, xMax, yMax) of the glyphs of a font.
+
+    Bounds are calculated only for the requested glyphs, that can be looked up by glyph name or by character (resolved
+    through the 'cmap' table). Empty glyphs have None bounds. Call invalidate() after modifying the outlines in place;
+    Font does it automatically when the 'glyf', 'CFF ' or 'CFF2' tables are replaced or deleted.
+
+    If the font is opened in surgical mode, outlines are read from a copy of the tables, so that they aren't compiled
+    again when the font is saved.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.__bounds = {}
+        self.__tables = {}
+        self.__glyphSet = None
+
+    def getBounds(self, glyphName: str) -> tuple:
+        if glyphName not in self.__bounds:
+            self.__bounds[glyphName] = self.__calcBounds(glyphName)
+        return self.__bounds[glyphName]
+
+    def getCharBounds(self, char: str) -> tuple:
+        """
+        Returns the bounds of the glyph mapped to a character, or None if the character isn't encoded.
+        """
+        glyphName = self.getGlyphName(char)
+        return self.getBounds(glyphName) if glyphName is not None else None
+
+    def getGlyphName(self, char: str) -> str:
+        cmap = self.__getTable('cmap').getBestCmap() if 'cmap' in self.font else None
+        return cmap.get(ord(char)) if cmap else None
+
+    def getAllBounds(self) -> dict:
+        """
+        Returns a dictionary with the bounds of all glyphs. For TrueType flavored fonts, if NumPy is installed, the
+        bounds are calculated in bulk from the coordinates of all glyphs.
+        """
+        glyphOrder = self.font.getGlyphOrder()
+        missing = [g for g in glyphOrder if g not in self.__bounds]
+        if missing and np is not None and 'glyf' in self.font:
+            self.__bounds.update(self.__calcBoundsNumpy(missing))
+        return {g: self.getBounds(g) for g in glyphOrder}
+
+    def invalidate(self, glyphNames=None):
+        """
+        Forgets the calculated bounds of the glyphs in glyphNames, or of all glyphs if glyphNames is None.
+        """
+        self.__tables.clear()
+        self.__glyphSet = None
+        if glyphNames is None:
+            self.__bounds.clear()
+        else:
+            for glyphName in glyphNames:
+                self.__bounds.pop(glyphName, None)
+
+    def __calcBounds(self, glyphName):
+        if 'glyf' in self.font:
+            glyf = self.__getTable('glyf')
+            glyph = glyf[glyphName]
+            if glyph.numberOfContours == 0:
+                return None
+            coordinates, _, _ = glyph.getCoordinates(glyf)
+            if len(coordinates) == 0:
+                return None
+            return calcIntBounds(coordinates)
+
+        if self.__glyphSet is None:
+            if 'CFF ' in self.font:
+                self.__glyphSet = self.__getTable('CFF ').cff.topDictIndex[0].CharStrings
+            else:
+                self.__glyphSet = self.font.getGlyphSet()
+        pen = BoundsPen(self.__glyphSet)
+        self.__glyphSet[glyphName].draw(pen)
+        return pen.bounds
+
+    def __getTable(self, tag):
+        if tag not in self.__tables:
+            if getattr(self.font, 'surgical', False) and not self.font.isLoaded(tag):
+                table = getTableClass(tag)(tag)
+                table.decompile(self.font.reader[tag], self.font)
+            else:
+                table = self.font[tag]
+            self.__tables[tag] = table
+        return self.__tables[tag]
+
+    def __calcBoundsNumpy(self, glyphNames):
+        glyf = self.__getTable('glyf')
+        bounds = {}
+        names = []
+        arrays = []
+        for glyphName in glyphNames:
+            glyph = glyf[glyphName]
+            coordinates = glyph.getCoordinates(glyf)[0] if glyph.numberOfContours != 0 else ()
+            if len(coordinates) == 0:
+                bounds[glyphName] = None
+                continue
+            names.append(glyphName)
+            arrays.append(np.frombuffer(coordinates.array, dtype=np.float64).reshape(-1, 2))
+
+        if arrays:
+            # Min and max of the points of each glyph, in a single pass over the coordinates of all glyphs.
+            offsets = np.cumsum([0] + [len(a) for a in arrays[:-1]])
+            points = np.concatenate(arrays)
+            mins = np.minimum.reduceat(points, offsets)
+            maxs = np.maximum.reduceat(points, offsets)
+            for glyphName, (xMin, yMin), (xMax, yMax) in zip(names, mins.tolist(), maxs.tolist()):
+                bounds[glyphName] = (otRound(xMin), otRound(yMin), otRound(xMax), otRound(yMax))
+
+        return bounds
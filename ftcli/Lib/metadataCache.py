@@ -0,0 +1,252 @@
+import json
+import os
+import sqlite3
+
+import click
+from fontTools.misc.timeTools import timestampToString
+
+from ftcli.Lib.Font import Font
+from ftcli.Lib.utils import getCFFNames, guessFamilyName, is_nth_bit_set
+
+# Bump this number when the content of FontMetadata changes, to invalidate the cached entries.
+CACHE_VERSION = 1
+CACHE_FILE_NAME = 'metadata.sqlite'
+
+
+def getCacheDir() -> str:
+    """
+    Returns the directory of the metadata cache.
+
+    The FTCLI_CACHE_DIR environment variable overrides the default location ($XDG_CACHE_HOME/ftcli or ~/.cache/ftcli).
+    """
+    cache_dir = os.environ.get('FTCLI_CACHE_DIR')
+    if cache_dir:
+        return cache_dir
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(xdg_cache_home, 'ftcli')
+
+
+def isCacheEnabled() -> bool:
+    """
+    Returns False if the cache has been disabled with the global --no-cache option.
+    """
+    ctx = click.get_current_context(silent=True)
+    if ctx is None:
+        return True
+    return not ctx.find_root().params.get('no_cache', False)
+
+
+class FontMetadata(object):
+    """
+    Snapshot of the font values read by the print, assistant and webfonts commands.
+
+    It can be built from an open font or from the data stored in the metadata cache, and has the same query methods of
+    Font for the values it stores.
+    """
+
+    def __init__(self, data: dict):
+        self.data = data
+
+    @classmethod
+    def fromFont(cls, font):
+        os2 = font['OS/2']
+        head = font['head']
+
+        names = [
+            [n.nameID, n.platformID, n.platEncID, n.langID, str(n)] for n in font['name'].names
+        ]
+
+        cff_names = getCFFNames(font)
+
+        unique_identifier = font['name'].getName(3, 3, 1, 0x409)
+
+        data = {
+            'flavor': font.flavor,
+            'sfnt_version': font.sfntVersion,
+            'tables': list(font.keys()),
+            'family_name': guessFamilyName(font),
+            'num_glyphs': font['maxp'].numGlyphs,
+            'created': head.created,
+            'modified': head.modified,
+            'font_revision': head.fontRevision,
+            'mac_style': head.macStyle,
+            'vend_id': os2.achVendID,
+            'unique_identifier': str(unique_identifier) if unique_identifier is not None else None,
+            'us_width_class': os2.usWidthClass,
+            'us_weight_class': os2.usWeightClass,
+            'fs_selection': os2.fsSelection,
+            'fs_type': os2.fsType,
+            'italic_angle': font['post'].italicAngle,
+            'vertical_metrics': font.getVerticalMetrics(),
+            'feature_tags': font.getFontFeatures(),
+            'names': names,
+            'cff_names': cff_names,
+        }
+
+        return cls(data)
+
+    @property
+    def flavor(self):
+        return self.data['flavor']
+
+    @property
+    def sfntVersion(self) -> str:
+        return self.data['sfnt_version']
+
+    @property
+    def familyName(self) -> str:
+        return self.data['family_name']
+
+    @property
+    def usWeightClass(self) -> int:
+        return self.data['us_weight_class']
+
+    @property
+    def usWidthClass(self) -> int:
+        return self.data['us_width_class']
+
+    @property
+    def cffNames(self) -> dict:
+        return self.data['cff_names']
+
+    def keys(self) -> list:
+        return self.data['tables']
+
+    def getName(self, nameID, platformID, platEncID, langID):
+        """
+        Returns the decoded string of a name record, or None if the record doesn't exist.
+        """
+        for name in self.data['names']:
+            if name[0:4] == [nameID, platformID, platEncID, langID]:
+                return name[4]
+        return None
+
+    def isBold(self):
+        return is_nth_bit_set(self.data['mac_style'], 0) and is_nth_bit_set(self.data['fs_selection'], 5)
+
+    def isItalic(self):
+        return is_nth_bit_set(self.data['mac_style'], 1) and is_nth_bit_set(self.data['fs_selection'], 0)
+
+    def isOblique(self):
+        return is_nth_bit_set(self.data['fs_selection'], 9)
+
+    def isWWS(self):
+        return is_nth_bit_set(self.data['fs_selection'], 8)
+
+    def getEmbedLevel(self) -> int:
+        return self.data['fs_type'] & 0xFF
+
+    def getFontInfo(self) -> dict:
+        font_info = {
+            'sfnt_version': {'label': 'Flavor', 'value': 'PostScript' if self.sfntVersion == 'OTTO' else 'TrueType'},
+            'glyphs_number': {'label': 'Glyphs number', 'value': self.data['num_glyphs']},
+            'date_created': {'label': 'Date created', 'value': timestampToString(self.data['created'])},
+            'date_modified': {'label': 'Date modified', 'value': timestampToString(self.data['modified'])},
+            'version': {'label': 'Version', 'value': self.data['font_revision']},
+            'vend_id': {'label': 'Vendor code', 'value': self.data['vend_id']},
+            'unique_identifier': {'label': 'Unique identifier', 'value': self.data['unique_identifier']},
+            'us_width_class': {'label': 'usWidthClass', 'value': self.usWidthClass},
+            'us_weight_class': {'label': 'usWeightClass', 'value': self.usWeightClass},
+            'is_bold': {'label': 'Font is bold', 'value': self.isBold()},
+            'is_italic': {'label': 'Font is italic', 'value': self.isItalic()},
+            'is_oblique': {'label': 'Font is oblique', 'value': self.isOblique()},
+            'is_wws_consistent': {'label': 'WWS consistent', 'value': self.isWWS()},
+            'italic_angle': {'label': 'Italic angle', 'value': self.data['italic_angle']},
+            'embed_level': {'label': 'Embedding', 'value': self.getEmbedLevel()}
+        }
+        return font_info
+
+    def getVerticalMetrics(self) -> dict:
+        return self.data['vertical_metrics']
+
+    def getFontFeatures(self) -> list:
+        return self.data['feature_tags']
+
+
+class MetadataCache(object):
+    """
+    On-disk cache of FontMetadata objects, stored in a SQLite database.
+
+    Entries are keyed by file path and invalidated when the inode, size or modification time of the file change. If
+    the database can't be used for any reason, the cache is silently disabled and fonts are read from disk.
+
+    Use it as a context manager, so that new entries are committed when done:
+
+        with MetadataCache() as cache:
+            metadata = cache.get(file)
+    """
+
+    def __init__(self, cache_dir: str = None, enabled: bool = None):
+        if enabled is None:
+            enabled = isCacheEnabled()
+        self.db = None
+        if enabled:
+            self.__connect(cache_dir or getCacheDir())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get(self, file: str) -> FontMetadata:
+        """
+        Returns the metadata of a font file, reading the font only if there is no valid cache entry.
+        """
+        path = os.path.abspath(file)
+        stat = os.stat(path)
+        key = (stat.st_ino, stat.st_size, stat.st_mtime_ns, CACHE_VERSION)
+
+        data = self.__read(path, key)
+        if data is not None:
+            return FontMetadata(data)
+
+        metadata = FontMetadata.fromFont(Font(path, recalcTimestamp=False))
+        self.__write(path, key, metadata.data)
+        return metadata
+
+    def close(self):
+        if self.db is None:
+            return
+        try:
+            self.db.commit()
+            self.db.close()
+        except sqlite3.Error:
+            pass
+        self.db = None
+
+    def __connect(self, cache_dir):
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            self.db = sqlite3.connect(os.path.join(cache_dir, CACHE_FILE_NAME), timeout=5)
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS fonts (path TEXT PRIMARY KEY, inode INTEGER, size INTEGER, '
+                'mtime_ns INTEGER, version INTEGER, data TEXT)')
+        except (OSError, sqlite3.Error):
+            self.db = None
+
+    def __read(self, path, key):
+        if self.db is None:
+            return None
+        try:
+            row = self.db.execute(
+                'SELECT inode, size, mtime_ns, version, data FROM fonts WHERE path = ?', (path,)).fetchone()
+        except sqlite3.Error:
+            self.close()
+            return None
+        if row is None or tuple(row[0:4]) != key:
+            return None
+        try:
+            return json.loads(row[4])
+        except ValueError:
+            return None
+
+    def __write(self, path, key, data):
+        if self.db is None:
+            return
+        try:
+            self.db.execute(
+                'INSERT OR REPLACE INTO fonts (path, inode, size, mtime_ns, version, data) VALUES (?, ?, ?, ?, ?, ?)',
+                (path, *key, json.dumps(data)))
+        except (sqlite3.Error, TypeError, ValueError):
+            pass
@@ -0,0 +1,83 @@
+class NameIndex(object):
+    """
+    An indexed view of the records of the 'name' table, keyed by (nameID, platformID, platEncID, langID), with
+    secondary indexes by nameID and by platformID.
+
+    The index is built on first use and rebuilt when the list of records of the table is replaced or grows, like
+    fontTools does in removeNames(), setName() and addMultilingualName(). Call invalidate() after changing the IDs of
+    the records in place; Font does it automatically when the 'name' table is replaced or deleted.
+    """
+
+    def __init__(self, font):
+        self.font = font
+        self.__names = None
+        self.__count = 0
+        self.__records = {}
+        self.__byNameID = {}
+        self.__byPlatformID = {}
+
+    def getRecord(self, nameID: int, platformID: int, platEncID: int, langID: int):
+        """
+        Returns the record with the given IDs, or None if it doesn't exist. Like getName(), if the table contains
+        duplicate records, the first one is returned.
+        """
+        return self.__getIndex().get((nameID, platformID, platEncID, langID))
+
+    def getRecords(self, nameID: int = None, platformID: int = None, platEncID: int = None, langID: int = None) -> list:
+        """
+        Returns the records matching the given IDs, in the order of the table. IDs that are None match any value, like
+        in removeNames().
+        """
+        records = self.__getIndex()
+        if None not in (nameID, platformID, platEncID, langID):
+            record = records.get((nameID, platformID, platEncID, langID))
+            return [record] if record is not None else []
+
+        if nameID is not None:
+            candidates = self.__byNameID.get(nameID, [])
+        elif platformID is not None:
+            candidates = self.__byPlatformID.get(platformID, [])
+        else:
+            candidates = self.__names
+
+        return [
+            n for n in candidates
+            if (platformID is None or n.platformID == platformID) and (platEncID is None or n.platEncID == platEncID)
+            and (langID is None or n.langID == langID)
+        ]
+
+    def removeRecords(self, records) -> int:
+        """
+        Removes the given records from the table in a single pass.
+
+        :param records: An iterable of records, like the ones returned by getRecords().
+        :return: The number of removed records.
+        """
+        ids = {id(n) for n in records}
+        if not ids:
+            return 0
+        table = self.font['name']
+        count = len(table.names)
+        table.names = [n for n in table.names if id(n) not in ids]
+        self.invalidate()
+        return count - len(table.names)
+
+    def invalidate(self):
+        self.__names = None
+        self.__records = {}
+        self.__byNameID = {}
+        self.__byPlatformID = {}
+
+    def __getIndex(self):
+        names = getattr(self.font['name'], 'names', [])
+        if names is self.__names and len(names) == self.__count:
+            return self.__records
+
+        self.invalidate()
+        for n in names:
+            self.__records.setdefault((n.nameID, n.platformID, n.platEncID, n.langID), n)
+            self.__byNameID.setdefault(n.nameID, []).append(n)
+            self.__byPlatformID.setdefault(n.platformID, []).append(n)
+        self.__names = names
+        self.__count = len(names)
+        return self.__records
@@ -0,0 +1,98 @@
+class RecordStore(object):
+    """
+    Records (dictionaries) indexed by file name, with row-level dirty tracking.
+
+    Records keep their insertion order. A record is marked as dirty only when it's added, or when one of its values
+    actually changes, so that the owner of the store can skip writing the data file when nothing changed.
+
+    :param records: An iterable of records to load. Loaded records are not dirty.
+    :param key: The name of the field used as index.
+    :param normalize: Optionally, a function applied to each value before storing it. Use it when the data file
+        stores all values as strings (like CSV files), so that values read from the file and recalculated values can be
+        compared.
+    """
+
+    def __init__(self, records=None, key='file_name', normalize=None):
+        self.key = key
+        self.normalize = normalize
+        self.__records = {}
+        self.__dirty = set()
+        self.__removed = False
+        for record in records or []:
+            self.__records[record[key]] = self.__normalizeRecord(record)
+
+    def __contains__(self, file_name):
+        return file_name in self.__records
+
+    def __len__(self):
+        return len(self.__records)
+
+    def __iter__(self):
+        return iter(self.__records.values())
+
+    def __getitem__(self, file_name):
+        return self.__records[file_name]
+
+    def get(self, file_name, default=None):
+        return self.__records.get(file_name, default)
+
+    def keys(self) -> list:
+        return list(self.__records.keys())
+
+    def set(self, record: dict) -> bool:
+        """
+        Adds a record or replaces the one with the same file name.
+
+        :return: True if the store has changed.
+        """
+        record = self.__normalizeRecord(record)
+        file_name = record[self.key]
+        if self.__records.get(file_name) == record:
+            return False
+        self.__records[file_name] = record
+        self.__dirty.add(file_name)
+        return True
+
+    def update(self, file_name, **values) -> bool:
+        """
+        Updates some values of an existing record.
+
+        :return: True if the record has changed.
+        """
+        record = dict(self.__records[file_name])
+        record.update(values)
+        return self.set(record)
+
+    def remove(self, file_name):
+        if file_name in self.__records:
+            del self.__records[file_name]
+            self.__dirty.discard(file_name)
+            self.__removed = True
+
+    def retain(self, file_names):
+        """
+        Removes the records whose file name is not in file_names.
+        """
+        file_names = set(file_names)
+        for file_name in [k for k in self.__records if k not in file_names]:
+            self.remove(file_name)
+
+    @property
+    def dirtyKeys(self) -> set:
+        return set(self.__dirty)
+
+    @property
+    def isDirty(self) -> bool:
+        return self.__removed or len(self.__dirty) > 0
+
+    def markClean(self):
+        self.__dirty.clear()
+        self.__removed = False
+
+    def toList(self) -> list:
+        return list(self.__records.values())
+
+    def __normalizeRecord(self, record):
+        if self.normalize is None:
+            return dict(record)
+        return {k: self.normalize(v) for k, v in record.items()}
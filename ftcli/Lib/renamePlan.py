@@ -0,0 +1,142 @@
+import json
+import os
+
+from ftcli.Lib.utils import OutputPathAllocator
+
+JOURNAL_FILE_NAME = '.ftcli_renames.jsonl'
+
+
+class RenamePlan(object):
+    """
+    A batch of file renames, planned in memory and applied as a whole.
+
+    Target names are allocated with an OutputPathAllocator, which lists each target folder once and keeps track of the
+    names planned so far: a number suffix (#1, #2, etc.) is added to the names that are taken. Folders are not created
+    until the plan is applied.
+
+    Renames are applied in two steps: all files are moved to a temporary name first, and then to their target, so that
+    a file can take the name that another file of the plan is leaving. Each step is recorded in a journal before it is
+    done: if a rename fails, the completed ones are rolled back, and if the process is interrupted, the journal can be
+    used to roll back later. See rollbackRenames().
+    """
+
+    def __init__(self):
+        self.renames = []
+        self.__allocator = OutputPathAllocator(makeDirs=False)
+
+    def __len__(self):
+        return len(self.renames)
+
+    def __iter__(self):
+        return iter(self.renames)
+
+    def add(self, source: str, target: str) -> str:
+        """
+        Plans renaming source to target. If target is taken, a number suffix is added to the file name.
+
+        :return: The planned target. If it's the source itself, nothing is planned.
+        """
+        candidate = self.__allocator.allocate(target, ignore=source)
+        if candidate == source:
+            return source
+
+        self.__allocator.release(source)
+        self.__allocator.reserve(candidate)
+        self.renames.append((source, candidate))
+        return candidate
+
+    def apply(self, journalFile: str):
+        """
+        Renames the files, recording each step in journalFile. If a rename fails, the completed ones are rolled back
+        and the exception is raised again. The journal is kept, so that the whole batch can be rolled back later.
+
+        :raises FileExistsError: If an interrupted batch has left a journal that hasn't been rolled back, or if a target
+            file has been created after the plan was made.
+        """
+        if os.path.exists(journalFile) and not isJournalComplete(journalFile):
+            raise FileExistsError(f"{journalFile} belongs to an interrupted batch, roll it back first")
+
+        entries = [(source, _getTempName(source, i), target) for i, (source, target) in enumerate(self.renames)]
+        with open(journalFile, 'w', encoding='utf-8') as journal:
+            _writeStep(journal, {'renames': entries})
+            try:
+                for i, (source, temp, _) in enumerate(entries):
+                    _writeStep(journal, ['temp', i])
+                    os.rename(source, temp)
+                for i, (_, temp, target) in enumerate(entries):
+                    for directory in _getMissingDirs(os.path.dirname(target)):
+                        _writeStep(journal, ['dir', directory])
+                        os.mkdir(directory)
+                    if os.path.exists(target):
+                        raise FileExistsError(f"{target} already exists")
+                    _writeStep(journal, ['target', i])
+                    os.rename(temp, target)
+                _writeStep(journal, ['complete'])
+            except BaseException:
+                journal.close()
+                rollbackRenames(journalFile)
+                raise
+            os.fsync(journal.fileno())
+
+
+def isJournalComplete(journalFile: str) -> bool:
+    """
+    Checks whether a journal belongs to a batch that has been applied to the end.
+
+    :return: True if the last step recorded in the journal is the completion of the batch.
+    """
+    with open(journalFile, 'r', encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    return bool(lines) and json.loads(lines[-1]) == ['complete']
+
+
+def rollbackRenames(journalFile: str) -> int:
+    """
+    Rolls back the renames recorded in a journal, in reverse order, and deletes the journal. Folders created by the
+    batch are removed, if empty. Steps that have been recorded but not done (because the process was interrupted) are
+    skipped.
+
+    :return: The number of files restored to their original name.
+    """
+    with open(journalFile, 'r', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f.read().splitlines() if line.strip()]
+    entries = lines[0]['renames']
+
+    restored = 0
+    for step in reversed(lines[1:]):
+        if step[0] == 'target':
+            source, temp, target = entries[step[1]]
+            if os.path.exists(target) and not os.path.exists(temp):
+                os.rename(target, temp)
+        elif step[0] == 'temp':
+            source, temp, target = entries[step[1]]
+            if os.path.exists(temp) and not os.path.exists(source):
+                os.rename(temp, source)
+                restored += 1
+        elif step[0] == 'dir':
+            try:
+                os.rmdir(step[1])
+            except OSError:
+                pass
+
+    os.remove(journalFile)
+    return restored
+
+
+def _getTempName(source, i):
+    directory, fileName = os.path.split(source)
+    return os.path.join(directory, f'.{fileName}.ftcli-{i}.tmp')
+
+
+def _getMissingDirs(directory):
+    # The folders to create, parents first.
+    missing = []
+    while directory and not os.path.isdir(directory):
+        missing.append(directory)
+        directory = os.path.dirname(directory)
+    return list(reversed(missing))
+
+
+def _writeStep(journal, step):
+    journal.write(json.dumps(step) + '\n')
+    journal.flush()
@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+import re
+
+
+class Replacements(object):
+    """
+    A list of string replacements, compiled once and applied to each string in a single call to replace().
+
+    Plain strings are compiled into a single regular expression matching any of them, longest first. Each part of a
+    string is replaced at most once, regardless of the order of the replacements: with 'Bold' -> 'Black' and 'Black' ->
+    'Heavy', 'Bold Black' becomes 'Black Heavy'.
+
+    Regular expressions are compiled once and applied in order, so that each one can use its own groups in the
+    replacement string (like '\\1').
+
+    :param pairs: A list of (old, new) tuples.
+    :param regex: Treat the old strings as regular expressions.
+    """
+
+    def __init__(self, pairs: list, regex=False):
+        self.regex = regex
+        self.pairs = list(pairs)
+        if regex:
+            self.__patterns = [(re.compile(old), new) for old, new in self.pairs]
+        else:
+            self.__mapping = dict(self.pairs)
+            old_strings = sorted(self.__mapping, key=len, reverse=True)
+            self.__matcher = re.compile('|'.join(re.escape(s) for s in old_strings)) if old_strings else None
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def replace(self, string: str) -> str:
+        if self.regex:
+            for pattern, new in self.__patterns:
+                string = pattern.sub(new, string)
+            return string
+        if self.__matcher is None:
+            return string
+        return self.__matcher.sub(self.__getReplacement, string)
+
+    def __getReplacement(self, match):
+        return self.__mapping[match.group(0)]
+
+
+def loadReplacements(file: str, regex=False) -> Replacements:
+    """
+    Reads a mapping file. JSON files contain an object ({"old": "new", ...}) or a list of [old, new] pairs. Other files
+    are read as CSV files with two columns separated by semicolons (old;new), without header. Empty lines and lines
+    starting with '#' are ignored.
+
+    :param file: Path to the mapping file.
+    :param regex: Treat the old strings as regular expressions.
+    :raises ValueError: If the file is malformed or an old string is empty or isn't a valid regular expression.
+    """
+    if os.path.splitext(file)[1].lower() == '.json':
+        with open(file, 'r', encoding='utf-8-sig') as f:
+            data = json.load(f)
+        items = data.items() if isinstance(data, dict) else data
+        pairs = []
+        for i, item in enumerate(items, start=1):
+            if not (isinstance(item, (list, tuple)) and len(item) == 2 and all(isinstance(s, str) for s in item)):
+                raise ValueError(f"entry {i}: expected a pair of strings, got {item!r}")
+            pairs.append(tuple(item))
+    else:
+        pairs = []
+        with open(file, 'r', encoding='utf-8-sig', newline='') as f:
+            for i, row in enumerate(csv.reader(f, delimiter=';'), start=1):
+                if not row or not ''.join(row) or row[0].startswith('#'):
+                    continue
+                if len(row) != 2:
+                    raise ValueError(f"line {i}: expected 2 columns (old;new), got {len(row)}")
+                pairs.append((row[0], row[1]))
+
+    for i, (old, _) in enumerate(pairs, start=1):
+        if not old:
+            raise ValueError(f"entry {i}: the old string is empty")
+
+    try:
+        return Replacements(pairs, regex=regex)
+    except re.error as e:
+        raise ValueError(f"invalid regular expression '{e.pattern}': {e}")
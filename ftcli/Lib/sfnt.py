@@ -0,0 +1,567 @@
+import hashlib
+import os
+import struct
+import zlib
+from io import BytesIO
+
+from fontTools.ttLib.sfnt import calcChecksum
+from fontTools.ttLib.ttFont import getSearchRange, sortedTagList
+from fontTools.ttLib.woff2 import woff2KnownTags
+
+# Header-only sfnt reader. Only the file header and the table directory are read (a few hundred bytes per file), so
+# that fonts can be discovered and inspected without building a TTFont. The writer assembles a sfnt file from raw
+# table data, without compiling any table.
+
+SFNT_VERSIONS = ('\x00\x01\x00\x00', 'OTTO', 'true')
+
+SFNT_HEADER_FORMAT = '>4sHHHH'
+SFNT_HEADER_SIZE = struct.calcsize(SFNT_HEADER_FORMAT)
+SFNT_ENTRY_FORMAT = '>4sLLL'
+SFNT_ENTRY_SIZE = struct.calcsize(SFNT_ENTRY_FORMAT)
+
+WOFF_HEADER_FORMAT = '>4s4sLHHLHHLLLLL'
+WOFF_HEADER_SIZE = struct.calcsize(WOFF_HEADER_FORMAT)
+WOFF_ENTRY_FORMAT = '>4sLLLL'
+WOFF_ENTRY_SIZE = struct.calcsize(WOFF_ENTRY_FORMAT)
+
+WOFF2_HEADER_FORMAT = '>4s4sLHHLLHHLLLLL'
+WOFF2_HEADER_SIZE = struct.calcsize(WOFF2_HEADER_FORMAT)
+# flags (1 byte) + optional tag (4 bytes) + origLength and transformLength (UIntBase128, 5 bytes max each).
+WOFF2_MAX_ENTRY_SIZE = 15
+
+TTC_HEADER_FORMAT = '>4sLL'
+TTC_HEADER_SIZE = struct.calcsize(TTC_HEADER_FORMAT)
+
+# Offset of checkSumAdjustment in the 'head' table.
+HEAD_CHECKSUM_ADJUSTMENT_OFFSET = 8
+# Offset of the modified LONGDATETIME in the 'head' table.
+HEAD_MODIFIED_OFFSET = 28
+
+# Values read by readVerticalMetrics(): table tag, struct format and offset in the table.
+VERTICAL_METRICS = {
+    'yMin': ('head', '>h', 38),
+    'yMax': ('head', '>h', 42),
+    'ascender': ('hhea', '>h', 4),
+    'descender': ('hhea', '>h', 6),
+    'lineGap': ('hhea', '>h', 8),
+    'sTypoAscender': ('OS/2', '>h', 68),
+    'sTypoDescender': ('OS/2', '>h', 70),
+    'sTypoLineGap': ('OS/2', '>h', 72),
+    'usWinAscent': ('OS/2', '>H', 74),
+    'usWinDescent': ('OS/2', '>H', 76),
+}
+
+
+class TableRecord(object):
+
+    def __init__(self, tag, offset, length, checkSum=None, compLength=None, transformed=False):
+        self.tag = tag
+        self.offset = offset
+        self.length = length
+        self.checkSum = checkSum
+        # Length of the table data stored in the file, when it differs from the uncompressed length (WOFF).
+        self.compLength = length if compLength is None else compLength
+        # WOFF2 glyf, loca and hmtx tables may be stored in a transformed format.
+        self.transformed = transformed
+
+
+class FontDescriptor(object):
+    """
+    Lightweight description of a font file, built from the file header and the table directory only.
+    """
+
+    def __init__(self, path, size, flavor, sfntVersion, tables, numFonts=1, fontNumber=-1):
+        self.path = path
+        self.size = size
+        self.flavor = flavor
+        self.sfntVersion = sfntVersion
+        self.tables = tables
+        self.numFonts = numFonts
+        self.fontNumber = fontNumber
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} '{os.path.basename(self.path)}' flavor={self.flavor} " \
+               f"sfntVersion={self.sfntVersion!r} tables={len(self.tables)}>"
+
+    def __contains__(self, tag):
+        return tag in self.tables
+
+    @property
+    def tags(self) -> list:
+        return list(self.tables.keys())
+
+    @property
+    def isCFF(self) -> bool:
+        return self.sfntVersion == 'OTTO'
+
+    @property
+    def isCollectionMember(self) -> bool:
+        return self.fontNumber >= 0
+
+    def open(self, **kwargs):
+        """
+        Opens the described font as a Font object. Keyword arguments are passed to the Font constructor.
+        """
+        from ftcli.Lib.Font import Font
+        return Font(self.path, **kwargs)
+
+    def readTable(self, tag) -> bytes:
+        """
+        Reads the raw data of a single table, without decompiling it. See readTables().
+        """
+        return self.readTables([tag])[tag]
+
+    def readTables(self, tags) -> dict:
+        """
+        Reads the raw data of some tables, without decompiling them. The file is opened only once.
+
+        For WOFF fonts, data is decompressed. WOFF2 fonts are read through fontTools, because the whole table data is
+        stored in a single brotli stream and glyf/loca may need to be reconstructed.
+
+        :param tags: The tags of the tables to read.
+        :return: A dictionary of table tags and raw table data.
+        """
+        for tag in tags:
+            if tag not in self.tables:
+                raise KeyError(f"'{tag}' table not found")
+
+        with open(self.path, 'rb') as f:
+            if self.flavor == 'woff2':
+                from fontTools.ttLib.woff2 import WOFF2Reader
+                reader = WOFF2Reader(f)
+                return {tag: reader[tag] for tag in tags}
+
+            tables = {}
+            for tag in tags:
+                entry = self.tables[tag]
+                f.seek(entry.offset)
+                data = f.read(entry.compLength)
+                if self.flavor == 'woff' and entry.compLength < entry.length:
+                    data = zlib.decompress(data)
+                tables[tag] = data
+
+        return tables
+
+
+def readFontDescriptor(path: str, fontNumber: int = -1):
+    """
+    Sniffs the magic bytes and the table directory of a font file.
+
+    :param path: Path to the font file.
+    :param fontNumber: Index of the member to describe, when the file is a TrueType/OpenType collection.
+    :return: A FontDescriptor, or None if the file is not a valid sfnt, WOFF, WOFF2 or TTC font.
+    """
+    try:
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            tag = f.read(4)
+            if tag == b'ttcf':
+                return _readCollection(f, path, size, fontNumber)
+            if tag == b'wOFF':
+                return _readWOFF(f, path, size)
+            if tag == b'wOF2':
+                return _readWOFF2(f, path, size)
+            return _readSFNT(f, path, size)
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
+
+
+def readVerticalMetrics(descriptor: FontDescriptor) -> dict:
+    """
+    Reads head.yMin and head.yMax, and the ascender, descender and line gap values of the 'hhea' and 'OS/2' tables,
+    unpacking them from the raw table data.
+
+    :return: A dictionary of value names (see VERTICAL_METRICS) and values.
+    """
+    tables = descriptor.readTables(['head', 'hhea', 'OS/2'])
+    return {name: struct.unpack_from(fmt, tables[tag], offset)[0] for name, (tag, fmt, offset) in
+            VERTICAL_METRICS.items()}
+
+
+def readCollectionDescriptors(path: str) -> list:
+    """
+    Returns a FontDescriptor for each member of a TrueType/OpenType collection.
+    """
+    descriptor = readFontDescriptor(path, fontNumber=0)
+    if descriptor is None or not descriptor.isCollectionMember:
+        return []
+    descriptors = [descriptor]
+    for i in range(1, descriptor.numFonts):
+        descriptors.append(readFontDescriptor(path, fontNumber=i))
+    return [d for d in descriptors if d is not None]
+
+
+def _readSFNT(f, path, size, offset=0, numFonts=1, fontNumber=-1):
+    f.seek(offset)
+    header = f.read(SFNT_HEADER_SIZE)
+    sfntVersion, numTables, _, _, _ = struct.unpack(SFNT_HEADER_FORMAT, header)
+    sfntVersion = sfntVersion.decode('latin-1')
+    if sfntVersion not in SFNT_VERSIONS:
+        return None
+
+    directory = f.read(numTables * SFNT_ENTRY_SIZE)
+    if len(directory) < numTables * SFNT_ENTRY_SIZE:
+        return None
+
+    tables = {}
+    for i in range(numTables):
+        tag, checkSum, tableOffset, length = struct.unpack_from(SFNT_ENTRY_FORMAT, directory, i * SFNT_ENTRY_SIZE)
+        if tableOffset + length > size:
+            return None
+        tag = tag.decode('latin-1')
+        tables[tag] = TableRecord(tag, tableOffset, length, checkSum=checkSum)
+
+    return FontDescriptor(path, size, None, sfntVersion, tables, numFonts=numFonts, fontNumber=fontNumber)
+
+
+def _readCollection(f, path, size, fontNumber):
+    f.seek(0)
+    _, _, numFonts = struct.unpack(TTC_HEADER_FORMAT, f.read(TTC_HEADER_SIZE))
+    if fontNumber < 0:
+        # Collections can't be handled as single fonts.
+        return None
+    if not 0 <= fontNumber < numFonts:
+        raise ValueError(f"specify a font number between 0 and {numFonts - 1} (inclusive)")
+    f.seek(TTC_HEADER_SIZE + 4 * fontNumber)
+    offset = struct.unpack('>L', f.read(4))[0]
+    return _readSFNT(f, path, size, offset=offset, numFonts=numFonts, fontNumber=fontNumber)
+
+
+def _readWOFF(f, path, size):
+    f.seek(0)
+    header = struct.unpack(WOFF_HEADER_FORMAT, f.read(WOFF_HEADER_SIZE))
+    sfntVersion = header[1].decode('latin-1')
+    numTables = header[3]
+    if sfntVersion not in SFNT_VERSIONS:
+        return None
+
+    directory = f.read(numTables * WOFF_ENTRY_SIZE)
+    if len(directory) < numTables * WOFF_ENTRY_SIZE:
+        return None
+
+    tables = {}
+    for i in range(numTables):
+        tag, offset, compLength, origLength, origChecksum = struct.unpack_from(
+            WOFF_ENTRY_FORMAT, directory, i * WOFF_ENTRY_SIZE)
+        if offset + compLength > size:
+            return None
+        tag = tag.decode('latin-1')
+        tables[tag] = TableRecord(tag, offset, origLength, checkSum=origChecksum, compLength=compLength)
+
+    return FontDescriptor(path, size, 'woff', sfntVersion, tables)
+
+
+def _readWOFF2(f, path, size):
+    f.seek(0)
+    header = struct.unpack(WOFF2_HEADER_FORMAT, f.read(WOFF2_HEADER_SIZE))
+    sfntVersion = header[1].decode('latin-1')
+    numTables = header[3]
+    # Table offsets are relative to the compressed stream, so they can't be checked: the length of the file is.
+    if header[2] != size:
+        return None
+
+    directory = f.read(numTables * WOFF2_MAX_ENTRY_SIZE)
+    tables = {}
+    offset = 0
+    pos = 0
+    for _ in range(numTables):
+        flags = directory[pos]
+        pos += 1
+        if flags & 0x3F == 0x3F:
+            tag = directory[pos:pos + 4].decode('latin-1')
+            pos += 4
+        else:
+            tag = woff2KnownTags[flags & 0x3F]
+        origLength, pos = _readUIntBase128(directory, pos)
+        transformVersion = (flags >> 6) & 0x03
+        if tag in ('glyf', 'loca'):
+            transformed = transformVersion != 3
+        else:
+            transformed = transformVersion != 0
+        compLength = origLength
+        if transformed:
+            compLength, pos = _readUIntBase128(directory, pos)
+        # Offsets are relative to the decompressed table data stream.
+        tables[tag] = TableRecord(tag, offset, origLength, compLength=compLength, transformed=transformed)
+        offset += compLength
+
+    # WOFF2 collections are not handled as single fonts.
+    if sfntVersion not in SFNT_VERSIONS:
+        return None
+
+    return FontDescriptor(path, size, 'woff2', sfntVersion, tables)
+
+
+def _readUIntBase128(data, pos):
+    result = 0
+    for i in range(5):
+        byte = data[pos]
+        pos += 1
+        if i == 0 and byte == 0x80:
+            raise ValueError('UIntBase128 value must not start with leading zeros')
+        if result & 0xFE000000:
+            raise ValueError('UIntBase128 value exceeds 2**32-1')
+        result = (result << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            return result, pos
+    raise ValueError('UIntBase128 sequence exceeds 5 bytes')
+
+
+def hasSameTables(data: bytes, path: str) -> bool:
+    """
+    Tells whether a sfnt font, given as raw data, contains the same tables of a font file.
+
+    Lengths and checksums in the table directories are compared first, so that the table data of the file is read only
+    when they all match. head.checkSumAdjustment and head.modified are ignored: the first one depends on the table
+    order, the latter is updated whenever a font is saved with recalcTimestamp. Fonts with the same tables in a
+    different order are considered the same.
+
+    :param data: The sfnt font data.
+    :param path: Path to the font file. WOFF, WOFF2 and collection files are never considered the same.
+    """
+    source = readFontDescriptor(path)
+    target = _readSFNT(BytesIO(data), None, len(data))
+    if source is None or target is None or source.flavor is not None or source.sfntVersion != target.sfntVersion:
+        return False
+    if source.tables.keys() != target.tables.keys():
+        return False
+    for tag, entry in target.tables.items():
+        if entry.length != source.tables[tag].length:
+            return False
+        # The 'head' checksum includes head.modified.
+        if tag != 'head' and entry.checkSum != source.tables[tag].checkSum:
+            return False
+
+    with open(path, 'rb') as f:
+        for tag, entry in target.tables.items():
+            f.seek(source.tables[tag].offset)
+            sourceData = f.read(entry.length)
+            targetData = data[entry.offset:entry.offset + entry.length]
+            if tag == 'head':
+                sourceData, targetData = maskHead(sourceData), maskHead(targetData)
+            if sourceData != targetData:
+                return False
+
+    return True
+
+
+def maskHead(data: bytes) -> bytes:
+    """
+    Returns the 'head' table data with checkSumAdjustment and modified set to zero.
+    """
+    data = bytearray(data)
+    data[HEAD_CHECKSUM_ADJUSTMENT_OFFSET:HEAD_CHECKSUM_ADJUSTMENT_OFFSET + 4] = b'\0' * 4
+    data[HEAD_MODIFIED_OFFSET:HEAD_MODIFIED_OFFSET + 8] = b'\0' * 8
+    return bytes(data)
+
+
+def compileSFNT(sfntVersion: str, tables: dict, checkSums: dict = None, tableOrder: list = None) -> bytes:
+    """
+    Assembles a sfnt font file from raw table data.
+
+    Table checksums and head.checkSumAdjustment are calculated here. Checksums passed in checkSums are trusted and
+    reused, so that the data of tables copied from another font doesn't need to be read again; the 'head' checksum is
+    always recalculated, because checkSumAdjustment must be zeroed before calculating it.
+
+    :param sfntVersion: The sfnt version ('\\x00\\x01\\x00\\x00' or 'OTTO').
+    :param tables: A dictionary of table tags and raw table data.
+    :param checkSums: Optionally, a dictionary of table tags and known checksums.
+    :param tableOrder: Optionally, the order of table data in the file. If not specified, the order recommended by the
+        OpenType specification is used. The table directory is always sorted by tag.
+    :return: The font file data.
+    """
+    tables = _zeroCheckSumAdjustment(tables)
+    order = sortedTagList(tables, tableOrder)
+    checkSums = _getCheckSums(tables, checkSums, order)
+    directory, head = _compileDirectory(sfntVersion, {tag: len(tables[tag]) for tag in order}, checkSums, order,
+                                        tables.get('head'))
+    return directory + b''.join(_pad(head if tag == 'head' else tables[tag]) for tag in order)
+
+
+def writeSFNT(file, sfntVersion: str, tables: dict, checkSums: dict = None, tableOrder: list = None):
+    """
+    Writes a sfnt font file from raw table data. See compileSFNT().
+
+    :param file: The output file path, or a writable file object.
+    """
+    data = compileSFNT(sfntVersion, tables, checkSums=checkSums, tableOrder=tableOrder)
+    if hasattr(file, 'write'):
+        file.write(data)
+    else:
+        with open(file, 'wb') as f:
+            f.write(data)
+
+
+def streamSFNT(file, descriptor: FontDescriptor, tables: dict = None, tableOrder: list = None):
+    """
+    Writes a sfnt font file with the tables of a font file, or of a member of a collection, copying the table data in
+    chunks. Large tables (like the 'glyf' or 'CFF ' tables shared by the members of a collection) are never read in
+    memory as a whole, and the checksums of the copied tables are read from the source table directory. The 'head'
+    table is always read, because checkSumAdjustment must be recalculated.
+
+    :param file: The output file path.
+    :param descriptor: The FontDescriptor of an uncompressed sfnt font or collection member.
+    :param tables: Optionally, a dictionary of table tags and raw table data replacing the source tables.
+    :param tableOrder: See compileSFNT().
+    """
+    if descriptor.flavor is not None:
+        raise ValueError(f"{descriptor.flavor} fonts can't be streamed")
+
+    tables = dict(tables or {})
+    if 'head' in descriptor and 'head' not in tables:
+        tables['head'] = descriptor.readTable('head')
+    tables = _zeroCheckSumAdjustment(tables)
+
+    order = sortedTagList(list(descriptor.tables), tableOrder)
+    checkSums = _getCheckSums(tables, {tag: entry.checkSum for tag, entry in descriptor.tables.items()
+                                       if tag not in tables}, order)
+    lengths = {tag: len(tables[tag]) if tag in tables else descriptor.tables[tag].length for tag in order}
+    directory, head = _compileDirectory(descriptor.sfntVersion, lengths, checkSums, order, tables.get('head'))
+
+    with open(descriptor.path, 'rb') as src, open(file, 'wb') as dst:
+        dst.write(directory)
+        for tag in order:
+            if tag in tables:
+                dst.write(_pad(head if tag == 'head' else tables[tag]))
+                continue
+            _copyRange(src, dst, descriptor.tables[tag].offset, lengths[tag])
+            dst.write(b'\0' * ((4 - lengths[tag] % 4) % 4))
+
+
+def writeCollection(file, descriptors: list) -> int:
+    """
+    Writes a TrueType/OpenType collection with the tables of some fonts, copying the table data in chunks.
+
+    Tables that are byte-identical in more fonts are stored once. To find them, tables are grouped by length and
+    checksum (as read from the table directories), and only the tables of the same group are hashed.
+
+    :param file: The output file path.
+    :param descriptors: The FontDescriptor objects of the fonts, that must be uncompressed sfnt fonts.
+    :return: The number of tables that are shared with a previous font and aren't stored again.
+    """
+    for descriptor in descriptors:
+        if descriptor.flavor is not None or descriptor.isCollectionMember:
+            raise ValueError(f"{os.path.basename(descriptor.path)}: only sfnt fonts can be added to a collection")
+
+    groups = {}
+    for i, descriptor in enumerate(descriptors):
+        for tag, entry in descriptor.tables.items():
+            groups.setdefault((entry.length, entry.checkSum), []).append((i, tag))
+
+    # Tables with the same key have the same data.
+    keys = {}
+    for group in groups.values():
+        for i, tag in group:
+            entry = descriptors[i].tables[tag]
+            keys[i, tag] = (entry.length, entry.checkSum, _hashTable(descriptors[i], entry) if len(group) > 1 else i)
+
+    numFonts = len(descriptors)
+    offset = TTC_HEADER_SIZE + 4 * numFonts
+    fontOffsets = []
+    for descriptor in descriptors:
+        fontOffsets.append(offset)
+        offset += SFNT_HEADER_SIZE + len(descriptor.tables) * SFNT_ENTRY_SIZE
+
+    # Table data is laid out in the order of the fonts, and in the recommended order within each font.
+    offsets = {}
+    blocks = []
+    for i, descriptor in enumerate(descriptors):
+        for tag in sortedTagList(list(descriptor.tables)):
+            if keys[i, tag] not in offsets:
+                offsets[keys[i, tag]] = offset
+                entry = descriptor.tables[tag]
+                blocks.append((descriptor, entry))
+                offset += entry.length + (4 - entry.length % 4) % 4
+
+    with open(file, 'wb') as dst:
+        dst.write(struct.pack(TTC_HEADER_FORMAT, b'ttcf', 0x00010000, numFonts))
+        dst.write(struct.pack(f'>{numFonts}L', *fontOffsets))
+
+        for i, descriptor in enumerate(descriptors):
+            numTables = len(descriptor.tables)
+            searchRange, entrySelector, rangeShift = getSearchRange(numTables, 16)
+            dst.write(struct.pack(SFNT_HEADER_FORMAT, descriptor.sfntVersion.encode('latin-1'), numTables, searchRange,
+                                  entrySelector, rangeShift))
+            for tag in sorted(descriptor.tables):
+                entry = descriptor.tables[tag]
+                dst.write(struct.pack(SFNT_ENTRY_FORMAT, tag.encode('latin-1'), entry.checkSum, offsets[keys[i, tag]],
+                                      entry.length))
+
+        for descriptor, entry in blocks:
+            with open(descriptor.path, 'rb') as src:
+                _copyRange(src, dst, entry.offset, entry.length)
+            dst.write(b'\0' * ((4 - entry.length % 4) % 4))
+
+    return len(keys) - len(blocks)
+
+
+def _hashTable(descriptor, entry):
+    sha = hashlib.sha256()
+    with open(descriptor.path, 'rb') as f:
+        for chunk in _readRange(f, entry.offset, entry.length):
+            sha.update(chunk)
+    return sha.digest()
+
+
+def _zeroCheckSumAdjustment(tables):
+    tables = dict(tables)
+    if 'head' in tables:
+        head = bytearray(tables['head'])
+        head[HEAD_CHECKSUM_ADJUSTMENT_OFFSET:HEAD_CHECKSUM_ADJUSTMENT_OFFSET + 4] = b'\0\0\0\0'
+        tables['head'] = bytes(head)
+    return tables
+
+
+def _getCheckSums(tables, checkSums, order):
+    # Known checksums are trusted, except the 'head' one. The others are calculated from the table data.
+    checkSums = checkSums or {}
+    result = {}
+    for tag in order:
+        checkSum = checkSums.get(tag) if tag != 'head' else None
+        result[tag] = checkSum if checkSum is not None else calcChecksum(tables[tag])
+    return result
+
+
+def _compileDirectory(sfntVersion, lengths, checkSums, order, head=None):
+    # Returns the table directory and, if head is given, the 'head' table data with checkSumAdjustment set.
+    numTables = len(order)
+    searchRange, entrySelector, rangeShift = getSearchRange(numTables, 16)
+    header = struct.pack(SFNT_HEADER_FORMAT, sfntVersion.encode('latin-1'), numTables, searchRange, entrySelector,
+                         rangeShift)
+
+    offset = SFNT_HEADER_SIZE + numTables * SFNT_ENTRY_SIZE
+    entries = {}
+    for tag in order:
+        entries[tag] = struct.pack(SFNT_ENTRY_FORMAT, tag.encode('latin-1'), checkSums[tag], offset, lengths[tag])
+        offset += lengths[tag] + (4 - lengths[tag] % 4) % 4
+
+    directory = header + b''.join(entries[tag] for tag in sorted(entries))
+
+    # Tables are padded to a multiple of 4 bytes, so the checksum of the whole font is the sum of the directory
+    # checksum and the table checksums.
+    if head is not None:
+        fontCheckSum = calcChecksum(directory) + sum(checkSums.values())
+        checkSumAdjustment = (0xB1B0AFBA - fontCheckSum) & 0xFFFFFFFF
+        head = head[:HEAD_CHECKSUM_ADJUSTMENT_OFFSET] + struct.pack('>L', checkSumAdjustment) + \
+            head[HEAD_CHECKSUM_ADJUSTMENT_OFFSET + 4:]
+
+    return directory, head
+
+
+def _pad(data):
+    return data + b'\0' * ((4 - len(data) % 4) % 4)
+
+
+def _copyRange(src, dst, offset, length):
+    for chunk in _readRange(src, offset, length):
+        dst.write(chunk)
+
+
+def _readRange(f, offset, length, bufferSize=1 << 20):
+    f.seek(offset)
+    while length > 0:
+        chunk = f.read(min(bufferSize, length))
+        if not chunk:
+            raise ValueError('unexpected end of file')
+        yield chunk
+        length -= len(chunk)
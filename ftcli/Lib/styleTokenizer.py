@@ -0,0 +1,111 @@
+import re
+
+
+class StyleTokens(object):
+    """
+    Result of StyleTokenizer.parse().
+
+    width and weight are the keys of the matched literals in the configuration file (usWidthClass and usWeightClass
+    values as strings), or None if the string doesn't contain exactly one width or weight literal.
+    """
+
+    def __init__(self, width=None, weight=None, italic=False, oblique=False, tokens=None, unknown=''):
+        self.width = width
+        self.weight = weight
+        self.italic = italic
+        self.oblique = oblique
+        self.tokens = tokens or []
+        self.unknown = unknown
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} width={self.width} weight={self.weight} italic={self.italic} " \
+               f"oblique={self.oblique} unknown={self.unknown!r}>"
+
+
+class StyleTokenizer(object):
+    """
+    Splits style strings (like 'condensedbolditalic') in width, weight, italic and oblique tokens.
+
+    The literals in the configuration file are compiled once in a single regular expression. Longer literals are
+    tried first, so that 'ExtraBold' is matched before 'Bold'. Strings are expected to be lowercase and without spaces,
+    dashes and underscores, and are parsed left to right in a single pass.
+
+    Each category is recognized from its own literals. Characters that don't belong to any literal are attributed to the
+    weight: the width, italic and oblique attributes are set whatever else the string contains, while the weight is
+    empty if there is unknown text, and the value of the font should be kept. For example, 'SemiCondensedBoldItalic' is
+    parsed as Condensed Italic, with no weight.
+    """
+
+    CATEGORIES = ('weight', 'width', 'italic', 'oblique')
+
+    def __init__(self, config: dict):
+        # Normalized literal -> list of (category, key) tuples. The same literal may appear in more categories.
+        self.literals = {}
+        for key, values in config['weights'].items():
+            for v in values:
+                self.__addLiteral(v, 'weight', key)
+        for key, values in config['widths'].items():
+            for v in values:
+                self.__addLiteral(v, 'width', key)
+        for v in config['italics']:
+            self.__addLiteral(v, 'italic', None)
+        for v in config['obliques']:
+            self.__addLiteral(v, 'oblique', None)
+
+        literals = sorted(self.literals, key=lambda x: (-len(x), x))
+        self.regex = re.compile('|'.join(re.escape(literal) for literal in literals)) if literals else None
+
+        # Style strings are shared by the fonts of different families, so results are memoized.
+        self.__parsed = {}
+
+    def parse(self, string: str) -> StyleTokens:
+        string = self.normalize(string)
+        if string not in self.__parsed:
+            self.__parsed[string] = self.__parse(string)
+        return self.__parsed[string]
+
+    def parseMany(self, strings) -> list:
+        """
+        Parses a list of style strings, returning a StyleTokens object for each one of them.
+        """
+        return [self.parse(string) for string in strings]
+
+    @staticmethod
+    def normalize(string: str) -> str:
+        return string.lower().replace(' ', '').replace('-', '').replace('_', '')
+
+    def __addLiteral(self, literal, category, key):
+        literal = self.normalize(str(literal))
+        if literal:
+            self.literals.setdefault(literal, []).append((category, key))
+
+    def __parse(self, string):
+        if not string or self.regex is None:
+            return StyleTokens(unknown=string)
+
+        tokens = []
+        unknown = []
+        pos = 0
+        found = {category: [] for category in self.CATEGORIES}
+        for match in self.regex.finditer(string):
+            if match.start() > pos:
+                unknown.append(string[pos:match.start()])
+            token = match.group()
+            candidates = self.literals[token]
+            # When a literal is shared by more categories, use the first one that hasn't been found yet.
+            category, key = next((c for c in candidates if not found[c[0]]), candidates[0])
+            found[category].append(key)
+            tokens.append(token)
+            pos = match.end()
+        if pos < len(string):
+            unknown.append(string[pos:])
+
+        # Unknown text is attributed to the weight.
+        return StyleTokens(
+            width=found['width'][0] if len(found['width']) == 1 else None,
+            weight=found['weight'][0] if len(found['weight']) == 1 and not unknown else None,
+            italic=len(found['italic']) > 0,
+            oblique=len(found['oblique']) > 0,
+            tokens=tokens,
+            unknown=''.join(unknown)
+        )
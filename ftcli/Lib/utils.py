@@ -1,13 +1,16 @@
 import os
 import re
+import threading
 from textwrap import TextWrapper
 
 import click
-from fontTools.misc.textTools import binary2num
 from fontTools.ttLib import TTFont
+from fontTools.ttLib.tables.O_S_2f_2 import OS2_UNICODE_RANGES, intersectUnicodeRanges
+
+from ftcli.Lib.sfnt import readFontDescriptor
 
 # Fork of fontTools.misc.cliTools.makeOutputFileName.
-# Output dir will be automatically created if it doesn't exist.
+# Output dir will be automatically created if it doesn't exist. Batches should use OutputPathAllocator instead.
 numberAddedRE = re.compile(r"#\d+$")
 
 
@@ -55,6 +58,99 @@ def makeOutputFileName(inputFile, outputDir=None, extension=None, overWrite=Fals
     return output
 
 
+class OutputPathAllocator(object):
+    """
+    Allocates the output file names of a batch, like makeOutputFileName() does for a single file.
+
+    Each target directory is listed once, the first time a name is allocated in it, and the names allocated by the batch
+    are reserved in memory, so that finding a free number suffix (#1, #2, etc.) doesn't require probing the file system
+    for each candidate name. Names are compared with os.path.normcase(), so each platform keeps the case sensitivity of
+    its file system. Missing directories are created once, when the first name is allocated in them.
+
+    allocate() can be called from more threads. Names for worker processes should be allocated in the parent process
+    before dispatching the files, like makeOutputFileNames() does.
+
+    :param outputDir: Optionally, a new directory to write the files into.
+    :param overWrite: Overwriting existing files is permitted if true. Names are not checked, and can be allocated more
+        than once.
+    :param makeDirs: Create the directories of the allocated names if they don't exist.
+    """
+
+    def __init__(self, outputDir=None, overWrite=False, makeDirs=True):
+        self.outputDir = outputDir
+        self.overWrite = overWrite
+        self.makeDirs = makeDirs
+        self.__lock = threading.Lock()
+        self.__names = {}
+        self.__counters = {}
+        self.__dirs = set()
+
+    def allocate(self, inputFile: str, extension: str = None, ignore: str = None) -> str:
+        """
+        Returns a free output file name for inputFile, and reserves it.
+
+        :param inputFile: Name of the input file.
+        :param extension: Optionally, a replacement for the current file extension.
+        :param ignore: Optionally, an existing file whose name can be allocated (for example, a file that is going to
+            be renamed).
+        """
+        dirName, fileName = os.path.split(inputFile)
+        fileName, ext = os.path.splitext(fileName)
+        if self.outputDir:
+            dirName = self.outputDir
+        fileName = numberAddedRE.split(fileName)[0]
+        if extension is None:
+            extension = ext
+        output = os.path.join(dirName, fileName + extension)
+
+        with self.__lock:
+            if self.makeDirs and dirName not in self.__dirs:
+                if dirName:
+                    os.makedirs(dirName, exist_ok=True)
+                self.__dirs.add(dirName)
+            if self.overWrite:
+                return output
+
+            names = self.__getNames(dirName)
+
+            def isFree(path):
+                return os.path.normcase(os.path.basename(path)) not in names or (
+                        ignore is not None and os.path.normcase(path) == os.path.normcase(ignore))
+
+            if not isFree(output):
+                counterKey = (dirName, os.path.normcase(fileName), os.path.normcase(extension))
+                n = self.__counters.get(counterKey, 1)
+                output = os.path.join(dirName, f'{fileName}#{n}{extension}')
+                while not isFree(output):
+                    n += 1
+                    output = os.path.join(dirName, f'{fileName}#{n}{extension}')
+                self.__counters[counterKey] = n + 1
+            names.add(os.path.normcase(os.path.basename(output)))
+        return output
+
+    def reserve(self, path: str):
+        """
+        Marks a file name as taken, as if the file existed.
+        """
+        with self.__lock:
+            self.__getNames(os.path.dirname(path)).add(os.path.normcase(os.path.basename(path)))
+
+    def release(self, path: str):
+        """
+        Marks a file name as free, as if the file didn't exist (for example, because it's going to be renamed).
+        """
+        with self.__lock:
+            self.__getNames(os.path.dirname(path)).discard(os.path.normcase(os.path.basename(path)))
+
+    def __getNames(self, directory):
+        if directory not in self.__names:
+            try:
+                self.__names[directory] = {os.path.normcase(name) for name in os.listdir(directory or os.curdir)}
+            except OSError:
+                self.__names[directory] = set()
+        return self.__names[directory]
+
+
 def add_options(options):
     def _add_options(func):
         for option in reversed(options):
@@ -90,28 +186,43 @@ def add_common_options():
     return add_options(_common_options)
 
 
-def getFontsList(input_path: str) -> list:
-    files = []
+def getFontsList(input_path: str, recursive=False) -> list:
+    return [d.path for d in getFontDescriptors(input_path, recursive=recursive)]
+
+
+def getFontDescriptors(input_path: str, recursive=False) -> list:
+    """
+    Returns a list of FontDescriptor objects for the font files found in INPUT_PATH.
+
+    Files are validated reading only their header and table directory. Use FontDescriptor.open() to get a Font object
+    when needed.
+
+    :param input_path: A font file or a directory.
+    :param recursive: Also look for fonts in the subdirectories of INPUT_PATH.
+    """
+    descriptors = []
 
     if os.path.isfile(input_path):
-        try:
-            font = TTFont(input_path)
-            files.append(input_path)
-        except:
-            pass
+        descriptor = readFontDescriptor(input_path)
+        if descriptor is not None:
+            descriptors.append(descriptor)
 
     if os.path.isdir(input_path):
-        for f in os.listdir(input_path):
-            try:
-                font = TTFont(os.path.join(input_path, f))
-                files.append(os.path.join(input_path, f))
-            except:
-                pass
-
-    if len(files) == 0:
+        if recursive:
+            files = [os.path.join(root, f) for root, _, names in os.walk(input_path) for f in names]
+        else:
+            files = [os.path.join(input_path, f) for f in os.listdir(input_path)]
+        for file in files:
+            if not os.path.isfile(file):
+                continue
+            descriptor = readFontDescriptor(file)
+            if descriptor is not None:
+                descriptors.append(descriptor)
+
+    if len(descriptors) == 0:
         print('\nNo valid font files found.')
 
-    return files
+    return descriptors
 
 
 def getConfigPath(input_path: str) -> str:
@@ -180,62 +291,90 @@ def guessFamilyName(font: TTFont) -> str:
     return family_name
 
 
-def getSourceString(font_file: str, string_source: str) -> str:
-    font = TTFont(font_file)
-    file_name = os.path.basename(font_file)
-    name_table = font['name']
-    is_cff = 'CFF ' in font
-
-    # Get the source string
-    string = None
+# Name records read for each source string: (nameID, platformID, platEncID, langID). When more records are listed,
+# their strings are joined with a space.
+NAME_SOURCES = {
+    '1_1_2': ((1, 1, 0, 0x0), (2, 1, 0, 0x0)),
+    '1_4': ((4, 1, 0, 0x0),),
+    '1_6': ((6, 1, 0, 0x0),),
+    '1_16_17': ((16, 1, 0, 0x0), (17, 1, 0, 0x0)),
+    '1_18': ((18, 1, 0, 0x0),),
+    '3_1_2': ((1, 3, 1, 0x409), (2, 3, 1, 0x409)),
+    '3_4': ((4, 3, 1, 0x409),),
+    '3_6': ((6, 3, 1, 0x409),),
+    '3_16_17': ((16, 3, 1, 0x409), (17, 3, 1, 0x409)),
+}
+
+# CFF names read for each source string.
+CFF_SOURCES = {
+    'cff_1': 'font_name',
+    'cff_2': 'full_name',
+}
+
+
+def getSourceString(font_file: str, string_source: str, font=None) -> str:
+    """
+    Reads a string from the font name table, the CFF table or the file name, according to string_source.
 
+    :param font_file: The path of the font file.
+    :param string_source: One of 'fname', the keys of NAME_SOURCES or the keys of CFF_SOURCES.
+    :param font: Optionally, the already opened font. May be a TTFont, a 'name' table or a FontMetadata object. If not
+        provided and the string must be read from the font, the font file is opened.
+    :return: The source string, or None if it can't be read from the font (a 'cff_*' source on a TrueType font).
+    """
     if string_source == 'fname':
-        string = os.path.splitext(file_name)[0]
-
-    if string_source == '1_1_2':
-        str1 = str(name_table.getName(1, 1, 0, 0x0))
-        str2 = str(name_table.getName(2, 1, 0, 0x0))
-        string = str1 + ' ' + str2
+        return os.path.splitext(os.path.basename(font_file))[0]
 
-    if string_source == '1_4':
-        string = str(name_table.getName(4, 1, 0, 0x0))
+    if font is None:
+        font = TTFont(font_file, lazy=True)
 
-    if string_source == '1_6':
-        string = str(name_table.getName(6, 1, 0, 0x0))
+    if string_source in NAME_SOURCES:
+        name_table = font['name'] if isinstance(font, TTFont) else font
+        return ' '.join(str(name_table.getName(*record)) for record in NAME_SOURCES[string_source])
 
-    if string_source == '1_16_17':
-        str1 = str(name_table.getName(16, 1, 0, 0x0))
-        str2 = str(name_table.getName(17, 1, 0, 0x0))
-        string = str1 + ' ' + str2
+    if string_source in CFF_SOURCES:
+        cff_names = getCFFNames(font) if isinstance(font, TTFont) else getattr(font, 'cffNames', None)
+        if cff_names is not None:
+            return cff_names[CFF_SOURCES[string_source]]
 
-    if string_source == '1_18':
-        string = str(name_table.getName(18, 1, 0, 0x0))
+    return None
 
-    if string_source == '3_1_2':
-        str1 = str(name_table.getName(1, 3, 1, 0x409))
-        str2 = str(name_table.getName(2, 3, 1, 0x409))
-        string = str1 + ' ' + str2
 
-    if string_source == '3_4':
-        string = str(name_table.getName(4, 3, 1, 0x409))
+def getSourceStrings(files: list, string_source: str, fonts: list = None) -> list:
+    """
+    Reads the source string of a list of files in one pass.
 
-    if string_source == '3_6':
-        string = str(name_table.getName(6, 3, 1, 0x409))
+    :param files: The paths of the font files.
+    :param string_source: See getSourceString.
+    :param fonts: Optionally, the already opened fonts, in the same order of files. If not provided, names are read
+        from the metadata cache.
+    :return: A list of source strings, in the same order of files.
+    """
+    if string_source == 'fname':
+        return [getSourceString(f, string_source) for f in files]
 
-    if string_source == '3_16_17':
-        str1 = str(name_table.getName(16, 3, 1, 0x409))
-        str2 = str(name_table.getName(17, 3, 1, 0x409))
-        string = str1 + ' ' + str2
+    if fonts is not None:
+        return [getSourceString(f, string_source, font=font) for f, font in zip(files, fonts)]
 
-    if is_cff:
-        cff_table = font['CFF '].cff
-        if string_source == 'cff_1':
-            string = str(cff_table.fontNames[0])
+    from ftcli.Lib.metadataCache import MetadataCache
+    with MetadataCache() as cache:
+        return [getSourceString(f, string_source, font=cache.get(f)) for f in files]
 
-        if string_source == 'cff_2':
-            string = str(cff_table.topDictIndex[0].FullName)
 
-    return string
+def getCFFNames(font: TTFont) -> dict:
+    """
+    Returns the FontName, FullName and FamilyName of the first font in the CFF table, or None if the font is not CFF
+    flavored.
+    """
+    if 'CFF ' not in font:
+        return None
+    cff = font['CFF '].cff
+    top_dict = cff.topDictIndex[0]
+    return {
+        'font_name': str(cff.fontNames[0]),
+        'full_name': str(getattr(top_dict, 'FullName', None)),
+        'family_name': str(getattr(top_dict, 'FamilyName', None)),
+    }
 
 
 def calcCodePageRanges(unicodes):
@@ -243,85 +382,89 @@ def calcCodePageRanges(unicodes):
     corresponding OS/2 CodePage range bits.
     This is a direct translation of FontForge implementation:
     https://github.com/fontforge/fontforge/blob/7b2c074/fontforge/tottf.c#L3158
+
+    Only the characters that trigger a bit are looked up in the set, so the
+    cost doesn't depend on the number of codepoints.
     """
+    unicodes = unicodes if isinstance(unicodes, (set, frozenset)) else set(unicodes)
     codepageRanges = set()
 
-    chars = [chr(u) for u in unicodes]
-
-    hasAscii = set(range(0x20, 0x7E)).issubset(unicodes)
-    hasLineart = "┤" in chars
-
-    for char in chars:
-        if char == "Þ" and hasAscii:
-            codepageRanges.add(0)  # Latin 1
-        elif char == "Ľ" and hasAscii:
-            codepageRanges.add(1)  # Latin 2: Eastern Europe
-            if hasLineart:
-                codepageRanges.add(58)  # Latin 2
-        elif char == "Б":
-            codepageRanges.add(2)  # Cyrillic
-            if "Ѕ" in chars and hasLineart:
-                codepageRanges.add(57)  # IBM Cyrillic
-            if "╜" in chars and hasLineart:
-                codepageRanges.add(49)  # MS-DOS Russian
-        elif char == "Ά":
-            codepageRanges.add(3)  # Greek
-            if hasLineart and "½" in chars:
-                codepageRanges.add(48)  # IBM Greek
-            if hasLineart and "√" in chars:
-                codepageRanges.add(60)  # Greek, former 437 G
-        elif char == "İ" and hasAscii:
-            codepageRanges.add(4)  # Turkish
-            if hasLineart:
-                codepageRanges.add(56)  # IBM turkish
-        elif char == "א":
-            codepageRanges.add(5)  # Hebrew
-            if hasLineart and "√" in chars:
-                codepageRanges.add(53)  # Hebrew
-        elif char == "ر":
-            codepageRanges.add(6)  # Arabic
-            if "√" in chars:
-                codepageRanges.add(51)  # Arabic
-            if hasLineart:
-                codepageRanges.add(61)  # Arabic; ASMO 708
-        elif char == "ŗ" and hasAscii:
-            codepageRanges.add(7)  # Windows Baltic
-            if hasLineart:
-                codepageRanges.add(59)  # MS-DOS Baltic
-        elif char == "₫" and hasAscii:
-            codepageRanges.add(8)  # Vietnamese
-        elif char == "ๅ":
-            codepageRanges.add(16)  # Thai
-        elif char == "エ":
-            codepageRanges.add(17)  # JIS/Japan
-        elif char == "ㄅ":
-            codepageRanges.add(18)  # Chinese: Simplified chars
-        elif char == "ㄱ":
-            codepageRanges.add(19)  # Korean wansung
-        elif char == "央":
-            codepageRanges.add(20)  # Chinese: Traditional chars
-        elif char == "곴":
-            codepageRanges.add(21)  # Korean Johab
-        elif char == "♥" and hasAscii:
-            codepageRanges.add(30)  # OEM Character Set
-        # Symbol bit has a special meaning (check the spec), we need
-        # to confirm if this is wanted by default.
-        # elif chr(0xF000) <= char <= chr(0xF0FF):
-        #    codepageRanges.add(31)          # Symbol Character Set
-        elif char == "þ" and hasAscii and hasLineart:
-            codepageRanges.add(54)  # MS-DOS Icelandic
-        elif char == "╚" and hasAscii:
-            codepageRanges.add(62)  # WE/Latin 1
-            codepageRanges.add(63)  # US
-        elif hasAscii and hasLineart and "√" in chars:
-            if char == "Å":
-                codepageRanges.add(50)  # MS-DOS Nordic
-            elif char == "é":
-                codepageRanges.add(52)  # MS-DOS Canadian French
-            elif char == "õ":
-                codepageRanges.add(55)  # MS-DOS Portuguese
-
-    if hasAscii and "‰" in chars and "∑" in chars:
+    def has(char):
+        return ord(char) in unicodes
+
+    hasAscii = unicodes.issuperset(range(0x20, 0x7E))
+    hasLineart = has("┤")
+
+    if has("Þ") and hasAscii:
+        codepageRanges.add(0)  # Latin 1
+    if has("Ľ") and hasAscii:
+        codepageRanges.add(1)  # Latin 2: Eastern Europe
+        if hasLineart:
+            codepageRanges.add(58)  # Latin 2
+    if has("Б"):
+        codepageRanges.add(2)  # Cyrillic
+        if has("Ѕ") and hasLineart:
+            codepageRanges.add(57)  # IBM Cyrillic
+        if has("╜") and hasLineart:
+            codepageRanges.add(49)  # MS-DOS Russian
+    if has("Ά"):
+        codepageRanges.add(3)  # Greek
+        if hasLineart and has("½"):
+            codepageRanges.add(48)  # IBM Greek
+        if hasLineart and has("√"):
+            codepageRanges.add(60)  # Greek, former 437 G
+    if has("İ") and hasAscii:
+        codepageRanges.add(4)  # Turkish
+        if hasLineart:
+            codepageRanges.add(56)  # IBM turkish
+    if has("א"):
+        codepageRanges.add(5)  # Hebrew
+        if hasLineart and has("√"):
+            codepageRanges.add(53)  # Hebrew
+    if has("ر"):
+        codepageRanges.add(6)  # Arabic
+        if has("√"):
+            codepageRanges.add(51)  # Arabic
+        if hasLineart:
+            codepageRanges.add(61)  # Arabic; ASMO 708
+    if has("ŗ") and hasAscii:
+        codepageRanges.add(7)  # Windows Baltic
+        if hasLineart:
+            codepageRanges.add(59)  # MS-DOS Baltic
+    if has("₫") and hasAscii:
+        codepageRanges.add(8)  # Vietnamese
+    if has("ๅ"):
+        codepageRanges.add(16)  # Thai
+    if has("エ"):
+        codepageRanges.add(17)  # JIS/Japan
+    if has("ㄅ"):
+        codepageRanges.add(18)  # Chinese: Simplified chars
+    if has("ㄱ"):
+        codepageRanges.add(19)  # Korean wansung
+    if has("央"):
+        codepageRanges.add(20)  # Chinese: Traditional chars
+    if has("곴"):
+        codepageRanges.add(21)  # Korean Johab
+    if has("♥") and hasAscii:
+        codepageRanges.add(30)  # OEM Character Set
+    # Symbol bit has a special meaning (check the spec), we need
+    # to confirm if this is wanted by default.
+    # if any(0xF000 <= u <= 0xF0FF for u in unicodes):
+    #    codepageRanges.add(31)          # Symbol Character Set
+    if has("þ") and hasAscii and hasLineart:
+        codepageRanges.add(54)  # MS-DOS Icelandic
+    if has("╚") and hasAscii:
+        codepageRanges.add(62)  # WE/Latin 1
+        codepageRanges.add(63)  # US
+    if hasAscii and hasLineart and has("√"):
+        if has("Å"):
+            codepageRanges.add(50)  # MS-DOS Nordic
+        if has("é"):
+            codepageRanges.add(52)  # MS-DOS Canadian French
+        if has("õ"):
+            codepageRanges.add(55)  # MS-DOS Portuguese
+
+    if hasAscii and has("‰") and has("∑"):
         codepageRanges.add(29)  # Macintosh Character Set (US Roman)
 
     # when no codepage ranges can be enabled, fall back to enabling bit 0
@@ -333,23 +476,50 @@ def calcCodePageRanges(unicodes):
     return codepageRanges
 
 
-def intListToNum(intList, start, length):
-    all = []
-    bin = ""
-    for i in range(start, start + length):
-        if i in intList:
-            b = "1"
+# ulUnicodeRange bit of each BMP codepoint (0xFF if the codepoint isn't in any block). Built on first use.
+_bmpUnicodeRangeBits = None
+
+
+def calcUnicodeRanges(unicodes) -> set:
+    """
+    Given a set of Unicode codepoints (integers), calculates the OS/2 ulUnicodeRange bits for which there is at least
+    one codepoint in the corresponding block. Returns the same bits as fontTools' intersectUnicodeRanges().
+
+    BMP codepoints are looked up in a precomputed table, the others in the sorted list of blocks.
+    """
+    global _bmpUnicodeRangeBits
+    if _bmpUnicodeRangeBits is None:
+        table = bytearray(b'\xff' * 0x10000)
+        for bit, blocks in enumerate(OS2_UNICODE_RANGES):
+            for _, (start, stop) in blocks:
+                if start < 0x10000:
+                    table[start:min(stop, 0xFFFF) + 1] = bytes([bit]) * (min(stop, 0xFFFF) + 1 - start)
+        _bmpUnicodeRangeBits = bytes(table)
+
+    bmp = bytearray()
+    nonBmp = []
+    for code in unicodes:
+        if code < 0x10000:
+            bmp.append(_bmpUnicodeRangeBits[code])
         else:
-            b = "0"
-        bin = b + bin
-        if not (i + 1) % 8:
-            all.append(bin)
-            bin = ""
-    if bin:
-        all.append(bin)
-    all.reverse()
-    all = " ".join(all)
-    return binary2num(all)
+            nonBmp.append(code)
+
+    bits = set(bmp)
+    bits.discard(0xFF)
+    if nonBmp:
+        bits.update(intersectUnicodeRanges(nonBmp))
+    return bits
+
+
+def intListToNum(intList, start, length) -> int:
+    """
+    Packs the bits in intList that fall in range(start, start + length) into an integer.
+    """
+    num = 0
+    for i in intList:
+        if start <= i < start + length:
+            num |= 1 << (i - start)
+    return num
 
 
 def is_nth_bit_set(x: int, n: int) -> bool:
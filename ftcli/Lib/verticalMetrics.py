@@ -0,0 +1,104 @@
+import math
+
+from fontTools import unicodedata
+
+from ftcli.Lib.Font import Font
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+class FontExtents(object):
+    """
+    The vertical extents (yMin and yMax values) of the glyphs of a font. See readFontExtents().
+    """
+
+    def __init__(self, file, glyphNames, yMins, yMaxs):
+        self.file = file
+        self.glyphNames = glyphNames
+        self.yMins = yMins
+        self.yMaxs = yMaxs
+
+    def __len__(self):
+        return len(self.glyphNames)
+
+
+def readFontExtents(file: str, scripts=None) -> FontExtents:
+    """
+    Reads the vertical extents of the glyphs of a font, using the glyph bounds engine of Font. Empty glyphs are skipped.
+
+    :param file: Path to the font file.
+    :param scripts: Optionally, a list of ISO 15924 script codes (like 'Latn' or 'Cyrl'). If specified, only the glyphs
+        mapped to characters of these scripts are read.
+    """
+    font = Font(file, surgical=True)
+    bounds = font.glyphBounds.getAllBounds()
+
+    if scripts:
+        scripts = set(scripts)
+        cmap = font.getBestCmap() or {}
+        selected = {glyphName for codepoint, glyphName in cmap.items() if unicodedata.script(chr(codepoint)) in scripts}
+        glyphNames = [g for g in bounds if g in selected and bounds[g] is not None]
+    else:
+        glyphNames = [g for g in bounds if bounds[g] is not None]
+    font.close()
+
+    return FontExtents(file, glyphNames, [bounds[g][1] for g in glyphNames], [bounds[g][3] for g in glyphNames])
+
+
+class FamilyExtents(object):
+    """
+    The distribution of the vertical extents of the glyphs of a family, used to select the ascender and descender values
+    that fit most glyphs, ignoring the outliers (like swashes).
+
+    Ascender and descender are positive values: the descender is the depth below the baseline.
+
+    :param fonts: A list of FontExtents objects.
+    """
+
+    def __init__(self, fonts: list):
+        self.fonts = fonts
+
+    def __len__(self):
+        return sum(len(f) for f in self.fonts)
+
+    def getAscender(self, percentile: float = 100) -> int:
+        """
+        Returns the given percentile of the yMax values of all glyphs, rounded up.
+        """
+        return max(0, math.ceil(_percentile([y for f in self.fonts for y in f.yMaxs], percentile)))
+
+    def getDescender(self, percentile: float = 100) -> int:
+        """
+        Returns the given percentile of the depths below the baseline of all glyphs, rounded up.
+        """
+        return max(0, math.ceil(_percentile([-y for f in self.fonts for y in f.yMins], percentile)))
+
+    def getGlyphsAbove(self, ascender: int) -> list:
+        """
+        Returns a list of (file, glyph name, yMax) tuples of the glyphs taller than the ascender, tallest first.
+        """
+        glyphs = [(f.file, g, y) for f in self.fonts for g, y in zip(f.glyphNames, f.yMaxs) if y > ascender]
+        return sorted(glyphs, key=lambda x: -x[2])
+
+    def getGlyphsBelow(self, descender: int) -> list:
+        """
+        Returns a list of (file, glyph name, yMin) tuples of the glyphs deeper than the descender, deepest first.
+        """
+        glyphs = [(f.file, g, y) for f in self.fonts for g, y in zip(f.glyphNames, f.yMins) if -y > descender]
+        return sorted(glyphs, key=lambda x: x[2])
+
+
+def _percentile(values, percentile):
+    # Linear interpolation between the closest ranks, like numpy.percentile() does by default.
+    if not values:
+        raise ValueError('no glyphs found')
+    if np is not None:
+        return float(np.percentile(values, percentile))
+    values = sorted(values)
+    rank = (len(values) - 1) * percentile / 100
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
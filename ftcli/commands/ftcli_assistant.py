@@ -4,9 +4,10 @@ import click
 
 from ftcli.Lib.CUI import CUI
 from ftcli.Lib.Font import Font
+from ftcli.Lib.batch import makeOutputFileNames, runBatch, saveFont
 from ftcli.Lib.configHandler import configHandler
 from ftcli.Lib.csvHandler import csvHandler
-from ftcli.Lib.utils import (getConfigPath, getCsvPath, getFontsList, makeOutputFileName)
+from ftcli.Lib.utils import (getConfigPath, getCsvPath, getFontsList)
 
 
 # edit-csv
@@ -209,18 +210,26 @@ def recalc_csv(input_path, config_file, family_name, source_string, quiet):
         confirmation = click.confirm(
             '\n{} already exists. Do you want to overwrite it?'.format(csv_file))
         if confirmation is True:
-            csvHandler(csv_file).recalcCSV(
+            changed = csvHandler(csv_file).recalcCSV(
                 config_file=config_file, family_name=family_name, source_string=source_string)
-            click.secho('\n{} created'.format(csv_file), fg='green')
+            _printRecalcResult(csv_file, changed)
     else:
         # Let's ensure that, if the data.csv file doesn't exist,
         # it is created before recalculation.
-        if not os.path.exists(csv_file):
+        created = not os.path.exists(csv_file)
+        if created:
             csvHandler(csv_file).resetCSV(config_file=config_file)
 
-        csvHandler(csv_file).recalcCSV(
+        changed = csvHandler(csv_file).recalcCSV(
             config_file=config_file, family_name=family_name, source_string=source_string)
+        _printRecalcResult(csv_file, changed or created)
+
+
+def _printRecalcResult(csv_file, changed):
+    if changed:
         click.secho('\n{} created'.format(csv_file), fg='green')
+    else:
+        click.secho('\n{} --> no changes'.format(csv_file), fg='yellow')
 
 
 # recalc-names
@@ -336,12 +345,11 @@ def recalc_names(
     csv_file = getCsvPath(input_path)
     if not os.path.exists(csv_file):
         csvHandler(csv_file).resetCSV(config_file=config_file)
-    data = csvHandler(csv_file).getData()
+    records = csvHandler(csv_file).getRecords()
 
     # Checks if the file name is present in the CSV data. If the file name s not present, the file is removed from the
     # list of files and will not be processed.
-    csv_filenames = [row['file_name'] for row in data]
-    files = [f for f in files if os.path.basename(f) in csv_filenames]
+    files = [f for f in files if os.path.basename(f) in records]
 
     shorten_width = [int(i) for i in shorten_width]
     shorten_weight = [int(i) for i in shorten_weight]
@@ -353,29 +361,23 @@ def recalc_names(
     linked_styles = list(linked_styles)
     linked_styles.sort()
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-            print(f"\nParsing file: {os.path.basename(f)}")
-            font_data = {}
-            for row in data:
-                if str(row['file_name']) == os.path.basename(f):
-                    font_data = row
-
-            font.recalcNames(
-                font_data,
-                linked_styles=linked_styles, namerecords_to_ignore=exclude_namerecords, shorten_weight=shorten_weight,
-                shorten_width=shorten_width, shorten_slope=shorten_slope, alt_uid=alt_uid, fixCFF=fix_cff,
-                is_superfamily=super_family, regular_italic=regular_italic, keep_regular=keep_regular,
-                old_full_font_name=old_full_font_name, oblique_not_italic=oblique_not_italic,
-                no_auto_shorten=no_auto_shorten)
-
-            output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
-            pass
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+
+    # Each file gets its own row, so that the whole store isn't sent to the worker processes.
+    runBatch(_recalc_names, files, output_files,
+             taskKwargs=[{'font_data': records.get(os.path.basename(f), {})} for f in files],
+             linked_styles=linked_styles, namerecords_to_ignore=exclude_namerecords, shorten_weight=shorten_weight,
+             shorten_width=shorten_width, shorten_slope=shorten_slope, alt_uid=alt_uid, fixCFF=fix_cff,
+             is_superfamily=super_family, regular_italic=regular_italic, keep_regular=keep_regular,
+             old_full_font_name=old_full_font_name, oblique_not_italic=oblique_not_italic,
+             no_auto_shorten=no_auto_shorten, recalc_timestamp=recalc_timestamp)
+
+
+def _recalc_names(file, output_file, font_data, recalc_timestamp, **kwargs):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+    print(f"\nParsing file: {os.path.basename(file)}")
+    font.recalcNames(font_data, **kwargs)
+    return saveFont(font, output_file)
 
 
 cli = click.CommandCollection(sources=[editCFG, editCSV, initCFG, initCSV, recalcCSV, recalcNames], help="""
@@ -2,9 +2,13 @@ import os
 import sys
 
 import click
+from fontTools import unicodedata
 
 from ftcli.Lib.Font import Font
-from ftcli.Lib.utils import getFontsList, makeOutputFileName, guessFamilyName
+from ftcli.Lib.batch import makeOutputFileNames, mapBatch, runBatch, saveFont
+from ftcli.Lib.sfnt import readVerticalMetrics
+from ftcli.Lib.utils import getFontDescriptors, getFontsList, guessFamilyName
+from ftcli.Lib.verticalMetrics import FamilyExtents, readFontExtents
 
 
 @click.group()
@@ -34,39 +38,46 @@ def set_linegap(input_path, percent, modify_family_name, output_dir, recalc_time
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_set_linegap, files, output_files, percent=percent, modify_family_name=modify_family_name,
+             recalc_timestamp=recalc_timestamp)
 
-    for f in files:
 
-        file_name, ext = os.path.splitext(os.path.basename(f))
-        file_dir = os.path.dirname(f)
+def _set_linegap(file, output_file, percent, modify_family_name, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+    messages = setLinegap(font, percent, modify_family_name)
 
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-            font.modifyLinegapPercent(percent)
-
-            # Modify the family name according to the linegap percent
-            if modify_family_name:
-                old_family_name = guessFamilyName(font)
-                if old_family_name:
-                    old_family_name_without_spaces = old_family_name.replace(" ", "")
-                    new_family_name = old_family_name + ' LG{}'.format(str(percent))
-                    new_family_name_without_spaces = new_family_name.replace(" ", "")
-                    font.findReplace(oldString=old_family_name, newString=new_family_name, fixCFF=True)
-                    font.findReplace(oldString=old_family_name_without_spaces, newString=new_family_name_without_spaces,
-                                     fixCFF=True)
-                else:
-                    click.secho('Warning: could not retrieve Family Name, it has not been modified.', fg='yellow')
-
-            # Before we add the "-linegap%" string to the new file name, let's remove it to avoid strange names like
-            # Font-Bold-linegap20-linegap20.otf
-            # new_file_path = os.path.join(file_dir, file_name.replace('-linegap' + str(percent), '') + '-linegap'
-            #                              + str(percent) + ext)
-            output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
+    # Before we add the "-linegap%" string to the new file name, let's remove it to avoid strange names like
+    # Font-Bold-linegap20-linegap20.otf
+    # new_file_path = os.path.join(file_dir, file_name.replace('-linegap' + str(percent), '') + '-linegap'
+    #                              + str(percent) + ext)
+    messages.extend(saveFont(font, output_file))
+    return messages
 
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+
+def setLinegap(font, percent, modify_family_name=False) -> list:
+    """
+    Applies the options of the set-linegap command to an open font, without saving it.
+
+    :return: A list of (message, color) tuples.
+    """
+    messages = []
+    font.modifyLinegapPercent(percent)
+
+    # Modify the family name according to the linegap percent
+    if modify_family_name:
+        old_family_name = guessFamilyName(font)
+        if old_family_name:
+            old_family_name_without_spaces = old_family_name.replace(" ", "")
+            new_family_name = old_family_name + ' LG{}'.format(str(percent))
+            new_family_name_without_spaces = new_family_name.replace(" ", "")
+            font.findReplace(oldString=old_family_name, newString=new_family_name, fixCFF=True)
+            font.findReplace(oldString=old_family_name_without_spaces, newString=new_family_name_without_spaces,
+                             fixCFF=True)
+        else:
+            messages.append(('Warning: could not retrieve Family Name, it has not been modified.', 'yellow'))
+
+    return messages
 
 
 @click.group()
@@ -78,6 +89,15 @@ def alignVMetrics():
 @click.argument('input_path', type=click.Path(exists=True, file_okay=False, resolve_path=True))
 @click.option('-sil', '--sil-method', is_flag=True,
               help='Use SIL method: https://silnrsi.github.io/FDBP/en-US/Line_Metrics.html')
+@click.option('-p', '--percentile', type=click.FloatRange(0, 100, min_open=True),
+              help="""
+Calculate the ascender and descender values from the bounds of the glyphs of all fonts, using the given percentile of
+the glyphs heights and depths instead of the maximum values. For example, 99.5 ignores the tallest and deepest 0.5% of
+the glyphs.""")
+@click.option('-s', '--script', 'scripts', multiple=True,
+              help="""
+Calculate the ascender and descender values only from the glyphs of the characters of the given script (ISO 15924 code,
+like Latn, Grek or Cyrl). This option can be repeated multiple times (for example: -s Latn -s Cyrl).""")
 @click.option('-o', '--output-dir', type=click.Path(file_okay=False, resolve_path=True),
               help="""
 The output directory where the output files are to be created. If it doesn't exist, will be created. If not specified,
@@ -92,7 +112,7 @@ to current time.
 By default, modified files are overwritten. Use this switch to save them to a new file (numbers are appended at the end
 of file name).
 """)
-def align(input_path, sil_method, output_dir, recalc_timestamp, overwrite):
+def align(input_path, sil_method, percentile, scripts, output_dir, recalc_timestamp, overwrite):
     """
     Aligns all fonts stored in INPUT_PATH folder to the same baseline.
 
@@ -100,76 +120,116 @@ def align(input_path, sil_method, output_dir, recalc_timestamp, overwrite):
     INPUT_PATH folder and applies those values to all fonts.
 
     This can produce undesired effects (an exaggerated line height) when one or more fonts contain swashes, for example.
-    In such cases, it's better to copy the vertical metrics from a template font to one or more destination fonts using
-    the 'ftcli metrics copy' command.
+    In such cases, use the -p/--percentile and -s/--script options to calculate the values from the glyphs that matter,
+    ignoring the outliers: the glyphs that don't fit are listed in a report. Glyphs taller or deeper than the new
+    values may be clipped on Windows. Alternatively, copy the vertical metrics from a template font to one or more
+    destination fonts using the 'ftcli metrics copy' command.
 
     See https://kltf.de/download/FontMetrics-kltf.pdf for more information.
     """
-    files = getFontsList(input_path)
+    scripts = [s.title() for s in scripts]
+    for s in scripts:
+        try:
+            unicodedata.script_name(s)
+        except KeyError:
+            raise click.BadParameter(f"'{s}' is not a valid ISO 15924 script code.", param_hint="'-s' / '--script'")
 
+    # Scan phase: the values are unpacked from the raw 'head', 'hhea' and 'OS/2' table data, without opening the fonts.
+    files = []
     idealAscenders = []
     idealDescenders = []
     realAscenders = []
     realDescenders = []
 
-    for f in files:
+    for d in getFontDescriptors(input_path):
         try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-
-            yMax = font['head'].yMax
-            yMin = font['head'].yMin
-
-            ascender = font['hhea'].ascender
-            descender = font['hhea'].descender
-
-            sTypoAscender = font['OS/2'].sTypoAscender
-            sTypoDescender = font['OS/2'].sTypoDescender
-            usWinAscent = font['OS/2'].usWinAscent
-            usWinDescent = font['OS/2'].usWinDescent
-
-            idealAscenders.extend([sTypoAscender])
-            idealDescenders.extend([abs(sTypoDescender)])
+            metrics = readVerticalMetrics(d)
+        except Exception as e:
+            click.secho(f'{os.path.basename(d.path)} --> ERROR: {e}', fg='red')
+            continue
 
-            realAscenders.extend([yMax, usWinAscent, ascender])
-            realDescenders.extend(
-                [abs(yMin), abs(usWinDescent), abs(descender)])
+        files.append(d.path)
+        idealAscenders.append(metrics['sTypoAscender'])
+        idealDescenders.append(abs(metrics['sTypoDescender']))
+        realAscenders.extend([metrics['yMax'], metrics['usWinAscent'], metrics['ascender']])
+        realDescenders.extend([abs(metrics['yMin']), abs(metrics['usWinDescent']), abs(metrics['descender'])])
 
-        except Exception as e:
-            click.secho('ERROR: {}'.format(e), fg='red')
-            files.remove(f)
+    if not files:
+        return
 
     maxRealAscender = max(realAscenders)
     maxRealDescender = max(realDescenders)
+
+    # Glyph bounds phase, only needed to select the values from the glyphs.
+    if percentile is not None or scripts:
+        fonts = []
+        for f, result in zip(files, mapBatch(readFontExtents, files, scripts=scripts)):
+            if isinstance(result, Exception):
+                click.secho(f'{os.path.basename(f)} --> ERROR: {result}', fg='red')
+            else:
+                fonts.append(result)
+        files = [f.file for f in fonts]
+
+        family = FamilyExtents(fonts)
+        if len(family) == 0:
+            click.secho('No glyphs found.', fg='red')
+            return
+        if percentile is None:
+            percentile = 100
+        maxRealAscender = family.getAscender(percentile)
+        maxRealDescender = family.getDescender(percentile)
+        _printExtentsReport(family, percentile, maxRealAscender, maxRealDescender)
+
     maxIdealAscender = max(idealAscenders)
     maxIdealDescender = max(idealDescenders)
     sTypoLineGap = (maxRealAscender + maxRealDescender) - (maxIdealAscender + maxIdealDescender)
     sTypoLineGap = 0
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-
-            font['hhea'].ascender = maxRealAscender
-            font['hhea'].descender = -maxRealDescender
-            font['hhea'].lineGap = 0
-
-            font['OS/2'].usWinAscent = maxRealAscender
-            font['OS/2'].usWinDescent = maxRealDescender
-            font['OS/2'].sTypoAscender = maxIdealAscender
-            font['OS/2'].sTypoDescender = -maxIdealDescender
-            font['OS/2'].sTypoLineGap = sTypoLineGap
-
-            if sil_method:
-                font['OS/2'].sTypoAscender = maxRealAscender
-                font['OS/2'].sTypoDescender = -maxRealDescender
-                font['OS/2'].sTypoLineGap = 0
-
-            output_file = makeOutputFileName(
-                f, outputDir=output_dir, overWrite=overwrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+    # Edit phase.
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_align, files, output_files, maxRealAscender=maxRealAscender, maxRealDescender=maxRealDescender,
+             maxIdealAscender=maxIdealAscender, maxIdealDescender=maxIdealDescender, sTypoLineGap=sTypoLineGap,
+             sil_method=sil_method, recalc_timestamp=recalc_timestamp)
+
+
+def _printExtentsReport(family, percentile, ascender, descender, limit=10):
+    value = 'maximum' if percentile == 100 else f'percentile {percentile:g}'
+    click.secho(f'\n{len(family)} glyphs in {len(family.fonts)} fonts', fg='cyan')
+    click.secho(f'Ascender: {ascender} ({value} of yMax)')
+    click.secho(f'Descender: {descender} ({value} of yMin)')
+
+    for description, glyphs in (('taller than the ascender', family.getGlyphsAbove(ascender)),
+                                ('deeper than the descender', family.getGlyphsBelow(descender))):
+        if not glyphs:
+            continue
+        click.secho(f'{len(glyphs)} glyphs {description}:', fg='yellow')
+        for file, glyph_name, y in glyphs[:limit]:
+            click.secho(f'  {os.path.basename(file)}: {glyph_name} ({y})')
+        if len(glyphs) > limit:
+            click.secho(f'  ... and {len(glyphs) - limit} more')
+    click.secho()
+
+
+def _align(file, output_file, maxRealAscender, maxRealDescender, maxIdealAscender, maxIdealDescender, sTypoLineGap,
+           sil_method, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+
+    font['hhea'].ascender = maxRealAscender
+    font['hhea'].descender = -maxRealDescender
+    font['hhea'].lineGap = 0
+
+    font['OS/2'].usWinAscent = maxRealAscender
+    font['OS/2'].usWinDescent = maxRealDescender
+    font['OS/2'].sTypoAscender = maxIdealAscender
+    font['OS/2'].sTypoDescender = -maxIdealDescender
+    font['OS/2'].sTypoLineGap = sTypoLineGap
+
+    if sil_method:
+        font['OS/2'].sTypoAscender = maxRealAscender
+        font['OS/2'].sTypoDescender = -maxRealDescender
+        font['OS/2'].sTypoLineGap = 0
+
+    return saveFont(font, output_file)
 
 
 @click.group()
@@ -219,27 +279,27 @@ def copy(source_file, destination, output_dir, recalc_timestamp, overwrite):
         sys.exit()
 
     files = getFontsList(destination)
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_copy, files, output_files, ascender=ascender, descender=descender, lineGap=lineGap,
+             usWinAscent=usWinAscent, usWinDescent=usWinDescent, sTypoAscender=sTypoAscender,
+             sTypoDescender=sTypoDescender, sTypoLineGap=sTypoLineGap, recalc_timestamp=recalc_timestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-
-            font['hhea'].ascender = ascender
-            font['hhea'].descender = descender
-            font['hhea'].lineGap = lineGap
-
-            font['OS/2'].usWinAscent = usWinAscent
-            font['OS/2'].usWinDescent = usWinDescent
-            font['OS/2'].sTypoAscender = sTypoAscender
-            font['OS/2'].sTypoDescender = sTypoDescender
-            font['OS/2'].sTypoLineGap = sTypoLineGap
-
-            output_file = makeOutputFileName(
-                f, outputDir=output_dir, overWrite=overwrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+
+def _copy(file, output_file, ascender, descender, lineGap, usWinAscent, usWinDescent, sTypoAscender, sTypoDescender,
+          sTypoLineGap, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+
+    font['hhea'].ascender = ascender
+    font['hhea'].descender = descender
+    font['hhea'].lineGap = lineGap
+
+    font['OS/2'].usWinAscent = usWinAscent
+    font['OS/2'].usWinDescent = usWinDescent
+    font['OS/2'].sTypoAscender = sTypoAscender
+    font['OS/2'].sTypoDescender = sTypoDescender
+    font['OS/2'].sTypoLineGap = sTypoLineGap
+
+    return saveFont(font, output_file)
 
 
 cli = click.CommandCollection(sources=[alignVMetrics, copyVMetrics, setLineGap], help="""
@@ -3,6 +3,8 @@ import os
 import click
 
 from ftcli.Lib.Font import Font
+from ftcli.Lib.batch import makeOutputFileNames, runBatch, saveFont
+from ftcli.Lib.replacements import loadReplacements
 from ftcli.Lib.utils import getFontsList, makeOutputFileName, add_file_or_path_argument, add_common_options
 
 
@@ -24,16 +26,15 @@ def add_prefix(input_path, prefix, nameIDs, platform, outputDir, recalcTimestamp
     """Adds a prefix to the specified namerecords.
     """
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_add_prefix, files, output_files, prefix=prefix, nameIDs=nameIDs, platform=platform,
+             recalcTimestamp=recalcTimestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.addPrefix(prefix=prefix, name_ids=nameIDs, platform=platform)
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+
+def _add_prefix(file, output_file, prefix, nameIDs, platform, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.addPrefix(prefix=prefix, name_ids=nameIDs, platform=platform)
+    return saveFont(font, output_file)
 
 
 @click.group()
@@ -54,17 +55,15 @@ def add_suffix(input_path, suffix, nameIDs, platform, outputDir, recalcTimestamp
     """Adds a suffix to the specified namerecords.
     """
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_add_suffix, files, output_files, suffix=suffix, nameIDs=nameIDs, platform=platform,
+             recalcTimestamp=recalcTimestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.addSuffix(suffix=suffix, name_ids=nameIDs, platform=platform)
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
 
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+def _add_suffix(file, output_file, suffix, nameIDs, platform, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.addSuffix(suffix=suffix, name_ids=nameIDs, platform=platform)
+    return saveFont(font, output_file)
 
 
 @click.group()
@@ -85,19 +84,16 @@ def clean_name_table(input_path, exclude_namerecord, outputDir, recalcTimestamp,
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_clean_name_table, files, output_files, exclude_namerecord=exclude_namerecord,
+             recalcTimestamp=recalcTimestamp)
+
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            for name in font['name'].names:
-                if name.nameID in exclude_namerecord:
-                    continue
-                font.delNameRecord(nameID=name.nameID, language='ALL')
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+def _clean_name_table(file, output_file, exclude_namerecord, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.nameIndex.removeRecords(
+        [name for name in font.nameIndex.getRecords() if name.nameID not in exclude_namerecord])
+    return saveFont(font, output_file)
 
 
 # copy-names
@@ -125,8 +121,8 @@ def copy_names(source_font, dest_font, outputDir, recalcTimestamp, overWrite):
         d = Font(dest_font, recalcTimestamp=recalcTimestamp)
         d['name'] = s['name']
         output_file = makeOutputFileName(dest_font, outputDir=outputDir, overWrite=overWrite)
-        d.save(output_file)
-        click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
+        for message, color in saveFont(d, output_file):
+            click.secho(message, fg=color)
     except Exception as e:
         click.secho(f'ERROR: {e}', fg='red')
 
@@ -163,16 +159,15 @@ def del_mac_names(input_path, exclude_namerecord, outputDir, recalcTimestamp, ov
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_del_mac_names, files, output_files, exclude_namerecord=exclude_namerecord,
+             recalcTimestamp=recalcTimestamp)
+
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.delMacNames(exclude_namerecord=exclude_namerecord)
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+def _del_mac_names(file, output_file, exclude_namerecord, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.delMacNames(exclude_namerecord=exclude_namerecord)
+    return saveFont(font, output_file)
 
 
 # del-names
@@ -208,17 +203,16 @@ def del_names(input_path, nameIDs, platform, language, outputDir, recalcTimestam
     mac = False if platform == "win" else True
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_del_names, files, output_files, nameIDs=nameIDs, language=language, windows=windows, mac=mac,
+             recalcTimestamp=recalcTimestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            for n in nameIDs:
-                font.delNameRecord(n, language=language, windows=windows, mac=mac)
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+
+def _del_names(file, output_file, nameIDs, language, windows, mac, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    for n in nameIDs:
+        font.delNameRecord(n, language=language, windows=windows, mac=mac)
+    return saveFont(font, output_file)
 
 
 # find-replace
@@ -284,21 +278,101 @@ def find_replace(input_path, old_string, new_string, name_id, platform, fix_cff,
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_find_replace, files, output_files, old_string=old_string, new_string=new_string, name_id=name_id,
+             platform=platform, fix_cff=fix_cff, exclude_namerecord=exclude_namerecord,
+             recalcTimestamp=recalcTimestamp)
+
+
+def _find_replace(file, output_file, old_string, new_string, name_id, platform, fix_cff, exclude_namerecord,
+                  recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    fix_count = font.findReplace(old_string, new_string, fixCFF=fix_cff, nameID=name_id, platform=platform,
+                                 namerecords_to_ignore=exclude_namerecord)
+
+    if fix_count > 0:
+        return saveFont(font, output_file)
+    else:
+        return [(f'{os.path.basename(file)} --> no changes made', 'yellow')]
+
+
+# find-replace-bulk
+@click.group()
+def findReplaceBulk():
+    pass
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            fix_count = font.findReplace(old_string, new_string, fixCFF=fix_cff, nameID=name_id, platform=platform,
-                                         namerecords_to_ignore=exclude_namerecord)
 
-            if fix_count > 0:
-                output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-                font.save(output_file)
-                click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-            else:
-                click.secho(f'{os.path.basename(f)} --> no changes made', fg='yellow')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+@findReplaceBulk.command()
+@add_file_or_path_argument()
+@click.option('-m', '--mapping-file', required=True, type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+              help="Path to the file containing the replacements: a JSON file, or a text file with an 'old;new' pair "
+                   "per line.")
+@click.option('-r', '--regex', is_flag=True,
+              help="Treat the old strings as regular expressions.")
+@click.option('-n', '--name-id', type=click.IntRange(0, 32767),
+              help="nameID (Integer between 0 and 32767). If not specified, the strings will be replaced in all "
+                   "namerecords.")
+@click.option("-p", "--platform", type=click.Choice(choices=["win", "mac"]),
+              help="platform [win, mac]. If no platform is specified, the strings will be replaced in both tables.")
+@click.option('-cff', '--fix-cff', is_flag=True,
+              help="Replaces the strings in the CFF table.")
+@click.option('-ex', '--exclude-namerecord', type=click.IntRange(0, 32767), multiple=True,
+              help="NameIDs to ignore. The specified nameIDs won't be changed. This option can be repeated multiple "
+                   "times (for example: -ex 3 -ex 5 -ex 6).")
+@add_common_options()
+def find_replace_bulk(input_path, mapping_file, regex, name_id, platform, fix_cff, exclude_namerecord, outputDir,
+                      recalcTimestamp, overWrite):
+    """Replaces a list of strings in the `name` table and, optionally, in the `CFF` table.
+
+    The replacements are read from a mapping file and applied to each font in one pass, so the fonts are read and
+    saved once. The mapping file can be a JSON file containing an object:
+
+    \b
+        {"Black": "Heavy", "Foundry Inc.": "New Foundry Ltd."}
+
+    or a list of pairs:
+
+    \b
+        [["Black", "Heavy"], ["Foundry Inc.", "New Foundry Ltd."]]
+
+    Any other file is read as a list of 'old;new' pairs, one per line. Empty lines and lines starting with '#' are
+    ignored:
+
+    \b
+        Black;Heavy
+        Foundry Inc.;New Foundry Ltd.
+
+    Each part of a string is replaced at most once, so the order of the replacements doesn't matter: with 'Bold;Black'
+    and 'Black;Heavy', 'Bold Black' becomes 'Black Heavy'. When more strings match at the same position, the longest
+    one is replaced.
+
+    With the `-r / --regex` option, the old strings are regular expressions, applied in order. The new strings can
+    reference the groups of the expression (for example: '(\\w+) Inc\\.;\\1 Ltd.').
+
+    The `-n`, `-p`, `-cff` and `-ex` options work like in the `find-replace` command.
+    """
+
+    try:
+        replacements = loadReplacements(mapping_file, regex=regex)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise click.BadParameter(f"{os.path.basename(mapping_file)}: {e}", param_hint="'-m' / '--mapping-file'")
+
+    files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_find_replace_bulk, files, output_files, replacements=replacements, name_id=name_id, platform=platform,
+             fix_cff=fix_cff, exclude_namerecord=exclude_namerecord, recalcTimestamp=recalcTimestamp)
+
+
+def _find_replace_bulk(file, output_file, replacements, name_id, platform, fix_cff, exclude_namerecord,
+                       recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    fix_count = font.replaceStrings(replacements.replace, fixCFF=fix_cff, nameID=name_id, platform=platform,
+                                    namerecords_to_ignore=exclude_namerecord)
+
+    if fix_count > 0:
+        return saveFont(font, output_file, message=f'{fix_count} strings replaced')
+    else:
+        return [(f'{os.path.basename(file)} --> no changes made', 'yellow')]
 
 
 # lang-help
@@ -362,17 +436,9 @@ def name_from_txt(input_path, name_id, platform, language, input_file, outputDir
         string = f.read()
 
     files = getFontsList(input_path)
-
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.setMultilingualName(nameID=name_id, language=language, string=string, windows=windows, mac=mac)
-
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_set_name, files, output_files, name_id=name_id, language=language, string=string, windows=windows,
+             mac=mac, recalcTimestamp=recalcTimestamp)
 
 
 # set-cff-names
@@ -396,20 +462,18 @@ def set_cff_names(input_path, font_name, full_name, family_name, weight, copyrig
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_set_cff_names, files, output_files, font_name=font_name, full_name=full_name, family_name=family_name,
+             weight=weight, copyright_=copyright_, notice=notice, recalcTimestamp=recalcTimestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            if 'CFF ' not in font:
-                click.secho(f'{f} is not a CFF font', fg='red')
-                return
-            font.setCFFNames(fontNames=font_name, FullName=full_name, FamilyName=family_name, Weight=weight,
-                             Copyright=copyright_, Notice=notice)
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{output_file} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+
+def _set_cff_names(file, output_file, font_name, full_name, family_name, weight, copyright_, notice, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    if 'CFF ' not in font:
+        return [(f'{file} is not a CFF font', 'red')]
+    font.setCFFNames(fontNames=font_name, FullName=full_name, FamilyName=family_name, Weight=weight,
+                     Copyright=copyright_, Notice=notice)
+    return saveFont(font, output_file)
 
 
 # set-name
@@ -444,17 +508,15 @@ def set_name(input_path, name_id, platform, language, string, outputDir, recalcT
     mac = False if platform == "win" else True
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_set_name, files, output_files, name_id=name_id, language=language, string=string, windows=windows,
+             mac=mac, recalcTimestamp=recalcTimestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.setMultilingualName(nameID=name_id, language=language, string=string, windows=windows, mac=mac)
 
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+def _set_name(file, output_file, name_id, language, string, windows, mac, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.setMultilingualName(nameID=name_id, language=language, string=string, windows=windows, mac=mac)
+    return saveFont(font, output_file)
 
 
 @click.group()
@@ -470,19 +532,17 @@ def win_2_mac(input_path, outputDir, recalcTimestamp, overWrite):
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_win_2_mac, files, output_files, recalcTimestamp=recalcTimestamp)
+
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.win2mac()
-            output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+def _win_2_mac(file, output_file, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.win2mac()
+    return saveFont(font, output_file)
 
 
 cli = click.CommandCollection(sources=[
-    setName, nameFromTxt, delNames, setCffNames, findReplace, win2Mac, delMacNames,
+    setName, nameFromTxt, delNames, setCffNames, findReplace, findReplaceBulk, win2Mac, delMacNames,
     langHelp, cleanNameTable, copyNames, addPrefix, addSuffix],
     help="A set of command line tools to manipulate `name` table entries.")
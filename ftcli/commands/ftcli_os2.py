@@ -3,7 +3,8 @@ import os
 import click
 
 from ftcli.Lib.Font import Font
-from ftcli.Lib.utils import getFontsList, makeOutputFileName
+from ftcli.Lib.batch import makeOutputFileNames, runBatch
+from ftcli.Lib.utils import getFontsList
 
 
 @click.command()
@@ -109,232 +110,254 @@ def cli(input_path, version, weight, width, embed_level, no_subsetting, bitmap_e
     Command line OS/2 table editor.
     """
 
-    files = getFontsList(input_path)
-
-    for f in files:
-        try:
-            # Add this control to save only modified files.
-            modified = False
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-
-            # OS/2 Table version.
-            if version is not None:
-                current_version = font['OS/2'].version
-
-                # Prevent updating to the same version.
-                if version == current_version:
-                    click.secho(f'{os.path.basename(f)}: OS/2 version is already {current_version}!', fg='yellow')
-
-                # Prevent version downgrade.
-                elif version < current_version:
-                    click.secho(f'{os.path.basename(f)}: current OS/2 version is {current_version}. '
-                                f'Please, insert a value greater than {current_version}', fg='yellow')
-                else:
-                    font.setOS2Version(target_version=version)
-                    modified = True
-
-            # usWeightClass.
-            if weight is not None:
-                if font['OS/2'].usWeightClass != weight:
-                    font['OS/2'].usWeightClass = weight
-                    modified = True
-
-            # usWidthClass.
-            if width is not None:
-                if font['OS/2'].usWidthClass != width:
-                    font['OS/2'].usWidthClass = width
-                    modified = True
-
-            # Embed level: fsType bits 0-3.
-            if embed_level is not None:
-                # Convert string to integer as first thing.
-                embed_level = int(embed_level)
-                current_value = font.getEmbedLevel()
-                if not embed_level == current_value:
-                    font.setEmbedLevel(embed_level)
-                    modified = True
-
-            # No Subsetting: fsType bit 8.
-            if no_subsetting is not None:
-                # Convert string to bool as first thing.
-                no_subsetting = bool(int(no_subsetting))
-                current_value = font.getNoSubsettingValue()
-                if not no_subsetting == current_value:
-                    modified = True
-                    if no_subsetting is True:
-                        font.setNoSubsettingBit()
-                    if no_subsetting is False:
-                        font.clearNoSubsettingBit()
-
-            # Bitmap Embedding Only: fsType bit 9.
-            if bitmap_embedding_only is not None:
-                # Convert string to bool as first thing.
-                bitmap_embedding_only = bool(int(bitmap_embedding_only))
-                current_value = font.getBitmapEmbedOnlyValue()
-                if not bitmap_embedding_only == current_value:
-                    modified = True
-                    if bitmap_embedding_only is True:
-                        font.setBitmapEmbedOnlyBit()
-                    if bitmap_embedding_only is False:
-                        font.clearBitmapEmbedOnlyBit()
-
-            # Italic bit: fsSelection bit 0 and, consequently, 'head'.macStyle bit 1.
-            if italic is not None:
-                if font.isItalic() != italic:
-                    if italic is True:
-                        font.setItalic()
-                    else:
-                        font.unsetItalic()
-                    modified = True
-
-            # Bold bit: fsSelection bit 5 and, consequently, 'head'.macStyle bit 0.
-            if bold is not None:
-                if font.isBold() != bold:
-                    if bold is True:
-                        font.setBold()
-                    else:
-                        font.unsetBold()
-                    modified = True
-
-            # Regular: fsSelection bit 6.
-            if regular is not None:
-                # Prevent from using -r with -b or -i
-                if bold or italic:
-                    print("\nThe -r/--regular switch can't be used in conjunction with -b/--bold or -i/--italic.")
-                    break
-                if font.isRegular() is False:
-                    font.setRegular()
-                    modified = True
-
-            # Use Typo Metrics: fsSelection bit 7.
-            if use_typo_metrics is not None:
-                # Convert string to bool as first thing.
-                use_typo_metrics = bool(int(use_typo_metrics))
-                if font.getUseTypoMetricsValue() != use_typo_metrics:
-                    font['OS/2'].version = 4
-                    if use_typo_metrics is True:
-                        if font['OS/2'].version > 3:
-                            font.setUseTypoMetrics()
-                            modified = True
-                        else:
-                            click.secho("fsSelection bits 7 is only defined in OS/2 table version 4 and up."
-                                        "Current version: {}".format(font['OS/2'].version), fg='yellow')
-                    if use_typo_metrics is False:
-                        font.unsetUseTypoMetrics()
-                        modified = True
-
-            # WWS consistent: fsSelection bit 8.
-            if wws_consistent is not None:
-                # Convert string to bool as first thing.
-                wws_consistent = bool(int(wws_consistent))
-                if font.isWWS() != wws_consistent:
-                    if wws_consistent is True:
-                        font.setWWS()
-                    else:
-                        font.unsetWWS()
-                    modified = True
-
-            # Oblique: fsSelection bit 8.
-            if oblique is not None:
-                # Convert string to bool as first thing.
-                oblique = bool(int(oblique))
-                if font.isOblique() != oblique:
-                    if oblique is True:
-                        font.setOblique()
-                    else:
-                        font.unsetOblique()
+    # Prevent from using -r with -b or -i
+    if regular is not None and (bold or italic):
+        print("\nThe -r/--regular switch can't be used in conjunction with -b/--bold or -i/--italic.")
+        return
 
-                    modified = True
-
-            # achVendId 4 characters string.
-            if ach_vend_id:
-                if len(ach_vend_id) > 4:
-                    ach_vend_id = ach_vend_id[0:4]
-                    click.secho('ach_vend_id was longer than 4 characters, it has been truncated.', fg='yellow')
-                if len(ach_vend_id) < 4:
-                    ach_vend_id = str(ach_vend_id).ljust(4)
-                if not ach_vend_id == font['OS/2'].achVendID:
-                    font.setAchVendID(ach_vend_id)
-                    modified = True
-
-            # ulUnicodeRange1-4 bits.
-            if recalc_unicodes is True:
-                if not font['OS/2'].getUnicodeRanges() == font['OS/2'].recalcUnicodeRanges(font):
-                    font['OS/2'].setUnicodeRanges(font['OS/2'].recalcUnicodeRanges(font))
-                    modified = True
-
-            # Import ulUnicodeRanges.
-            if unicodes_source_font is not None:
-                try:
-                    source_font = Font(unicodes_source_font)
-                    source_unicodes = source_font['OS/2'].getUnicodeRanges()
-                    if not font['OS/2'].getUnicodeRanges() == source_unicodes:
-                        font['OS/2'].setUnicodeRanges(source_unicodes)
-                        modified = True
-                except Exception as e:
-                    print(f'ERROR: {e}')
-
-            # ulCodePageRange(1-2) bits.
-            if recalc_codepages is True:
-                ulCodePageRange1, ulCodePageRange2 = font.recalcCodePageRanges()
-                os2_version = font['OS/2'].version
-
-                # Check if OS/2.version is greater than 0.
-                if os2_version < 1:
-                    click.secho(f'{os.path.basename(f)} OS/2 table version is {os2_version}. '
-                                f'ulCodePageRange1 and ulCodePageRange2 are only defined in OS/2 version 1 and up.',
-                                fg='red')
-                    continue
-
-                # Check if for some reason ulCodePageRange1 is not present.
-                if not hasattr(font['OS/2'], 'ulCodePageRange1'):
-                    font['OS/2'].ulCodePageRange1 = ulCodePageRange1
-                    modified = True
-                else:
-                    if not font['OS/2'].ulCodePageRange1 == ulCodePageRange1:
-                        font['OS/2'].ulCodePageRange1 = ulCodePageRange1
-                        modified = True
+    files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_edit_os2, files, output_files, version=version, weight=weight, width=width, embed_level=embed_level,
+             no_subsetting=no_subsetting, bitmap_embedding_only=bitmap_embedding_only, bold=bold, italic=italic,
+             regular=regular, use_typo_metrics=use_typo_metrics, wws_consistent=wws_consistent, oblique=oblique,
+             ach_vend_id=ach_vend_id, recalc_unicodes=recalc_unicodes, unicodes_source_font=unicodes_source_font,
+             recalc_codepages=recalc_codepages, recalc_x_height=recalc_x_height,
+             recalc_cap_height=recalc_cap_height, recalc_us_max_context=recalc_us_max_context,
+             recalc_timestamp=recalc_timestamp)
+
+
+def _edit_os2(file, output_file, recalc_timestamp, **kwargs):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+    modified, messages = editOS2(font, **kwargs)
+
+    if modified is True and font.save(output_file):
+        messages.append((f'{output_file} --> saved', 'green'))
+    else:
+        messages.append((f'{file} --> no changes made', 'yellow'))
+    return messages
+
+
+def editOS2(font, version=None, weight=None, width=None, embed_level=None, no_subsetting=None,
+            bitmap_embedding_only=None, bold=None, italic=None, regular=None, use_typo_metrics=None,
+            wws_consistent=None, oblique=None, ach_vend_id=None, recalc_unicodes=False, unicodes_source_font=None,
+            recalc_codepages=False, recalc_x_height=False, recalc_cap_height=False, recalc_us_max_context=False) \
+        -> tuple:
+    """
+    Applies the options of the os2 command to an open font, without saving it.
 
-                # Check if for some reason ulCodePageRange2 is not present.
-                if not hasattr(font['OS/2'], 'ulCodePageRange2'):
-                    font['OS/2'].ulCodePageRange2 = ulCodePageRange2
+    :return: A tuple with a boolean telling whether the font has been modified, and a list of (message, color) tuples.
+    """
+    file = font.file
+    # Add this control to save only modified files.
+    modified = False
+    messages = []
+
+    # OS/2 Table version.
+    if version is not None:
+        current_version = font['OS/2'].version
+
+        # Prevent updating to the same version.
+        if version == current_version:
+            messages.append((f'{os.path.basename(file)}: OS/2 version is already {current_version}!', 'yellow'))
+
+        # Prevent version downgrade.
+        elif version < current_version:
+            messages.append((f'{os.path.basename(file)}: current OS/2 version is {current_version}. '
+                        f'Please, insert a value greater than {current_version}', 'yellow'))
+        else:
+            font.setOS2Version(target_version=version)
+            modified = True
+
+    # usWeightClass.
+    if weight is not None:
+        if font['OS/2'].usWeightClass != weight:
+            font['OS/2'].usWeightClass = weight
+            modified = True
+
+    # usWidthClass.
+    if width is not None:
+        if font['OS/2'].usWidthClass != width:
+            font['OS/2'].usWidthClass = width
+            modified = True
+
+    # Embed level: fsType bits 0-3.
+    if embed_level is not None:
+        # Convert string to integer as first thing.
+        embed_level = int(embed_level)
+        current_value = font.getEmbedLevel()
+        if not embed_level == current_value:
+            font.setEmbedLevel(embed_level)
+            modified = True
+
+    # No Subsetting: fsType bit 8.
+    if no_subsetting is not None:
+        # Convert string to bool as first thing.
+        no_subsetting = bool(int(no_subsetting))
+        current_value = font.getNoSubsettingValue()
+        if not no_subsetting == current_value:
+            modified = True
+            if no_subsetting is True:
+                font.setNoSubsettingBit()
+            if no_subsetting is False:
+                font.clearNoSubsettingBit()
+
+    # Bitmap Embedding Only: fsType bit 9.
+    if bitmap_embedding_only is not None:
+        # Convert string to bool as first thing.
+        bitmap_embedding_only = bool(int(bitmap_embedding_only))
+        current_value = font.getBitmapEmbedOnlyValue()
+        if not bitmap_embedding_only == current_value:
+            modified = True
+            if bitmap_embedding_only is True:
+                font.setBitmapEmbedOnlyBit()
+            if bitmap_embedding_only is False:
+                font.clearBitmapEmbedOnlyBit()
+
+    # Italic bit: fsSelection bit 0 and, consequently, 'head'.macStyle bit 1.
+    if italic is not None:
+        if font.isItalic() != italic:
+            if italic is True:
+                font.setItalic()
+            else:
+                font.unsetItalic()
+            modified = True
+
+    # Bold bit: fsSelection bit 5 and, consequently, 'head'.macStyle bit 0.
+    if bold is not None:
+        if font.isBold() != bold:
+            if bold is True:
+                font.setBold()
+            else:
+                font.unsetBold()
+            modified = True
+
+    # Regular: fsSelection bit 6.
+    if regular is not None:
+        if font.isRegular() is False:
+            font.setRegular()
+            modified = True
+
+    # Use Typo Metrics: fsSelection bit 7.
+    if use_typo_metrics is not None:
+        # Convert string to bool as first thing.
+        use_typo_metrics = bool(int(use_typo_metrics))
+        if font.getUseTypoMetricsValue() != use_typo_metrics:
+            font['OS/2'].version = 4
+            if use_typo_metrics is True:
+                if font['OS/2'].version > 3:
+                    font.setUseTypoMetrics()
                     modified = True
                 else:
-                    if not font['OS/2'].ulCodePageRange2 == ulCodePageRange2:
-                        font['OS/2'].ulCodePageRange2 = ulCodePageRange2
-                        modified = True
-
-            # sxHeight value
-            if recalc_x_height is not None:
-                if not font['OS/2'].sxHeight == font.recalcXHeight():
-                    font['OS/2'].sxHeight = font.recalcXHeight()
-                    modified = True
-
-            # sCapHeightValue
-            if recalc_cap_height is not None:
-                if not font['OS/2'].sCapHeight == font.recalcCapHeight():
-                    font['OS/2'].sCapHeight = font.recalcCapHeight()
-                    modified = True
-
-            # usMaxContext value.
-            if recalc_us_max_context is True:
-                if not font['OS/2'].usMaxContext == font.recalcUsMaxContext():
-                    font['OS/2'].usMaxContext = font.recalcUsMaxContext()
-                    modified = True
-
-            # General options
-            if output_dir is None:
-                output_dir = os.path.dirname(f)
+                    messages.append(("fsSelection bits 7 is only defined in OS/2 table version 4 and up."
+                                "Current version: {}".format(font['OS/2'].version), 'yellow'))
+            if use_typo_metrics is False:
+                font.unsetUseTypoMetrics()
+                modified = True
+
+    # WWS consistent: fsSelection bit 8.
+    if wws_consistent is not None:
+        # Convert string to bool as first thing.
+        wws_consistent = bool(int(wws_consistent))
+        if font.isWWS() != wws_consistent:
+            if wws_consistent is True:
+                font.setWWS()
             else:
-                if not os.path.exists(output_dir):
-                    os.mkdir(output_dir)
-
-            output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-            if modified is True:
-                font.save(output_file)
-                click.secho(f'{output_file} --> saved', fg='green')
+                font.unsetWWS()
+            modified = True
+
+    # Oblique: fsSelection bit 8.
+    if oblique is not None:
+        # Convert string to bool as first thing.
+        oblique = bool(int(oblique))
+        if font.isOblique() != oblique:
+            if oblique is True:
+                font.setOblique()
             else:
-                click.secho(f'{f} --> no changes made', fg='yellow')
-
+                font.unsetOblique()
+
+            modified = True
+
+    # achVendId 4 characters string.
+    if ach_vend_id:
+        if len(ach_vend_id) > 4:
+            ach_vend_id = ach_vend_id[0:4]
+            messages.append(('ach_vend_id was longer than 4 characters, it has been truncated.', 'yellow'))
+        if len(ach_vend_id) < 4:
+            ach_vend_id = str(ach_vend_id).ljust(4)
+        if not ach_vend_id == font['OS/2'].achVendID:
+            font.setAchVendID(ach_vend_id)
+            modified = True
+
+    # The codepoints are read once from the 'cmap' table, for both ulUnicodeRange and ulCodePageRange bits.
+    unicodes = font.getUnicodes() if recalc_unicodes is True or recalc_codepages is True else None
+
+    # ulUnicodeRange1-4 bits.
+    if recalc_unicodes is True:
+        unicode_ranges = font.recalcUnicodeRanges(unicodes)
+        if not font['OS/2'].getUnicodeRanges() == unicode_ranges:
+            font['OS/2'].setUnicodeRanges(unicode_ranges)
+            modified = True
+
+    # Import ulUnicodeRanges.
+    if unicodes_source_font is not None:
+        try:
+            source_font = Font(unicodes_source_font)
+            source_unicodes = source_font['OS/2'].getUnicodeRanges()
+            if not font['OS/2'].getUnicodeRanges() == source_unicodes:
+                font['OS/2'].setUnicodeRanges(source_unicodes)
+                modified = True
         except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+            messages.append((f'ERROR: {e}', 'red'))
+
+    # ulCodePageRange(1-2) bits.
+    if recalc_codepages is True:
+        ulCodePageRange1, ulCodePageRange2 = font.recalcCodePageRanges(unicodes)
+        os2_version = font['OS/2'].version
+
+        # Check if OS/2.version is greater than 0.
+        if os2_version < 1:
+            messages.append((f'{os.path.basename(file)} OS/2 table version is {os2_version}. '
+                             f'ulCodePageRange1 and ulCodePageRange2 are only defined in OS/2 version 1 and up.',
+                             'red'))
+            # The font is not saved when the code page ranges can't be set.
+            return False, messages
+
+        # Check if for some reason ulCodePageRange1 is not present.
+        if not hasattr(font['OS/2'], 'ulCodePageRange1'):
+            font['OS/2'].ulCodePageRange1 = ulCodePageRange1
+            modified = True
+        else:
+            if not font['OS/2'].ulCodePageRange1 == ulCodePageRange1:
+                font['OS/2'].ulCodePageRange1 = ulCodePageRange1
+                modified = True
+
+        # Check if for some reason ulCodePageRange2 is not present.
+        if not hasattr(font['OS/2'], 'ulCodePageRange2'):
+            font['OS/2'].ulCodePageRange2 = ulCodePageRange2
+            modified = True
+        else:
+            if not font['OS/2'].ulCodePageRange2 == ulCodePageRange2:
+                font['OS/2'].ulCodePageRange2 = ulCodePageRange2
+                modified = True
+
+    # sxHeight value
+    if recalc_x_height is True:
+        x_height = font.recalcXHeight()
+        if not font['OS/2'].sxHeight == x_height:
+            font['OS/2'].sxHeight = x_height
+            modified = True
+
+    # sCapHeightValue
+    if recalc_cap_height is True:
+        cap_height = font.recalcCapHeight()
+        if not font['OS/2'].sCapHeight == cap_height:
+            font['OS/2'].sCapHeight = cap_height
+            modified = True
+
+    # usMaxContext value.
+    if recalc_us_max_context is True:
+        if not font['OS/2'].usMaxContext == font.recalcUsMaxContext():
+            font['OS/2'].usMaxContext = font.recalcUsMaxContext()
+            modified = True
+
+    return modified, messages
@@ -0,0 +1,267 @@
+import json
+import os
+
+import click
+
+from ftcli.Lib.Font import Font
+from ftcli.Lib.batch import makeOutputFileNames, runBatch, saveFont
+from ftcli.Lib.utils import getFontDescriptors, OutputPathAllocator
+from ftcli.commands import ftcli_metrics, ftcli_names, ftcli_os2, ftcli_utils, ftcli_webfonts
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+# Options that are set once for the whole manifest, and can't be used in the steps.
+MANIFEST_OPTIONS = ('input', 'output_dir', 'recalc_timestamp', 'overwrite', 'steps')
+RESERVED_PARAMS = ('input_path', 'output_dir', 'outputDir', 'recalc_timestamp', 'recalcTimestamp', 'overwrite',
+                   'overWrite', 'delete_source_file')
+
+# The step that writes the webfonts. It doesn't edit the font, so it must be the last one.
+WEBFONTS_STEP = 'webfonts compress'
+
+
+def _os2(font, regular, bold, italic, **kwargs):
+    if regular is not None and (bold or italic):
+        raise click.UsageError("The -r/--regular switch can't be used in conjunction with -b/--bold or -i/--italic.")
+    _, messages = ftcli_os2.editOS2(font, regular=regular, bold=bold, italic=italic, **kwargs)
+    return messages
+
+
+def _addPrefix(font, prefix, nameIDs, platform):
+    font.addPrefix(prefix=prefix, name_ids=nameIDs, platform=platform)
+    return []
+
+
+def _addSuffix(font, suffix, nameIDs, platform):
+    font.addSuffix(suffix=suffix, name_ids=nameIDs, platform=platform)
+    return []
+
+
+def _delMacNames(font, exclude_namerecord):
+    font.delMacNames(exclude_namerecord=exclude_namerecord)
+    return []
+
+
+def _delNames(font, nameIDs, platform, language):
+    for n in nameIDs:
+        font.delNameRecord(n, language=language, windows=platform != 'mac', mac=platform != 'win')
+    return []
+
+
+def _findReplace(font, old_string, new_string, name_id, platform, fix_cff, exclude_namerecord):
+    font.findReplace(old_string, new_string, fixCFF=fix_cff, nameID=name_id, platform=platform,
+                     namerecords_to_ignore=exclude_namerecord)
+    return []
+
+
+def _setName(font, name_id, platform, language, string):
+    font.setMultilingualName(nameID=name_id, language=language, string=string, windows=platform != 'mac',
+                             mac=platform != 'win')
+    return []
+
+
+def _win2Mac(font):
+    font.win2mac()
+    return []
+
+
+def _setLinegap(font, percent, modify_family_name):
+    return ftcli_metrics.setLinegap(font, percent, modify_family_name)
+
+
+def _addDsig(font):
+    if 'DSIG' not in font:
+        font.addDummyDSIG()
+    return []
+
+
+def _delTable(font, table):
+    if table in font:
+        del font[table]
+    return []
+
+
+# Operations that can be used in a manifest: the command whose options are accepted by the step, and a function that
+# applies them to an open font and returns a list of (message, color) tuples. Fonts are opened in surgical mode, so
+# only operations that don't touch the glyphs can be added here.
+STEPS = {
+    'os2': (ftcli_os2.cli, _os2),
+    'names add-prefix': (ftcli_names.add_prefix, _addPrefix),
+    'names add-suffix': (ftcli_names.add_suffix, _addSuffix),
+    'names del-mac-names': (ftcli_names.del_mac_names, _delMacNames),
+    'names del-names': (ftcli_names.del_names, _delNames),
+    'names find-replace': (ftcli_names.find_replace, _findReplace),
+    'names set-name': (ftcli_names.set_name, _setName),
+    'names win-2-mac': (ftcli_names.win_2_mac, _win2Mac),
+    'metrics set-linegap': (ftcli_metrics.set_linegap, _setLinegap),
+    'utils add-dsig': (ftcli_utils.add_dsig, _addDsig),
+    'utils del-table': (ftcli_utils.del_table, _delTable),
+    WEBFONTS_STEP: (ftcli_webfonts.compress, None),
+}
+
+
+@click.command()
+@click.argument('manifest', type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.option('-i', '--input-path', type=click.Path(exists=True, resolve_path=True),
+              help="Process the fonts in INPUT_PATH instead of the input path of the manifest.")
+def cli(manifest, input_path):
+    """
+Runs the operations listed in a JSON or YAML manifest file.
+
+Each font is opened once, the operations are applied in order and the font is saved once, instead of reading and
+writing all the files for each command. If the last step is 'webfonts compress', the WOFF/WOFF2 files are created from
+the saved font.
+
+Steps are the names of the commands, with their options (long names, without dashes). Paths are relative to the folder
+of the manifest. For example:
+
+\b
+input: fonts
+output_dir: build
+recalc_timestamp: false
+overwrite: true
+steps:
+  - os2:
+      weight: 400
+      use_typo_metrics: 1
+  - names find-replace:
+      old_string: Black
+      new_string: Heavy
+  - metrics set-linegap:
+      percent: 20
+  - utils add-dsig
+  - webfonts compress:
+      flavor: woff2
+
+Available steps: os2, names add-prefix, names add-suffix, names del-mac-names, names del-names, names find-replace,
+names set-name, names win-2-mac, metrics set-linegap, utils add-dsig, utils del-table, webfonts compress.
+
+YAML manifests require PyYAML.
+    """
+
+    data = loadManifest(manifest)
+    base_dir = os.path.dirname(manifest)
+
+    if input_path is None:
+        if not data.get('input'):
+            raise click.UsageError(f"{os.path.basename(manifest)}: no input path specified.")
+        input_path = os.path.join(base_dir, data['input'])
+        if not os.path.exists(input_path):
+            raise click.UsageError(f"{os.path.basename(manifest)}: input path '{data['input']}' does not exist.")
+    output_dir = os.path.join(base_dir, data['output_dir']) if data.get('output_dir') else None
+
+    steps = [parseStep(step, input_path, base_dir) for step in data.get('steps') or []]
+    if not steps:
+        raise click.UsageError(f"{os.path.basename(manifest)}: no steps specified.")
+    webfonts = {}
+    if steps[-1][0] == WEBFONTS_STEP:
+        webfonts = steps.pop()[1]
+    if any(name == WEBFONTS_STEP for name, _ in steps):
+        raise click.UsageError(f"'{WEBFONTS_STEP}' must be the last step.")
+
+    descriptors = getFontDescriptors(input_path)
+    files = [d.path for d in descriptors]
+    overwrite = data.get('overwrite', True)
+    allocator = OutputPathAllocator(outputDir=output_dir, overWrite=overwrite)
+    output_files = makeOutputFileNames(files, allocator=allocator)
+
+    # Like 'webfonts compress', the webfonts step skips the inputs that already are webfonts.
+    webfont_files = [{} for _ in files]
+    if webfonts:
+        sfnt_files = [(webfont_file, d.path) for webfont_file, d in zip(webfont_files, descriptors)
+                      if d.flavor is None]
+        flavors = [webfonts['flavor']] if webfonts['flavor'] else ['woff', 'woff2']
+        for flv in flavors:
+            for (webfont_file, _), flavor_output_file in zip(sfnt_files, makeOutputFileNames(
+                    [f for _, f in sfnt_files], extension='.' + flv, allocator=allocator)):
+                webfont_file[flv] = flavor_output_file
+
+    runBatch(_run, files, list(zip(output_files, webfont_files)), steps=steps,
+             recalc_timestamp=data.get('recalc_timestamp', False), speed=webfonts.get('speed', 'balanced'))
+
+
+def _run(file, output_files, steps, recalc_timestamp, speed):
+    output_file, webfont_files = output_files
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+
+    messages = []
+    for name, params in steps:
+        messages.extend(STEPS[name][1](font, **params))
+    messages.extend(saveFont(font, output_file))
+
+    if webfont_files:
+        with open(output_file, 'rb') as f:
+            data = f.read()
+        messages.extend(ftcli_webfonts.writeWebfonts(data, webfont_files, speed=speed))
+
+    return messages
+
+
+def loadManifest(path: str) -> dict:
+    """
+    Reads a JSON or YAML manifest file, depending on the file extension.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if os.path.splitext(path)[1].lower() in ('.yaml', '.yml'):
+            if yaml is None:
+                raise click.UsageError("PyYAML is required to read YAML manifests. Install it or use a JSON manifest.")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    if not isinstance(data, dict):
+        raise click.UsageError(f"{os.path.basename(path)}: the manifest must be a mapping.")
+    unknown = [k for k in data if k not in MANIFEST_OPTIONS]
+    if unknown:
+        raise click.UsageError(f"{os.path.basename(path)}: unknown option(s): {', '.join(unknown)}.")
+    return data
+
+
+def parseStep(step, inputPath: str, baseDir: str) -> tuple:
+    """
+    Validates a step of a manifest with the options of the corresponding command.
+
+    :param step: The step name, or a mapping of the step name and its options.
+    :param inputPath: The input path of the manifest, used as argument of the command.
+    :param baseDir: The folder relative paths are resolved against.
+    :return: A tuple with the step name and a dictionary of parameters for the step function.
+    """
+    if isinstance(step, str):
+        name, values = step, {}
+    elif isinstance(step, dict) and len(step) == 1:
+        name, values = next(iter(step.items()))
+        values = values or {}
+    else:
+        raise click.UsageError(f"Invalid step: {step!r}. Use the step name, or a mapping of the name and its options.")
+    if name not in STEPS:
+        raise click.UsageError(f"Unknown step: '{name}'. Available steps: {', '.join(STEPS)}.")
+    if not isinstance(values, dict):
+        raise click.UsageError(f"'{name}': options must be a mapping.")
+
+    command = STEPS[name][0]
+    # Options can be referenced by parameter name or by long option name, with dashes or underscores.
+    params = {}
+    for param in command.params:
+        if param.name in RESERVED_PARAMS:
+            continue
+        params[param.name] = param
+        for opt in param.opts:
+            if opt.startswith('--'):
+                params[opt[2:].replace('-', '_')] = param
+
+    default_map = {}
+    for key, value in values.items():
+        param = params.get(str(key).replace('-', '_'))
+        if param is None:
+            raise click.UsageError(f"'{name}': unknown option '{key}'.")
+        if isinstance(param.type, click.Choice) and not isinstance(value, (str, bool)):
+            value = str(value)
+        if isinstance(param.type, click.Path) and isinstance(value, str):
+            value = os.path.join(baseDir, value)
+        default_map[param.name] = value
+
+    # The command parses the options like it does on the command line, so values are converted and validated.
+    ctx = command.make_context(name, [inputPath], default_map=default_map)
+    return name, {k: v for k, v in ctx.params.items() if k not in RESERVED_PARAMS}
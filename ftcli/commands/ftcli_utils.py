@@ -1,16 +1,23 @@
 import os
+import struct
 import sys
 
 import click
 from dehinter.font import dehint
 from fontTools.feaLib.builder import addOpenTypeFeatures
-from fontTools.ttLib import TTCollection
-from fontTools.ttLib import TTFont
+from fontTools.misc.timeTools import timestampNow
+from fontTools.ttLib import TTFont, getTableClass
 from fontTools.ttLib.removeOverlaps import removeOverlaps
 
 from ftcli.Lib.Font import Font
-from ftcli.Lib.utils import (getFontsList, makeOutputFileName, getSourceString, add_file_or_path_argument,
-                             add_common_options, replaceIllegalCharacters)
+from ftcli.Lib.batch import makeOutputFileNames, runBatch, saveFont
+from ftcli.Lib.duplicates import DuplicateIndex
+from ftcli.Lib.metadataCache import MetadataCache
+from ftcli.Lib.renamePlan import JOURNAL_FILE_NAME, RenamePlan, rollbackRenames
+from ftcli.Lib.sfnt import (HEAD_MODIFIED_OFFSET, readCollectionDescriptors, readFontDescriptor, streamSFNT,
+                            writeCollection)
+from ftcli.Lib.utils import (getFontDescriptors, getFontsList, makeOutputFileName, getSourceStrings,
+                             add_file_or_path_argument, add_common_options, replaceIllegalCharacters)
 
 
 @click.group()
@@ -31,19 +38,18 @@ def recalc_italic_bits(input_path, outputDir, overWrite, recalcTimestamp):
         click.pause('\nNo font files found.')
         sys.exit()
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalcTimestamp)
-            font.italicBitsFromItalicAngle()
-            # Checking if the font has changed. If not, file isn't saved.
-            if font.has_changed:
-                output_file = makeOutputFileName(f, outputDir=outputDir, overWrite=overWrite)
-                font.save(output_file)
-                click.secho(f'{os.path.basename(f)} --> saved', fg='green')
-            else:
-                click.secho(f'{os.path.basename(f)} --> no changes', fg='yellow')
-        except Exception as e:
-            click.secho(f'{os.path.basename(f)}: {e}', fg='red')
+    output_files = makeOutputFileNames(files, outputDir=outputDir, overWrite=overWrite)
+    runBatch(_recalc_italic_bits, files, output_files, recalcTimestamp=recalcTimestamp)
+
+
+def _recalc_italic_bits(file, output_file, recalcTimestamp):
+    font = Font(file, recalcTimestamp=recalcTimestamp, surgical=True)
+    font.italicBitsFromItalicAngle()
+    # Checking if the font has changed. If not, file isn't saved.
+    if font.has_changed:
+        return saveFont(font, output_file)
+    else:
+        return [(f'{os.path.basename(file)} --> no changes', 'yellow')]
 
 
 @click.group()
@@ -53,7 +59,19 @@ def fontOrganizer():
 
 @fontOrganizer.command()
 @click.argument('input_path', type=click.Path(exists=True, resolve_path=True))
-def font_organizer(input_path):
+@click.option('-d', '--duplicates', type=click.Choice(choices=['skip', 'link', 'report']),
+              help="""
+Look for duplicate fonts before organizing them. 'skip' leaves exact duplicates where they are, 'link' replaces them
+with hard links to the organized font, 'report' organizes them as usual. In all cases, duplicates and near-duplicates
+are reported. See the find-duplicates command.
+""")
+@click.option('--dry-run', is_flag=True, help="Show the planned renames, without renaming any file.")
+@click.option('--rollback', is_flag=True,
+              help="""
+Undo the last renames made in INPUT_PATH (or in the folder of INPUT_PATH), using the journal saved by this command or by
+font-renamer, and exit. Also restores the files of a batch that was interrupted.
+""")
+def font_organizer(input_path, duplicates=None, dry_run=False, rollback=False):
     """Renames font files according to PostScript name and sorts them by foundry and family names.
 
     Usage: ftcli utils font-organizer INPUT_PATH
@@ -67,9 +85,18 @@ def font_organizer(input_path):
     Family name is read from nameID 16, or nameID 1 where nameID 16 is not present.
 
     If two files have identical foundry name, family name and PostScript name, a suffix with a number (#1, #2, etc.)
-    is added at the end of filename to avoid overwriting an existing file.
+    is added at the end of filename to avoid overwriting an existing file. Use the `-d / --duplicates` option to skip
+    or hard link the files that are exact duplicates of another one, instead.
+
+    All new paths are planned before renaming any file, and files are renamed as a batch: if a rename fails, the files
+    already renamed are restored. Use `--dry-run` to only show the plan, and `--rollback` to undo the last batch.
     """
 
+    journal_file = _getJournalFile(input_path)
+    if rollback:
+        _rollbackRenames(journal_file)
+        return
+
     print(f'\nParsing {input_path}')
 
     files = getFontsList(input_path)
@@ -77,10 +104,20 @@ def font_organizer(input_path):
         click.pause('\nNo font files found.')
         sys.exit()
 
+    index = None
+    duplicate_of = {}
+    if duplicates is not None:
+        index = DuplicateIndex(sorted(files))
+        if duplicates in ('skip', 'link'):
+            duplicate_of = index.getDuplicates()
+
     print()
+    plan = RenamePlan()
     for f in files:
+        if f in duplicate_of:
+            continue
         try:
-            font = TTFont(f, recalcTimestamp=False)
+            font = TTFont(f, recalcTimestamp=False, lazy=True)
 
             try:
                 foundry_name = font['name'].getName(8, 3, 1, 0x409).toUnicode()
@@ -122,19 +159,95 @@ def font_organizer(input_path):
                     new_file_name = f"{os.path.splitext(os.path.basename(f))[0]}{new_ext}"
 
             new_file_name = replaceIllegalCharacters(new_file_name, replacement_text="_")
+            font.close()
 
             new_dir = os.path.join(os.path.dirname(f), foundry_name, family_name)
-            new_file = makeOutputFileName(os.path.join(new_dir, new_file_name))
+            plan.add(f, os.path.join(new_dir, new_file_name))
+
+        except Exception as e:
+            click.secho(f'{os.path.basename(f)}: {e}', fg='red')
 
-            os.makedirs(new_dir, exist_ok=True)
-            os.rename(f, new_file)
+    if not _applyRenamePlan(plan, journal_file, dry_run):
+        if index is not None:
+            _printDuplicates(index)
+        return
 
-            click.secho(f'\nOLD PATH: {f}', fg="green")
-            click.secho(f'NEW PATH: {new_file}', fg="green")
+    for f, new_file in plan:
+        click.secho(f'\nOLD PATH: {f}', fg="green")
+        click.secho(f'NEW PATH: {new_file}', fg="green")
 
+    moved = dict(plan.renames)
+    for f, original in duplicate_of.items():
+        original = moved.get(original, original)
+        if duplicates == 'skip':
+            click.secho(f'\n{f} --> skipped, duplicate of {original}', fg='yellow')
+            continue
+        try:
+            # The link is created with a temporary name first, so that the duplicate isn't lost if linking fails.
+            link = f'{f}.link'
+            os.link(original, link)
+            os.replace(link, f)
+            click.secho(f'\n{f} --> hard linked to {original}', fg='green')
         except Exception as e:
             click.secho(f'{os.path.basename(f)}: {e}', fg='red')
 
+    if index is not None:
+        _printDuplicates(index)
+
+
+@click.group()
+def findDuplicates():
+    pass
+
+
+@findDuplicates.command()
+@click.argument('input_path', type=click.Path(exists=True, resolve_path=True))
+@click.option('-r', '--recursive', is_flag=True, help="Also look for fonts in the subdirectories of INPUT_PATH.")
+@click.option('--exact-only', is_flag=True, help="Only look for exact duplicates, skipping the comparison of outlines.")
+def find_duplicates(input_path, recursive, exact_only):
+    """Finds duplicate and near-duplicate fonts.
+
+    Exact duplicates have the same flavor and the same tables, except for the head.modified timestamp. They are found
+    comparing the lengths and checksums in the table directories, and confirmed hashing the table data.
+
+    Near-duplicates have the same outlines mapped to the same characters, but differ in other tables (for example, the
+    same font with different names, different hinting or a different flavor). Glyph outlines are hashed only for fonts
+    with the same number of glyphs.
+
+    Files are processed in parallel with the global -j/--jobs option. Nothing is changed: use `font-organizer -d` to
+    skip or hard link the duplicates.
+    """
+    files = sorted(getFontsList(input_path, recursive=recursive))
+    if len(files) == 0:
+        return
+    index = DuplicateIndex(files, nearDuplicates=not exact_only)
+    click.secho(f'\n{len(files)} fonts found.')
+    _printDuplicates(index)
+
+
+def _printDuplicates(index):
+    for file, error in index.errors.items():
+        click.secho(f'{file}: {error}', fg='red')
+
+    if index.exactGroups:
+        click.secho('\nExact duplicates:', fg='cyan')
+        for group in index.exactGroups:
+            click.secho(f'\n  {group[0]}')
+            for file in group[1:]:
+                click.secho(f'  = {file}', fg='yellow')
+
+    if index.nearGroups:
+        click.secho('\nNear-duplicates (same outlines):', fg='cyan')
+        for group in index.nearGroups:
+            click.secho(f'\n  {group[0]}')
+            for file in group[1:]:
+                click.secho(f'  ~ {file}', fg='yellow')
+
+    duplicates = index.getDuplicates()
+    click.secho(f'\n{len(duplicates)} exact duplicates ({index.getWastedSize():,} bytes) in {len(index.exactGroups)} '
+                f'groups, {len(index.nearGroups)} groups of near-duplicates.',
+                fg='green' if not duplicates and not index.nearGroups else 'yellow')
+
 
 # add-features
 @click.group()
@@ -170,17 +283,15 @@ def add_features(input_path, feature_file, tables, recalc_timestamp, output_dir,
     if tables == ():
         tables = None
     files = getFontsList(input_path)
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-            addOpenTypeFeatures(font, featurefile=feature_file, tables=tables)
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_add_features, files, output_files, feature_file=feature_file, tables=tables,
+             recalc_timestamp=recalc_timestamp)
 
-            output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
 
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+def _add_features(file, output_file, feature_file, tables, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp)
+    addOpenTypeFeatures(font, featurefile=feature_file, tables=tables)
+    return saveFont(font, output_file)
 
 
 # add-dsig
@@ -210,25 +321,17 @@ def add_dsig(input_path, recalc_timestamp, output_dir, overwrite):
     """
 
     files = getFontsList(input_path)
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_add_dsig, files, output_files, recalc_timestamp=recalc_timestamp)
 
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-            if 'DSIG' not in font:
-                font.addDummyDSIG()
-                if output_dir is None:
-                    output_dir = os.path.dirname(f)
-                else:
-                    if not os.path.exists(output_dir):
-                        os.mkdir(output_dir)
-
-                output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-                font.save(output_file)
-                click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-            else:
-                click.secho(f'No changes made, DSIG table is already present in {os.path.basename(f)}', fg='yellow')
-        except Exception as e:
-            click.secho('ERROR: {}'.format(e), fg='red')
+
+def _add_dsig(file, output_file, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+    if 'DSIG' not in font:
+        font.addDummyDSIG()
+        return saveFont(font, output_file)
+    else:
+        return [(f'No changes made, DSIG table is already present in {os.path.basename(file)}', 'yellow')]
 
 
 # dehinter
@@ -277,21 +380,20 @@ def dehinter(input_path, keep_cvar, keep_cvt, keep_fpgm, keep_hdmx, keep_ltsh, k
     """
 
     files = getFontsList(input_path)
-    for f in files:
-        try:
-            font = TTFont(f, recalcTimestamp=recalc_timestamp)
-            if not font.sfntVersion == 'OTTO':
-                dehint(font, keep_cvar=keep_cvar, keep_cvt=keep_cvt, keep_fpgm=keep_fpgm, keep_gasp=keep_gasp,
-                       keep_glyf=keep_glyf, keep_head=keep_head, keep_hdmx=keep_hdmx, keep_ltsh=keep_ltsh,
-                       keep_maxp=keep_maxp, keep_prep=keep_prep, keep_ttfa=keep_ttfa, keep_vdmx=keep_vdmx,
-                       verbose=verbose)
-                output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-                font.save(output_file)
-                click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-            else:
-                click.secho(f'ERROR: {os.path.basename(f)} is not a TrueType file', fg='red')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_dehinter, files, output_files, keep_cvar=keep_cvar, keep_cvt=keep_cvt, keep_fpgm=keep_fpgm,
+             keep_gasp=keep_gasp, keep_glyf=keep_glyf, keep_head=keep_head, keep_hdmx=keep_hdmx, keep_ltsh=keep_ltsh,
+             keep_maxp=keep_maxp, keep_prep=keep_prep, keep_ttfa=keep_ttfa, keep_vdmx=keep_vdmx, verbose=verbose,
+             recalc_timestamp=recalc_timestamp)
+
+
+def _dehinter(file, output_file, recalc_timestamp, **kwargs):
+    font = Font(file, recalcTimestamp=recalc_timestamp)
+    if not font.sfntVersion == 'OTTO':
+        dehint(font, **kwargs)
+        return saveFont(font, output_file)
+    else:
+        return [(f'ERROR: {os.path.basename(file)} is not a TrueType file', 'red')]
 
 
 @click.group()
@@ -327,18 +429,17 @@ def remove_overlaps(input_path, output_dir=None, recalc_timestamp=False, overwri
     """
 
     files = getFontsList(input_path)
-    for f in files:
-        try:
-            font = TTFont(f, recalcTimestamp=recalc_timestamp)
-            if not font.sfntVersion == 'OTTO':
-                removeOverlaps(font)
-                output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-                font.save(output_file)
-                click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-            else:
-                click.secho(f'{os.path.basename(f)} is not a TrueType file', fg='red')
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_remove_overlaps, files, output_files, recalc_timestamp=recalc_timestamp)
+
+
+def _remove_overlaps(file, output_file, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp)
+    if not font.sfntVersion == 'OTTO':
+        removeOverlaps(font)
+        return saveFont(font, output_file)
+    else:
+        return [(f'{os.path.basename(file)} is not a TrueType file', 'red')]
 
 
 @click.group()
@@ -365,24 +466,43 @@ For example:
 
 If the font is CFF flavored, the cff_1 or cff_2 options can be used.
 """)
-def font_renamer(input_path, source_string):
+@click.option('--dry-run', is_flag=True, help="Show the planned renames, without renaming any file.")
+@click.option('--rollback', is_flag=True,
+              help="""
+Undo the last renames made in INPUT_PATH (or in the folder of INPUT_PATH), using the journal saved by this command or by
+font-organizer, and exit. Also restores the files of a batch that was interrupted.
+""")
+def font_renamer(input_path, source_string, dry_run=False, rollback=False):
     """
 Renames font files according to the provided source string.
+
+If a file with the new name already exists, a suffix with a number (#1, #2, etc.) is added at the end of the file name.
+All new names are planned before renaming any file, and files are renamed as a batch: if a rename fails, the files
+already renamed are restored.
     """
 
+    journal_file = _getJournalFile(input_path)
+    if rollback:
+        _rollbackRenames(journal_file)
+        return
+
     files = getFontsList(input_path)
 
-    for f in files:
+    # Names are read from the metadata cache, without opening the fonts again.
+    with MetadataCache() as cache:
+        fonts = [cache.get(f) for f in files]
+    strings = getSourceStrings(files, source_string, fonts=fonts)
+
+    plan = RenamePlan()
+    for f, font, string in zip(files, fonts, strings):
         d = os.path.dirname(f)
         n = os.path.basename(f)
 
-        font = TTFont(f)
-        isCFF = 'CFF ' in font
+        isCFF = 'CFF ' in font.keys()
         if not isCFF and source_string in ('cff_1', 'cff_2'):
             click.secho(f'Invalid option: {source_string}. {n} does not seem to be a CFF font', fg='yellow')
             continue
 
-        string = getSourceString(f, source_string)
         if not string:
             string = os.path.splitext(n)[0]
 
@@ -401,22 +521,94 @@ Renames font files according to the provided source string.
                 new_ext = '.ttf'
 
         new_file_name = string + new_ext
-        new_file = makeOutputFileName(os.path.join(d, new_file_name), overWrite=True)
+        if plan.add(f, os.path.join(d, new_file_name)) == f:
+            click.secho(f'{f} --> skipped', fg='yellow')
 
-        if new_file != f:
-            try:
-                os.rename(f, new_file)
-                click.secho("{} --> {}".format(n, new_file_name), fg='green')
+    if _applyRenamePlan(plan, journal_file, dry_run):
+        for f, new_file in plan:
+            click.secho(f'{os.path.basename(f)} --> {os.path.basename(new_file)}', fg='green')
 
-            except FileExistsError:
-                new_file = makeOutputFileName(new_file, overWrite=False)
-                os.rename(f, new_file)
-                click.secho(f'{n} --> {os.path.basename(new_file)}', fg='green')
 
-            except Exception as e:
-                click.secho(f'ERROR: {e}', fg='red')
-        else:
-            click.secho(f'{f} --> skipped', fg='yellow')
+def _getJournalFile(input_path):
+    directory = input_path if os.path.isdir(input_path) else os.path.dirname(input_path)
+    return os.path.join(directory, JOURNAL_FILE_NAME)
+
+
+def _applyRenamePlan(plan, journal_file, dry_run):
+    # Returns True if the files have been renamed.
+    if dry_run:
+        for f, new_file in plan:
+            click.secho(f'\n{f} --> {new_file}', fg='cyan')
+        click.secho(f'\nDry run: {len(plan)} files would be renamed, nothing has been changed.', fg='yellow')
+        return False
+    try:
+        plan.apply(journal_file)
+    except Exception as e:
+        click.secho(f'\nERROR: {e}. No files have been renamed.', fg='red')
+        return False
+    return True
+
+
+def _rollbackRenames(journal_file):
+    if not os.path.exists(journal_file):
+        click.secho(f'\nNo renames to roll back in {os.path.dirname(journal_file)}', fg='yellow')
+        return
+    restored = rollbackRenames(journal_file)
+    click.secho(f'\n{restored} files restored to their original names.', fg='green')
+
+
+@click.group()
+def ttcBuilder():
+    pass
+
+
+@ttcBuilder.command()
+@click.argument('input_path', type=click.Path(exists=True, resolve_path=True, file_okay=False))
+@click.option('-o', '--output-file', type=click.Path(dir_okay=False, resolve_path=True),
+              help="""
+The collection file to create. If not specified, the collection is saved next to INPUT_PATH, with the same name and the
+.ttc extension (.otc if all fonts are CFF flavored).
+""")
+@click.option('--no-overwrite', 'overwrite', is_flag=True, default=True,
+              help="""
+By default, an existing output file is overwritten. Use this switch to save the collection to a new file (numbers are
+appended at the end of file name).
+""")
+def ttc_builder(input_path, output_file=None, overwrite=True):
+    """Builds a .ttc collection from the otf/ttf fonts in INPUT_PATH.
+
+    Tables that are identical in more fonts are stored once in the collection. Table data is copied as it is, without
+    decompiling it. WOFF and WOFF2 fonts are skipped.
+    """
+    descriptors = []
+    for descriptor in sorted(getFontDescriptors(input_path), key=lambda d: d.path):
+        if descriptor.flavor is not None:
+            click.secho(f'{os.path.basename(descriptor.path)} --> skipped ({descriptor.flavor} fonts can\'t be added '
+                        f'to a collection)', fg='yellow')
+            continue
+        descriptors.append(descriptor)
+    if len(descriptors) < 2:
+        click.secho('ERROR: at least two fonts are needed to build a collection', fg='red')
+        return
+
+    if output_file is None:
+        ext = '.otc' if all(d.isCFF for d in descriptors) else '.ttc'
+        output_file = input_path + ext
+    output_file = makeOutputFileName(output_file, overWrite=overwrite)
+
+    try:
+        shared = writeCollection(output_file, descriptors)
+    except Exception as e:
+        click.secho(f'ERROR: {e}', fg='red')
+        return
+
+    fonts_size = sum(d.size for d in descriptors)
+    size = os.path.getsize(output_file)
+    saved = fonts_size - size
+    click.secho(f'{os.path.basename(output_file)} --> saved ({len(descriptors)} fonts, {shared} shared tables)',
+                fg='green')
+    click.secho(f'Fonts size: {fonts_size:,} bytes, collection size: {size:,} bytes, space saved: {saved:,} bytes '
+                f'({saved / fonts_size:.1%})')
 
 
 @click.group()
@@ -440,23 +632,85 @@ to current time.
 By default, modified files are overwritten. Use this switch to save them to a new file (numbers are appended at the end
 of file name).
 """)
-def ttc_extractor(input_path, output_dir=None, recalc_timestamp=False, overwrite=True):
+@click.option('-n', '--font-number', 'fontNumbers', type=click.IntRange(min=0), multiple=True,
+              help="""
+Index of the font to extract (the first font is 0). This option can be repeated multiple times (for example: -n 0 -n 2).
+""")
+@click.option('-ps', '--postscript-name', 'postscriptNames', multiple=True,
+              help="""
+PostScript name of the font to extract. This option can be repeated multiple times.
+""")
+def ttc_extractor(input_path, fontNumbers, postscriptNames, output_dir=None, recalc_timestamp=False, overwrite=True):
     """Extracts .ttc fonts to otf/ttf fonts.
+
+    The tables of each font are copied from the collection as they are, without decompiling them, so even large
+    collections with shared tables are extracted quickly and with little memory. Fonts are extracted in parallel with
+    the global -j/--jobs option.
+
+    By default, all fonts are extracted. Use the `-n / --font-number` and `-ps / --postscript-name` options to extract
+    only some of them. Output files are named after the PostScript name of the fonts.
     """
-    try:
-        TTCfont = TTCollection(input_path)
-        fonts = TTCfont.fonts
-        for font in fonts:
-            font.recalcTimestamp = recalc_timestamp
-            filename = str(font['name'].getName(6, 3, 1, 0x409))
-            ext = '.otf' if font.sfntVersion == 'OTTO' else '.ttf'
-            if not output_dir:
-                output_dir = os.path.dirname(input_path)
-            output_file = makeOutputFileName(filename + ext, outputDir=output_dir, overWrite=overwrite)
-            font.save(output_file)
-            click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-    except Exception as e:
-        click.secho('ERROR: {}'.format(e), fg='red')
+    descriptors = readCollectionDescriptors(input_path)
+    if not descriptors:
+        click.secho(f'ERROR: {os.path.basename(input_path)} is not a valid font collection', fg='red')
+        return
+
+    names = {}
+    postscript_names = []
+    for descriptor in descriptors:
+        # Members often share the same 'name' table.
+        entry = descriptor.tables.get('name')
+        key = (entry.offset, entry.length) if entry is not None else None
+        if key not in names:
+            names[key] = _getPostscriptName(descriptor)
+        postscript_names.append(names[key])
+
+    numbers = set(fontNumbers)
+    for n in numbers:
+        if n >= len(descriptors):
+            raise click.BadParameter(
+                f"{os.path.basename(input_path)} contains {len(descriptors)} fonts, specify a font number between 0 "
+                f"and {len(descriptors) - 1}.", param_hint="'-n' / '--font-number'")
+    for name in postscriptNames:
+        if name not in postscript_names:
+            raise click.BadParameter(f"no font named '{name}' in {os.path.basename(input_path)}.",
+                                     param_hint="'-ps' / '--postscript-name'")
+        numbers.update(i for i, n in enumerate(postscript_names) if n == name)
+    if not numbers:
+        numbers = range(len(descriptors))
+    numbers = sorted(numbers)
+
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    files = []
+    for i in numbers:
+        file_name = postscript_names[i] or f'{base_name}-{i}'
+        ext = '.otf' if descriptors[i].isCFF else '.ttf'
+        files.append(os.path.join(os.path.dirname(input_path), replaceIllegalCharacters(file_name) + ext))
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+
+    runBatch(_ttc_extractor, [input_path] * len(numbers), output_files,
+             taskKwargs=[{'font_number': i} for i in numbers],
+             labels=[os.path.basename(f) for f in output_files], recalc_timestamp=recalc_timestamp)
+
+
+def _ttc_extractor(file, output_file, font_number, recalc_timestamp):
+    descriptor = readFontDescriptor(file, fontNumber=font_number)
+    tables = {}
+    if recalc_timestamp and 'head' in descriptor:
+        head = descriptor.readTable('head')
+        tables['head'] = head[:HEAD_MODIFIED_OFFSET] + struct.pack('>q', timestampNow()) + \
+            head[HEAD_MODIFIED_OFFSET + 8:]
+    streamSFNT(output_file, descriptor, tables=tables)
+    return [(f'{os.path.basename(output_file)} --> saved', 'green')]
+
+
+def _getPostscriptName(descriptor):
+    if 'name' not in descriptor:
+        return None
+    table = getTableClass('name')('name')
+    table.decompile(descriptor.readTable('name'), None)
+    name = table.getName(6, 3, 1, 0x409) or table.getName(6, 1, 0, 0)
+    return name.toUnicode() if name is not None else None
 
 
 @click.group()
@@ -480,20 +734,19 @@ def del_table(input_path, table, output_dir, recalc_timestamp, overwrite):
     """Deletes the specified table from the font.
     """
     files = getFontsList(input_path)
-    for f in files:
-        try:
-            font = Font(f, recalcTimestamp=recalc_timestamp)
-            if table in font:
-                del font[table]
-                output_file = makeOutputFileName(f, outputDir=output_dir, overWrite=overwrite)
-                font.save(output_file)
-                click.secho(f'{os.path.basename(output_file)} --> {table} table deleted.', fg='green')
-            else:
-                click.secho(f'{os.path.basename(f)} --> {table} table not found.', fg='yellow')
-        except Exception as e:
-            click.secho(f'{os.path.basename(f)} --> ERROR: {e}', fg='red')
+    output_files = makeOutputFileNames(files, outputDir=output_dir, overWrite=overwrite)
+    runBatch(_del_table, files, output_files, table=table, recalc_timestamp=recalc_timestamp)
+
+
+def _del_table(file, output_file, table, recalc_timestamp):
+    font = Font(file, recalcTimestamp=recalc_timestamp, surgical=True)
+    if table in font:
+        del font[table]
+        return saveFont(font, output_file, message=f'{table} table deleted.')
+    else:
+        return [(f'{os.path.basename(file)} --> {table} table not found.', 'yellow')]
 
 
-cli = click.CommandCollection(sources=[addDsig, addFeatures, delTable, fontOrganizer, removeHinting, fontRenamer,
-                                       recalcItalicBits, rmvOverlaps, ttcExtractor],
+cli = click.CommandCollection(sources=[addDsig, addFeatures, delTable, findDuplicates, fontOrganizer, removeHinting,
+                                       fontRenamer, recalcItalicBits, rmvOverlaps, ttcBuilder, ttcExtractor],
                               help="Miscellaneous utilities.")
@@ -1,10 +1,12 @@
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import click
 from fontTools.ttLib.tables._f_v_a_r import NamedInstance
-from fontTools.varLib.instancer import instantiateVariableFont, OverlapMode
+from fontTools.varLib.instancer import OverlapMode
 
-from ftcli.Lib.utils import add_file_argument, add_common_options
+from ftcli.Lib.batch import getJobs
+from ftcli.Lib.utils import add_file_argument, add_common_options, OutputPathAllocator
 from ftcli.Lib.VFont import VariableFont
 
 
@@ -33,7 +35,6 @@ def cli(input_file, selectInstance=False, cleanup=True, updateFontNames=False, o
 
     try:
         variable_font = VariableFont(input_file, recalcTimestamp=recalcTimestamp)
-        name_ids_to_delete = variable_font.getNameIDsToDelete()
 
         instances = []
         if selectInstance is True:
@@ -64,22 +65,77 @@ def cli(input_file, selectInstance=False, cleanup=True, updateFontNames=False, o
                 instances.append(i)
 
         if len(instances) > 0:
-            instance_count = 0
-
-            for i in instances:
-                instance_count += 1
-                print(f"\nExporting instance {instance_count} of {len(instances)}...")
-                static_instance = instantiateVariableFont(varfont=variable_font, axisLimits=i.coordinates,
-                                                          updateFontNames=updateFontNames, optimize=True,
-                                                          overlap=OverlapMode.REMOVE_AND_IGNORE_ERRORS)
-                if cleanup is True:
-                    static_instance.cleanupInstance(name_ids_to_delete)
-                    del static_instance['STAT']
-                output_file = variable_font.makeInstanceOutputFileName(i, outputDir, overWrite)
-                static_instance.save(output_file)
-                click.secho(f'{output_file} saved', fg='green')
+            # Output file names are calculated in advance, so that instances exported in parallel don't get the same
+            # name when overwriting is not allowed.
+            allocator = OutputPathAllocator(outputDir=outputDir, overWrite=overWrite)
+            output_files = [variable_font.makeInstanceOutputFileName(i, allocator) for i in instances]
+
+            jobs = min(getJobs(), len(instances))
+            if jobs > 1:
+                exportInstancesParallel(input_file, instances, output_files, jobs, recalcTimestamp=recalcTimestamp,
+                                        cleanup=cleanup, updateFontNames=updateFontNames)
+            else:
+                instance_count = 0
+                for i, output_file in zip(instances, output_files):
+                    instance_count += 1
+                    print(f"\nExporting instance {instance_count} of {len(instances)}...")
+                    exportInstance(variable_font, i.coordinates, output_file, cleanup=cleanup,
+                                   updateFontNames=updateFontNames)
+                    click.secho(f'{output_file} saved', fg='green')
         else:
             print("\nNo instances found.")
 
     except Exception as e:
         click.secho(f'ERROR: {e}', fg='red')
+
+
+def exportInstance(variableFont: VariableFont, coordinates: dict, outputFile: str, cleanup=True, updateFontNames=False):
+    # The instancing plan is computed on the first call and reused for the following instances.
+    plan = variableFont.getInstancingPlan()
+    static_instance = variableFont.makeInstance(coordinates, updateFontNames=updateFontNames,
+                                                overlap=OverlapMode.REMOVE_AND_IGNORE_ERRORS)
+    if cleanup is True:
+        static_instance.cleanupInstance(plan.nameIDsToDelete, plan.featureNameIDs)
+        del static_instance['STAT']
+    static_instance.save(outputFile)
+
+
+def exportInstancesParallel(inputFile: str, instances: list, outputFiles: list, jobs: int, recalcTimestamp=False,
+                            **kwargs):
+    """
+    Exports the instances in a pool of processes.
+
+    Each worker opens the variable font and computes its instancing plan once, when it starts, and reuses them for all
+    the instances it exports; only the coordinates and the output file name of each instance are sent to the workers.
+    Instances are saved by the workers, and progress is reported as soon as each one is done.
+    """
+    errors = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_initWorker,
+                             initargs=(inputFile, recalcTimestamp, kwargs)) as executor:
+        futures = {executor.submit(_exportInstance, i.coordinates, output_file): output_file
+                   for i, output_file in zip(instances, outputFiles)}
+        for count, future in enumerate(as_completed(futures), start=1):
+            output_file = futures[future]
+            try:
+                future.result()
+                click.secho(f'[{count}/{len(instances)}] {output_file} saved', fg='green')
+            except Exception as e:
+                errors += 1
+                click.secho(f'[{count}/{len(instances)}] {output_file} --> ERROR: {e}', fg='red')
+
+    if errors > 0:
+        click.secho(f'\n{errors} of {len(instances)} instances could not be exported.', fg='red')
+
+
+# The variable font and the export options of each worker process.
+_worker = {}
+
+
+def _initWorker(inputFile, recalcTimestamp, options):
+    _worker['font'] = VariableFont(inputFile, recalcTimestamp=recalcTimestamp)
+    _worker['font'].getInstancingPlan()
+    _worker['options'] = options
+
+
+def _exportInstance(coordinates, outputFile):
+    exportInstance(_worker['font'], coordinates, outputFile, **_worker['options'])
@@ -1,10 +1,29 @@
+import contextlib
 import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 
+import brotli
 import click
-from fontTools.ttLib import TTFont
+from fontTools.misc.timeTools import timestampNow
+from fontTools.ttLib import TTFont, sfnt, woff2
+from fontTools.ttLib.sfnt import SFNTReader, SFNTWriter
 
-from ftcli.Lib.Font import Font
-from ftcli.Lib.utils import (getFontsList, guessFamilyName, makeOutputFileName)
+from ftcli.Lib.batch import makeOutputFileNames, runBatch
+from ftcli.Lib.metadataCache import MetadataCache
+from ftcli.Lib.utils import getFontDescriptors, getFontsList, OutputPathAllocator
+
+# Formats listed in the 'src' descriptor of @font-face rules, in order of preference.
+CSS_FORMATS = ('woff2', 'woff', 'opentype', 'truetype')
+
+# Compression settings of the compress --speed presets. WOFF tables are compressed with zopfli when
+# 'zopfli_iterations' is set, otherwise with zlib at 'zlib_level'. 'balanced' matches the fontTools defaults.
+SPEED_PRESETS = {
+    'fast': {'brotli_quality': 4, 'brotli_window': 22, 'zlib_level': 1, 'zopfli_iterations': None},
+    'balanced': {'brotli_quality': 11, 'brotli_window': 22, 'zlib_level': 6, 'zopfli_iterations': None},
+    'max': {'brotli_quality': 11, 'brotli_window': 24, 'zlib_level': 9, 'zopfli_iterations': 15},
+}
 
 
 @click.group()
@@ -14,86 +33,79 @@ def makeCSS():
 
 @makeCSS.command()
 @click.argument('input_path', type=click.Path(exists=True, resolve_path=True))
-def makecss(input_path):
+@click.option('-u', '--unicode-range', is_flag=True, default=False,
+              help="Add the unicode-range descriptor to each @font-face rule, reading the encoded characters from the "
+                   "'cmap' table. Useful when the fonts are subsets.")
+def makecss(input_path, unicode_range):
     """
-Parses all WOFF and WOFF2 files in INPUT_PATH and creates a CSS stylesheet to use them on web pages.
+Parses all font files in INPUT_PATH and creates a CSS stylesheet to use them on web pages.
+
+Fonts are grouped by family name, weight and style. WOFF2 and WOFF sources are listed first, followed by TTF/OTF files,
+if present.
     """
 
     files = getFontsList(input_path)
 
     css_file = os.path.join(input_path, 'fonts.css') if os.path.isdir(input_path) \
         else os.path.join(os.path.dirname(input_path), 'fonts.css')
-    with open(css_file, 'w') as stylesheet:
-        pass
-
-    unique_triplets = []
-    for f in files:
-
-        font = Font(f)
-        this_font_triplet = (
-            guessFamilyName(font),
-            font['OS/2'].usWeightClass,
-            'italic' if font.isItalic() else 'normal'
-        )
-        if this_font_triplet not in unique_triplets:
-            unique_triplets.append(this_font_triplet)
-
-    unique_triplets.sort()
-
-    font_faces = []
-    for t in unique_triplets:
-
-        font_face_data = {
-            'font-family': t[0],
-            'font-weight': t[1],
-            'font-style': t[2],
-            'woff_src': None,
-            'woff2_src': None
-        }
 
+    # Group the files by (family name, weight, style) in a single pass.
+    font_faces = {}
+    with MetadataCache() as cache:
         for f in files:
-
-            font = Font(f)
+            font = cache.get(f)
             this_font_triplet = (
-                guessFamilyName(font),
-                font['OS/2'].usWeightClass,
+                font.familyName,
+                font.usWeightClass,
                 'italic' if font.isItalic() else 'normal'
             )
-            if this_font_triplet == t:
-                if font.flavor == 'woff':
-                    font_face_data['woff_src'] = os.path.basename(f)
-                if font.flavor == "woff2":
-                    font_face_data['woff2_src'] = os.path.basename(f)
+            font_face_data = font_faces.setdefault(this_font_triplet, {'files': []})
+            font_face_data['files'].append(f)
+            if font.flavor is not None:
+                font_face_data[font.flavor] = os.path.basename(f)
+            else:
+                font_face_data['opentype' if font.sfntVersion == 'OTTO' else 'truetype'] = os.path.basename(f)
 
-        font_faces.append(font_face_data)
+    css_strings = []
+    for t in sorted(font_faces):
+        ff = font_faces[t]
+        sources = [f"url('{ff[flavor]}') format('{flavor}')" for flavor in CSS_FORMATS if flavor in ff]
 
-    for ff in font_faces:
         css_string = "@font-face {\n"
-        css_string += "  font-family: '{}';\n".format(ff['font-family'])
+        css_string += "  font-family: '{}';\n".format(t[0])
         css_string += "  src: "
+        css_string += ',\n       '.join(sources) + ';\n'
+        css_string += '  font-weight: {};\n'.format(t[1])
+        css_string += '  font-style: {};'.format(t[2])
+        if unicode_range:
+            # All the files of a font face should contain the same characters, reading one of them is enough.
+            css_string += '\n  unicode-range: {};'.format(getUnicodeRange(ff['files'][0]))
+        css_string += '\n}\n'
+        css_strings.append(css_string)
 
-        woff2_string = ""
-        if ff['woff2_src'] is not None:
-            woff2_string = "url('{}') format('woff2')".format(ff['woff2_src'])
-            if ff['woff_src'] is not None:
-                woff2_string += ',\n       '
-            else:
-                woff2_string += ';\n'
-        css_string += woff2_string
+    with open(css_file, 'w') as css:
+        css.write(''.join(css_strings))
 
-        woff_string = ""
-        if ff['woff_src'] is not None:
-            woff_string = "url('{}') format('woff');\n".format(ff['woff_src'])
-        css_string += woff_string
+    click.secho(f'{css_file} created.', fg='green')
 
-        css_string += '  font-weight: {};\n'.format(ff['font-weight'])
-        css_string += '  font-style: {};'.format(ff['font-style'])
-        css_string += '\n}\n'
 
-        with open(css_file, 'a') as css:
-            css.write(css_string)
+def getUnicodeRange(file) -> str:
+    """
+    Returns the value of the CSS unicode-range descriptor for the characters mapped in the font 'cmap' table, merging
+    consecutive code points in ranges (U+0020-007E, U+00A0-00FF, ...).
+    """
+    font = TTFont(file, lazy=True)
+    codepoints = sorted(font['cmap'].getBestCmap() or {})
+    font.close()
 
-    click.secho(f'{css_file} created.', fg='green')
+    ranges = []
+    for codepoint in codepoints:
+        if ranges and codepoint == ranges[-1][1] + 1:
+            ranges[-1][1] = codepoint
+        else:
+            ranges.append([codepoint, codepoint])
+
+    return ', '.join(f'U+{start:04X}' if start == end else f'U+{start:04X}-{end:04X}' for start, end in ranges)
 
 
 @click.group()
@@ -122,15 +134,31 @@ to current time.
 By default, modified files are overwritten. Use this switch to save them to a new file (numbers are appended at the end
 of file name).
 """)
-def compress(input_path, flavor, delete_source_file=False, output_dir=None, recalc_timestamp=False, overwrite=True):
+@click.option('--speed', type=click.Choice(choices=list(SPEED_PRESETS)), default='balanced', show_default=True,
+              help="""
+Compression preset. 'fast' uses lower brotli and zlib levels and produces bigger files in less time; 'max' uses a larger
+brotli window and zopfli for WOFF files, and produces smaller files in much more time. 'balanced' uses the default
+fontTools settings.
+""")
+def compress(input_path, flavor, delete_source_file=False, output_dir=None, recalc_timestamp=False, overwrite=True,
+             speed='balanced'):
     """
 Converts OpenType fonts to WOFF/WOFF2 format.
 
 Use the -f/--flavor option to specify flavor of output font files. May be 'woff' or 'woff2'. If no flavor is
 specified, both WOFF and WOFF2 files will be created.
+
+Each font is compiled once, then the WOFF and WOFF2 files are encoded concurrently. Use the global -j/--jobs option to
+process more fonts in parallel.
     """
 
-    files = getFontsList(input_path)
+    # Only sfnt fonts are compressed, names are allocated for them only.
+    files = []
+    for d in getFontDescriptors(input_path):
+        if d.flavor is None:
+            files.append(d.path)
+        else:
+            click.secho(f'{os.path.basename(d.path)} --> skipped, already a {d.flavor.upper()} file', fg='yellow')
 
     flavors = ['woff', 'woff2']
     if flavor == 'woff':
@@ -138,20 +166,110 @@ specified, both WOFF and WOFF2 files will be created.
     if flavor == 'woff2':
         flavors.remove('woff')
 
-    for f in files:
-        try:
-            font = TTFont(f, recalcTimestamp=recalc_timestamp)
-            if font.flavor is None:
-                for flv in flavors:
-                    output_file = makeOutputFileName(
-                        f, outputDir=output_dir, extension='.' + flv, overWrite=overwrite)
-                    font.flavor = flv
-                    font.save(output_file, reorderTables=False)
-                    click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-                if delete_source_file:
-                    os.remove(f)
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+    output_files = [{} for _ in files]
+    allocator = OutputPathAllocator(outputDir=output_dir, overWrite=overwrite)
+    for flv in flavors:
+        for output_file, flavor_output_file in zip(output_files, makeOutputFileNames(
+                files, extension='.' + flv, allocator=allocator)):
+            output_file[flv] = flavor_output_file
+
+    runBatch(_compress, files, output_files, delete_source_file=delete_source_file, recalc_timestamp=recalc_timestamp,
+             speed=speed)
+
+
+def _compress(file, output_file, delete_source_file, recalc_timestamp, speed='balanced'):
+    messages = []
+    with open(file, 'rb') as f:
+        data = f.read()
+
+    # The sfnt data is compiled once (only when head.modified must be updated) and shared by the encoders.
+    if recalc_timestamp:
+        font = TTFont(BytesIO(data), recalcTimestamp=True)
+        buffer = BytesIO()
+        font.save(buffer, reorderTables=False)
+        data = buffer.getvalue()
+
+    messages.extend(writeWebfonts(data, output_file, speed=speed))
+
+    if delete_source_file:
+        os.remove(file)
+    return messages
+
+
+def writeWebfonts(data: bytes, outputFiles: dict, speed='balanced') -> list:
+    """
+    Encodes an OpenType font to one or more webfont flavors concurrently.
+
+    :param data: The OpenType font data.
+    :param outputFiles: A dictionary of flavors ('woff', 'woff2') and output file paths.
+    :param speed: One of the SPEED_PRESETS.
+    :return: A list of (message, color) tuples.
+    """
+    messages = []
+    with compressionPreset(speed), ThreadPoolExecutor(max_workers=len(outputFiles)) as executor:
+        futures = [executor.submit(encodeWebfont, data, flavor_output_file, flv)
+                   for flv, flavor_output_file in outputFiles.items()]
+        for future, flavor_output_file in zip(futures, outputFiles.values()):
+            future.result()
+            messages.append((f'{os.path.basename(flavor_output_file)} --> saved', 'green'))
+    return messages
+
+
+def encodeWebfont(data: bytes, outputFile: str, flavor: str):
+    """
+    Writes the tables of an OpenType font to a WOFF or WOFF2 file as they are, without decompiling them.
+
+    :param data: The OpenType font data.
+    :param outputFile: The path of the output file.
+    :param flavor: 'woff' or 'woff2'.
+    """
+    reader = SFNTReader(BytesIO(data))
+    buffer = BytesIO()
+    writer = SFNTWriter(buffer, len(reader.tables), reader.sfntVersion, flavor=flavor)
+    for tag in reader.keys():
+        writer[tag] = reader[tag]
+    writer.close()
+    with open(outputFile, 'wb') as f:
+        f.write(buffer.getvalue())
+
+
+@contextlib.contextmanager
+def compressionPreset(speed: str):
+    """
+    Applies the settings of a --speed preset to the fontTools WOFF and WOFF2 writers, for the duration of the block.
+
+    fontTools doesn't allow passing compression settings to the writers, so the module level settings are replaced and
+    restored on exit. Workers of the process pool run one font at a time, so this doesn't affect other files.
+    """
+    preset = SPEED_PRESETS[speed]
+    saved = (sfnt.ZLIB_COMPRESSION_LEVEL, sfnt.USE_ZOPFLI, sfnt.ZOPFLI_LEVELS, woff2.brotli)
+
+    sfnt.ZLIB_COMPRESSION_LEVEL = preset['zlib_level']
+    if preset['zopfli_iterations'] is not None:
+        sfnt.USE_ZOPFLI = True
+        sfnt.ZOPFLI_LEVELS = dict(saved[2])
+        sfnt.ZOPFLI_LEVELS[preset['zlib_level']] = preset['zopfli_iterations']
+    woff2.brotli = _BrotliPreset(preset['brotli_quality'], preset['brotli_window'])
+    try:
+        yield
+    finally:
+        sfnt.ZLIB_COMPRESSION_LEVEL, sfnt.USE_ZOPFLI, sfnt.ZOPFLI_LEVELS, woff2.brotli = saved
+
+
+class _BrotliPreset(object):
+    # Stands in for the brotli module in fontTools.ttLib.woff2, adding the quality and window size of a preset.
+
+    def __init__(self, quality, lgwin):
+        self.quality = quality
+        self.lgwin = lgwin
+
+    def compress(self, data, **kwargs):
+        kwargs.setdefault('quality', self.quality)
+        kwargs.setdefault('lgwin', self.lgwin)
+        return brotli.compress(data, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(brotli, name)
 
 
 # decompress
@@ -185,23 +303,66 @@ def decompress(input_path, delete_source_file=False, output_dir=None, recalc_tim
 Converts WOFF/WOFF2 files to OpenType format.
 
 Output will be a ttf or otf file, depending on the webfont flavor (TTF or CFF).
+
+Tables are copied to the output file as they are, without decompiling them. Only WOFF2 files with transformed glyf/loca
+or hmtx tables are fully loaded to rebuild the tables.
     """
 
-    files = getFontsList(input_path)
+    # The output extension depends on the outlines format, which can be read from the file header.
+    descriptors = [d for d in getFontDescriptors(input_path) if d.flavor is not None]
+    files = [d.path for d in descriptors]
+    allocator = OutputPathAllocator(outputDir=output_dir, overWrite=overwrite)
+    output_files = [allocator.allocate(d.path, extension='.otf' if d.isCFF else '.ttf') for d in descriptors]
 
-    for f in files:
-        try:
-            font = TTFont(f, recalcTimestamp=recalc_timestamp)
-            if font.flavor is not None:
-                ext = '.otf' if font.sfntVersion == 'OTTO' else '.ttf'
-                output_file = makeOutputFileName(f, outputDir=output_dir, extension=ext, overWrite=overwrite)
-                font.flavor = None
-                font.save(output_file, reorderTables=False)
-                click.secho(f'{os.path.basename(output_file)} --> saved', fg='green')
-                if delete_source_file:
-                    os.remove(f)
-        except Exception as e:
-            click.secho(f'ERROR: {e}', fg='red')
+    runBatch(_decompress, files, output_files, delete_source_file=delete_source_file,
+             recalc_timestamp=recalc_timestamp)
+
+
+def _decompress(file, output_file, delete_source_file, recalc_timestamp):
+    if not decodeWebfont(file, output_file, recalcTimestamp=recalc_timestamp):
+        font = TTFont(file, recalcTimestamp=recalc_timestamp)
+        font.flavor = None
+        font.save(output_file, reorderTables=False)
+    if delete_source_file:
+        os.remove(file)
+    return [(f'{os.path.basename(output_file)} --> saved', 'green')]
+
+
+def decodeWebfont(file: str, outputFile: str, recalcTimestamp=False) -> bool:
+    """
+    Writes the tables of a WOFF or WOFF2 file to an OpenType font as they are, without decompiling them.
+
+    WOFF tables only need to be inflated. WOFF2 files with transformed tables (glyf/loca, hmtx) are not handled,
+    because the tables must be rebuilt from the font objects: in that case nothing is written and False is returned,
+    and the font must be converted by loading it with TTFont.
+
+    :param file: The path of the WOFF or WOFF2 file.
+    :param outputFile: The path of the output file.
+    :param recalcTimestamp: If True, head.modified is set to the current time.
+    :return: True if the output file has been written.
+    """
+    with open(file, 'rb') as f:
+        reader = SFNTReader(BytesIO(f.read()))
+    if reader.flavor is None:
+        return False
+    if reader.flavor == 'woff2' and reader.flavorData.transformedTables:
+        return False
+
+    # Tables are written in the order of the source file, like TTFont.save(reorderTables=False) does.
+    tags = list(reader.keys())
+
+    buffer = BytesIO()
+    writer = SFNTWriter(buffer, len(tags), reader.sfntVersion)
+    for tag in tags:
+        data = reader[tag]
+        if tag == 'head' and recalcTimestamp:
+            # head.modified is a LONGDATETIME at offset 28.
+            data = data[:28] + struct.pack('>q', timestampNow()) + data[36:]
+        writer[tag] = data
+    writer.close()
+    with open(outputFile, 'wb') as f:
+        f.write(buffer.getvalue())
+    return True
 
 
 cli = click.CommandCollection(sources=[fontToWebfont, webfontToFont, makeCSS], help="""
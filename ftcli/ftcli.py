@@ -24,7 +24,13 @@ class ftCLI(click.MultiCommand):
         return mod.cli
 
 
-cli = ftCLI(help='A set of command line tools to manipulate fonts with FontTools.')
+@click.command(cls=ftCLI, help='A set of command line tools to manipulate fonts with FontTools.')
+@click.option('-j', '--jobs', type=click.IntRange(min=0), default=1, show_default=True,
+              help="Number of processes used to process multiple files in parallel. Use 0 to use all available CPUs.")
+@click.option('--no-cache', is_flag=True, default=False,
+              help="Don't use the font metadata cache. Fonts are read from disk every time.")
+def cli(jobs, no_cache):
+    pass
 
 
 def main():
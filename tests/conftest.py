@@ -0,0 +1,47 @@
+import pytest
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.t2CharStringPen import T2CharStringPen
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+GLYPH_ORDER = ['.notdef', 'A']
+
+
+def _drawGlyph(pen):
+    pen.moveTo((0, 0))
+    pen.lineTo((500, 0))
+    pen.lineTo((250, 700))
+    pen.closePath()
+
+
+def _buildFont(path, styleName='Regular', cff=False, flavor=None):
+    fb = FontBuilder(1000, isTTF=not cff)
+    fb.setupGlyphOrder(GLYPH_ORDER)
+    fb.setupCharacterMap({0x41: 'A'})
+    if cff:
+        charStrings = {}
+        for glyphName in GLYPH_ORDER:
+            pen = T2CharStringPen(500, None)
+            _drawGlyph(pen)
+            charStrings[glyphName] = pen.getCharString()
+        fb.setupCFF(f'Test-{styleName}', {'FullName': f'Test {styleName}'}, charStrings, {})
+    else:
+        pen = TTGlyphPen(None)
+        _drawGlyph(pen)
+        glyph = pen.glyph()
+        fb.setupGlyf({glyphName: glyph for glyphName in GLYPH_ORDER})
+    fb.setupHorizontalMetrics({glyphName: (500, 0) for glyphName in GLYPH_ORDER})
+    fb.setupHorizontalHeader(ascent=800, descent=-200)
+    fb.setupNameTable({'familyName': 'Test', 'styleName': styleName, 'psName': f'Test-{styleName}'})
+    fb.setupOS2()
+    fb.setupPost()
+    fb.font.flavor = flavor
+    fb.save(path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def buildFont():
+    """
+    Returns a function that saves a small test font: buildFont(path, styleName='Regular', cff=False, flavor=None).
+    """
+    return _buildFont
@@ -0,0 +1,53 @@
+import struct
+
+import pytest
+from fontTools.ttLib import TTFont
+from fontTools.ttLib.sfnt import calcChecksum
+
+from ftcli.Lib.Font import Font
+from ftcli.Lib.sfnt import SFNT_ENTRY_FORMAT, SFNT_ENTRY_SIZE, SFNT_HEADER_SIZE, readFontDescriptor
+
+
+def _corruptCheckSum(path, tag):
+    # Writes a wrong checksum in the table directory entry of tag.
+    descriptor = readFontDescriptor(path)
+    index = sorted(descriptor.tables).index(tag)
+    entry = descriptor.tables[tag]
+    with open(path, 'r+b') as f:
+        f.seek(SFNT_HEADER_SIZE + index * SFNT_ENTRY_SIZE)
+        f.write(struct.pack(SFNT_ENTRY_FORMAT, tag.encode('latin-1'), (entry.checkSum + 1) & 0xFFFFFFFF, entry.offset,
+                            entry.length))
+
+
+@pytest.mark.parametrize('cff', [False, True])
+def test_surgical_save(tmp_path, buildFont, cff):
+    path = buildFont(str(tmp_path / 'Test-Regular.ttf'), cff=cff)
+    output = str(tmp_path / 'output.ttf')
+
+    font = Font(path, surgical=True)
+    font['name'].setName('Edited', 1, 3, 1, 0x409)
+    assert font.save(output)
+
+    with TTFont(path) as source, TTFont(output) as target:
+        assert target['name'].getDebugName(1) == 'Edited'
+        assert sorted(target.keys()) == sorted(source.keys())
+        for tag in source.reader.keys():
+            if tag not in ('name', 'head'):
+                assert target.reader[tag] == source.reader[tag]
+
+
+def test_surgical_save_fixes_checksums(tmp_path, buildFont):
+    path = buildFont(str(tmp_path / 'Test-Regular.ttf'))
+    _corruptCheckSum(path, 'post')
+    output = str(tmp_path / 'output.ttf')
+
+    font = Font(path, surgical=True)
+    font['name'].setName('Edited', 1, 3, 1, 0x409)
+    font.save(output)
+
+    descriptor = readFontDescriptor(output)
+    tables = descriptor.readTables([tag for tag in descriptor.tags if tag != 'head'])
+    for tag, data in tables.items():
+        assert descriptor.tables[tag].checkSum == calcChecksum(data), tag
+    with TTFont(output, checkChecksums=2) as target:
+        target.ensureDecompiled()
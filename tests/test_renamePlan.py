@@ -0,0 +1,139 @@
+import os
+
+import pytest
+
+from ftcli.Lib import renamePlan
+from ftcli.Lib.renamePlan import RenamePlan, isJournalComplete, rollbackRenames
+
+
+def _makeTree(root, names):
+    for name in names:
+        path = os.path.join(root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(name)
+
+
+def _readTree(root):
+    tree = {}
+    for dirPath, dirNames, fileNames in os.walk(root):
+        for name in fileNames:
+            path = os.path.join(dirPath, name)
+            with open(path) as f:
+                tree[os.path.relpath(path, root)] = f.read()
+        if not dirNames and not fileNames and dirPath != root:
+            tree[os.path.relpath(dirPath, root) + os.sep] = None
+    return tree
+
+
+def _makePlan(root):
+    # B.ttf takes the name that A.ttf is leaving, so that both phases are needed, and C.ttf is moved into a folder that
+    # doesn't exist yet.
+    plan = RenamePlan()
+    plan.add(os.path.join(root, 'A.ttf'), os.path.join(root, 'B.ttf'))
+    plan.add(os.path.join(root, 'B.ttf'), os.path.join(root, 'A.ttf'))
+    plan.add(os.path.join(root, 'C.ttf'), os.path.join(root, 'new', 'sub', 'C.ttf'))
+    return plan
+
+
+class _Failure(Exception):
+    pass
+
+
+def _failAt(monkeypatch, phase, count):
+    """
+    Makes the count-th (1-based) call of the given phase fail: 'temp' is the move to the temporary name, 'target' the
+    move to the target name and 'dir' the creation of a folder.
+    """
+    calls = {'temp': 0, 'target': 0, 'dir': 0}
+    rename, mkdir = os.rename, os.mkdir
+
+    def failingRename(source, destination):
+        kind = 'target' if source.endswith('.tmp') else 'temp'
+        calls[kind] += 1
+        if kind == phase and calls[kind] == count:
+            raise _Failure(f'{kind} {count}')
+        rename(source, destination)
+
+    def failingMkdir(path, *args, **kwargs):
+        calls['dir'] += 1
+        if phase == 'dir' and calls['dir'] == count:
+            raise _Failure(f'dir {count}')
+        mkdir(path, *args, **kwargs)
+
+    monkeypatch.setattr(renamePlan.os, 'rename', failingRename)
+    monkeypatch.setattr(renamePlan.os, 'mkdir', failingMkdir)
+
+
+FAILURES = [('temp', 1), ('temp', 2), ('temp', 3), ('dir', 1), ('dir', 2), ('target', 1), ('target', 2),
+            ('target', 3)]
+
+
+def test_apply(tmp_path):
+    root = str(tmp_path)
+    _makeTree(root, ['A.ttf', 'B.ttf', 'C.ttf'])
+    journalFile = os.path.join(root, renamePlan.JOURNAL_FILE_NAME)
+
+    _makePlan(root).apply(journalFile)
+
+    assert isJournalComplete(journalFile)
+    os.remove(journalFile)
+    assert _readTree(root) == {'B#1.ttf': 'A.ttf', 'A.ttf': 'B.ttf', os.path.join('new', 'sub', 'C.ttf'): 'C.ttf'}
+
+
+@pytest.mark.parametrize('phase, count', FAILURES)
+def test_apply_rolls_back_on_failure(tmp_path, monkeypatch, phase, count):
+    root = str(tmp_path)
+    _makeTree(root, ['A.ttf', 'B.ttf', 'C.ttf'])
+    original = _readTree(root)
+    journalFile = os.path.join(root, renamePlan.JOURNAL_FILE_NAME)
+    plan = _makePlan(root)
+
+    _failAt(monkeypatch, phase, count)
+    with pytest.raises(_Failure):
+        plan.apply(journalFile)
+
+    assert not os.path.exists(journalFile)
+    assert _readTree(root) == original
+
+
+@pytest.mark.parametrize('phase, count', FAILURES)
+def test_rollback_interrupted_batch(tmp_path, monkeypatch, phase, count):
+    # The process dies before apply() can roll back: the journal is left behind, and the batch is rolled back later.
+    root = str(tmp_path)
+    _makeTree(root, ['A.ttf', 'B.ttf', 'C.ttf'])
+    original = _readTree(root)
+    journalFile = os.path.join(root, renamePlan.JOURNAL_FILE_NAME)
+    plan = _makePlan(root)
+
+    _failAt(monkeypatch, phase, count)
+    monkeypatch.setattr(renamePlan, 'rollbackRenames', lambda _: 0)
+    with pytest.raises(_Failure):
+        plan.apply(journalFile)
+    monkeypatch.undo()
+
+    assert not isJournalComplete(journalFile)
+    with pytest.raises(FileExistsError):
+        _makePlan(root).apply(journalFile)
+
+    restored = rollbackRenames(journalFile)
+
+    assert restored == (count - 1 if phase == 'temp' else 3)
+    assert not os.path.exists(journalFile)
+    assert _readTree(root) == original
+
+
+def test_apply_target_created_after_planning(tmp_path):
+    root = str(tmp_path)
+    _makeTree(root, ['A.ttf'])
+    original = _readTree(root)
+    journalFile = os.path.join(root, renamePlan.JOURNAL_FILE_NAME)
+    plan = RenamePlan()
+    plan.add(os.path.join(root, 'A.ttf'), os.path.join(root, 'B.ttf'))
+    _makeTree(root, ['B.ttf'])
+    original['B.ttf'] = 'B.ttf'
+
+    with pytest.raises(FileExistsError):
+        plan.apply(journalFile)
+
+    assert _readTree(root) == original
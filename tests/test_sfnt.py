@@ -0,0 +1,113 @@
+import os
+
+import pytest
+from fontTools.ttLib import TTCollection, TTFont
+
+from ftcli.Lib.sfnt import readCollectionDescriptors, readFontDescriptor
+
+
+@pytest.fixture(scope='module')
+def fonts(tmp_path_factory, buildFont):
+    root = tmp_path_factory.mktemp('fonts')
+    fonts = {
+        'ttf': buildFont(str(root / 'Test-Regular.ttf')),
+        'otf': buildFont(str(root / 'Test-Regular.otf'), cff=True),
+        'woff': buildFont(str(root / 'Test-Regular.woff'), flavor='woff'),
+        'woff2': buildFont(str(root / 'Test-Regular.woff2'), flavor='woff2'),
+        'otf-woff2': buildFont(str(root / 'Test-Regular-CFF.woff2'), cff=True, flavor='woff2'),
+    }
+    collection = TTCollection()
+    collection.fonts = [TTFont(buildFont(str(root / f'Test-{style}.ttf'), styleName=style))
+                        for style in ('Bold', 'Italic')]
+    fonts['ttc'] = str(root / 'Test.ttc')
+    collection.save(fonts['ttc'])
+    return fonts
+
+
+def _assertSameFont(descriptor, font):
+    assert descriptor is not None
+    assert descriptor.sfntVersion == font.sfntVersion
+    assert descriptor.flavor == font.flavor
+    assert sorted(descriptor.tags) == sorted(font.reader.keys())
+    assert descriptor.readTables(descriptor.tags) == {tag: font.reader[tag] for tag in font.reader.keys()}
+
+
+@pytest.mark.parametrize('kind', ['ttf', 'otf', 'woff', 'woff2', 'otf-woff2'])
+def test_readFontDescriptor(fonts, kind):
+    path = fonts[kind]
+    descriptor = readFontDescriptor(path)
+
+    with TTFont(path, lazy=True) as font:
+        _assertSameFont(descriptor, font)
+    assert descriptor.size == os.path.getsize(path)
+    assert not descriptor.isCollectionMember
+    assert descriptor.isCFF == (kind in ('otf', 'otf-woff2'))
+
+
+def test_readFontDescriptor_collection(fonts):
+    path = fonts['ttc']
+
+    # Collections can't be handled as single fonts.
+    assert readFontDescriptor(path) is None
+
+    descriptors = readCollectionDescriptors(path)
+    assert len(descriptors) == 2
+    for i, descriptor in enumerate(descriptors):
+        assert descriptor.isCollectionMember
+        assert descriptor.fontNumber == i
+        assert descriptor.numFonts == 2
+        with TTFont(path, fontNumber=i, lazy=True) as font:
+            _assertSameFont(descriptor, font)
+
+    assert readFontDescriptor(path, fontNumber=2) is None
+
+
+@pytest.mark.parametrize('kind', ['ttf', 'otf', 'woff', 'woff2'])
+def test_readCollectionDescriptors_single_font(fonts, kind):
+    assert readCollectionDescriptors(fonts[kind]) == []
+
+
+@pytest.mark.parametrize('kind', ['ttf', 'otf', 'woff', 'woff2', 'ttc'])
+@pytest.mark.parametrize('length', [0, 3, 4, 11, 12, 40, 100, -1])
+def test_readFontDescriptor_truncated(fonts, tmp_path, kind, length):
+    # Files cut in the header, in the table directory or in the table data.
+    with open(fonts[kind], 'rb') as f:
+        data = f.read()
+    path = str(tmp_path / f'truncated-{os.path.basename(fonts[kind])}')
+    with open(path, 'wb') as f:
+        f.write(data[:length])
+
+    fontNumber = 0 if kind == 'ttc' else -1
+    descriptor = readFontDescriptor(path, fontNumber=fontNumber)
+    if descriptor is None:
+        return
+
+    # If the file is recognized, all the tables it lists must be readable, as they are with TTFont.
+    with TTFont(path, fontNumber=fontNumber, lazy=True) as font:
+        _assertSameFont(descriptor, font)
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'\0' * 100,
+    b'Lorem ipsum dolor sit amet, consectetur adipiscing elit',
+    b'OTTO' + b'\xff' * 100,
+    b'\x00\x01\x00\x00\x00\x01' + b'\0' * 6 + b'glyf' + b'\0' * 4 + b'\x00\x00\x10\x00' + b'\x00\x00\x10\x00',
+    b'wOFF' + b'\xff' * 100,
+    b'wOF2' + b'\xff' * 100,
+    b'ttcf' + b'\xff' * 100,
+])
+def test_readFontDescriptor_invalid(tmp_path, data):
+    path = str(tmp_path / 'invalid.ttf')
+    with open(path, 'wb') as f:
+        f.write(data)
+
+    assert readFontDescriptor(path) is None
+    assert readFontDescriptor(path, fontNumber=0) is None
+    assert readCollectionDescriptors(path) == []
+    with pytest.raises(Exception):
+        TTFont(path, fontNumber=0).ensureDecompiled()
+
+
+def test_readFontDescriptor_missing_file(tmp_path):
+    assert readFontDescriptor(str(tmp_path / 'missing.ttf')) is None
@@ -0,0 +1,62 @@
+import pytest
+
+from ftcli.Lib.configHandler import DEFAULT_ITALICS, DEFAULT_OBLIQUES, DEFAULT_WEIGHTS, DEFAULT_WIDTHS
+from ftcli.Lib.styleTokenizer import StyleTokenizer
+
+
+@pytest.fixture(scope='module')
+def tokenizer():
+    # Keys are strings in the JSON configuration file.
+    return StyleTokenizer({
+        'weights': {str(k): v for k, v in DEFAULT_WEIGHTS.items()},
+        'widths': {str(k): v for k, v in DEFAULT_WIDTHS.items()},
+        'italics': DEFAULT_ITALICS,
+        'obliques': DEFAULT_OBLIQUES,
+    })
+
+
+@pytest.mark.parametrize('string, width, weight, italic, oblique', [
+    ('Regular', None, '400', False, False),
+    ('Bold', None, '700', False, False),
+    ('BoldItalic', None, '700', True, False),
+    ('ExtraBold', None, '800', False, False),
+    ('SemiBold Condensed', '3', '600', False, False),
+    ('Condensed-Bold_Italic', '3', '700', True, False),
+    ('ExCnBdIt', '2', '700', True, False),
+    ('LightOblique', None, '300', False, True),
+    # Unknown text is attributed to the weight.
+    ('SemiCondensed', '3', None, False, False),
+    ('BoldSemiCondensed', '3', None, False, False),
+    ('SemiCondensedBold', '3', None, False, False),
+    ('SemiCondensedBoldItalic', '3', None, True, False),
+    ('UltraItalic', None, None, True, False),
+    ('Foo', None, None, False, False),
+    # More literals of the same category.
+    ('BoldBlack', None, None, False, False),
+    ('CondensedExtended', None, None, False, False),
+])
+def test_parse(tokenizer, string, width, weight, italic, oblique):
+    style = tokenizer.parse(string)
+
+    assert (style.width, style.weight, style.italic, style.oblique) == (width, weight, italic, oblique)
+
+
+def test_parse_unknown(tokenizer):
+    style = tokenizer.parse('SemiCondensedBoldItalicX')
+
+    assert style.unknown == 'semix'
+    assert style.tokens == ['condensed', 'bold', 'italic']
+
+
+def test_parse_empty(tokenizer):
+    style = tokenizer.parse('')
+
+    assert (style.width, style.weight, style.italic, style.oblique) == (None, None, False, False)
+
+
+def test_parseMany(tokenizer):
+    styles = tokenizer.parseMany(['Bold', 'Condensed', 'Bold'])
+
+    assert [(s.width, s.weight) for s in styles] == [(None, '700'), ('3', None), (None, '700')]
+    # Results are memoized.
+    assert styles[0] is styles[2]